@@ -0,0 +1,356 @@
+#backtesting.py
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+
+from baselines import (FourierRidge, HoltWinters, SeasonalNaive, covariate_matrix, forecast_baseline,
+                       season_length, seasonal_periods, training_matrix)
+from forecasting import (TIME_BUDGET_EXHAUSTED, ForecastEngine, GroupTimeout, build_forecast_tasks, fit_prophet,
+                         time_limit, warm_start_params)
+
+# 候选模型，按耗时从低到高排列；时间预算用完时后面的模型不再评估
+CANDIDATE_MODELS = ['seasonal_naive', 'holt_winters', 'fourier_ridge', 'prophet']
+BACKTEST_METRICS = ['wape', 'mae', 'rmse']
+
+
+def rolling_cutoffs(n_obs, horizon, n_cutoffs=3, min_train=2):
+    """
+    训练期内的滚动预测起点（以训练期数表示），从最后一个截断点（留出horizon期）向前每次移动horizon期，
+    训练期数少于min_train的截断点被丢弃
+
+    返回:
+    list: 从早到晚排列的截断点
+    """
+    cutoffs = [n_obs - horizon * (i + 1) for i in range(n_cutoffs)]
+    return sorted(c for c in cutoffs if c >= min_train)
+
+
+def default_horizon(freq, n_obs, n_cutoffs=3):
+    """回测的预测期数：不超过训练期一半的最长季节周期，同时保证至少能放下n_cutoffs个窗口和两个窗口的训练数据"""
+    cap = max(1, n_obs // (n_cutoffs + 2))
+    usable = [period for period in seasonal_periods(freq) if period <= n_obs / 2]
+    if not usable:
+        return cap
+    return max(1, min(int(round(usable[-1])), cap))
+
+
+def window_errors(actual, forecast, metric='wape'):
+    """
+    每个分组在一个回测窗口内的误差
+
+    参数:
+    actual, forecast (numpy.ndarray): (分组数, 期数)
+    metric (str): 'wape'（绝对误差合计/实际值绝对值合计，%）、'mae'或'rmse'
+    """
+    error = forecast - actual
+    if metric == 'mae':
+        return np.mean(np.abs(error), axis=1)
+    if metric == 'rmse':
+        return np.sqrt(np.mean(error ** 2, axis=1))
+    if metric == 'wape':
+        abs_error = np.abs(error).sum(axis=1)
+        abs_actual = np.abs(actual).sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # 实际值全为0时，误差为0记为0，否则为无穷大
+            return np.where(abs_actual > 0, abs_error / abs_actual * 100, np.where(abs_error > 0, np.inf, 0.0))
+    raise ValueError(f"Unknown backtest metric: {metric}")
+
+
+def _backtest_prophet_in_worker(group, history, cutoffs, horizon, options, deadline):
+    """
+    工作进程入口：按时间顺序在各截断点拟合同一分组，后一个截断点从前一次拟合的参数热启动。
+    返回 (分组, 各截断点的预测值列表或None, 错误信息或None, 耗时)
+    """
+    warnings.filterwarnings("ignore")
+    start = time.perf_counter()
+    predictions, init = [], None
+    try:
+        for cutoff in cutoffs:
+            remaining = deadline - time.time() if deadline is not None else None
+            if remaining is not None and remaining <= 0:
+                raise GroupTimeout()
+            train = history.iloc[:cutoff]
+            test = history.iloc[cutoff:cutoff + horizon].drop(columns='y')
+            with time_limit(remaining):
+                try:
+                    model = fit_prophet(train, init=init, **options)
+                except Exception:
+                    if init is None:
+                        raise
+                    # 训练数据变长后变点数或季节项可能不同，参数维度不一致时从默认值重新拟合
+                    model = fit_prophet(train, **options)
+                predictions.append(model.predict(test)['yhat'].to_numpy())
+            if not options.get('use_advanced_model'):
+                init = warm_start_params(model)
+        return group, predictions, None, time.perf_counter() - start
+    except GroupTimeout:
+        return group, None, TIME_BUDGET_EXHAUSTED, time.perf_counter() - start
+    except Exception as e:
+        return group, None, str(e), time.perf_counter() - start
+
+
+class Backtester:
+    def __init__(self, freq, candidates=None, horizon=None, n_cutoffs=3, metric='wape', time_budget=None,
+                 interval_width=0.6, covariate_columns=None, use_advanced_model=False, n_jobs=None):
+        """
+        滚动起点回测：在训练期内的多个截断点上评估各候选模型，按平均误差为每个分组选择模型。
+        基线模型每个截断点一次拟合所有分组（Holt-Winters一次递推得到所有截断点的状态），
+        Prophet每个分组一个任务分发到进程池，同一分组的各截断点按顺序热启动。
+
+        参数:
+        freq (str): 频率
+        candidates (list): 候选模型，默认CANDIDATE_MODELS
+        horizon (int): 每个回测窗口的期数，None表示按频率和训练期长度确定（见default_horizon）
+        n_cutoffs (int): 截断点数
+        metric (str): 选择模型的误差指标，见BACKTEST_METRICS
+        time_budget (float): 总时间预算（秒），从run开始计时，用完后未评估的模型不参与选择，None表示不限制。
+                             最终拟合也应在同一截止时间前完成（见deadline和forecast_selected）
+        interval_width (float): 预测区间宽度
+        covariate_columns (list): 协变量列（fourier_ridge和prophet使用）
+        use_advanced_model (bool): Prophet使用MCMC采样
+        n_jobs (int): Prophet回测的工作进程数，None表示CPU核数，1表示串行
+        """
+        self.freq = freq
+        self.candidates = list(candidates or CANDIDATE_MODELS)
+        self.horizon = horizon
+        self.n_cutoffs = n_cutoffs
+        self.metric = metric
+        self.time_budget = time_budget
+        self.interval_width = interval_width
+        self.covariate_columns = covariate_columns or []
+        self.use_advanced_model = use_advanced_model
+        self.n_jobs = n_jobs if n_jobs is not None else (os.cpu_count() or 1)
+        # 运行后的结果：每个(分组, 模型, 截断点)的误差、模型 -> 耗时、未完成评估的模型 -> 原因
+        self.cutoff_scores = None
+        self.timings = {}
+        self.skipped = {}
+        # 时间预算的截止时间（time.time()），run时确定
+        self.deadline = None
+
+    def _deadline(self, start):
+        return start + self.time_budget if self.time_budget is not None else None
+
+    def _baseline_predictions(self, model, values, cutoffs, horizon, covariates):
+        """基线模型在各截断点的预测值，每个截断点一次拟合所有分组"""
+        n_obs = cutoffs[0]
+        if model == 'holt_winters':
+            fitted = HoltWinters(season_length(self.freq, n_obs), self.interval_width).fit_checkpoints(values, cutoffs)
+            return [m.predict(horizon)[0][:, -horizon:] for m in fitted]
+        predictions = []
+        for cutoff in cutoffs:
+            if model == 'seasonal_naive':
+                forecaster = SeasonalNaive(season_length(self.freq, n_obs), self.interval_width)
+                forecaster.fit(values[:, :cutoff])
+                yhat = forecaster.predict(horizon)[0]
+            else:
+                # 所有截断点使用最早截断点可支持的季节周期，使各截断点的模型一致
+                periods = [period for period in seasonal_periods(self.freq) if n_obs >= 2 * period]
+                forecaster = FourierRidge(periods, self.interval_width)
+                if covariates is not None:
+                    forecaster.fit(values[:, :cutoff], covariates[:, :cutoff])
+                    yhat = forecaster.predict(horizon, covariates[:, :cutoff + horizon])[0]
+                else:
+                    forecaster.fit(values[:, :cutoff])
+                    yhat = forecaster.predict(horizon)[0]
+            predictions.append(yhat[:, -horizon:])
+        return predictions
+
+    def _prophet_predictions(self, history, panel, cutoffs, horizon, target_column, deadline, progress_callback):
+        """Prophet在各截断点的预测值：分组 -> 预测值列表；时间预算用完时剩余分组不再评估"""
+        groups = list(history.index)
+        dates = history.columns
+        frames = panel.loc[panel['date'].isin(dates), ['group', 'date', target_column] + self.covariate_columns]
+        frames = frames.rename(columns={'date': 'ds', target_column: 'y'}).sort_values(['group', 'ds'])
+        by_group = {group: frame.drop(columns='group').reset_index(drop=True)
+                    for group, frame in frames.groupby('group', sort=False)}
+        options = {
+            "interval_width": self.interval_width,
+            "use_advanced_model": self.use_advanced_model,
+            "covariate_columns": self.covariate_columns
+        }
+        results, errors = {}, {}
+
+        def record(result, done):
+            group, predictions, error, seconds = result
+            if error is None:
+                results[group] = predictions
+            else:
+                errors[group] = error
+            if progress_callback is not None:
+                progress_callback(done, len(groups), group)
+
+        if self.n_jobs <= 1 or len(groups) <= 1:
+            for done, group in enumerate(groups, 1):
+                record(_backtest_prophet_in_worker(group, by_group[group], cutoffs, horizon, options, deadline), done)
+            return results, errors
+
+        pool = ProcessPoolExecutor(max_workers=min(self.n_jobs, len(groups)))
+        futures = {}
+        try:
+            futures = {pool.submit(_backtest_prophet_in_worker, group, by_group[group], cutoffs, horizon,
+                                   options, deadline): group for group in groups}
+            remaining = deadline - time.time() if deadline is not None else None
+            done = 0
+            try:
+                for future in as_completed(futures, timeout=remaining):
+                    done += 1
+                    try:
+                        result = future.result()
+                    except BrokenProcessPool as e:
+                        result = (futures[future], None, f"worker process failed: {str(e)}", 0.0)
+                    record(result, done)
+            except FuturesTimeout:
+                for future, group in futures.items():
+                    if group not in results and group not in errors:
+                        errors[group] = TIME_BUDGET_EXHAUSTED
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+        return results, errors
+
+    def run(self, panel, groups, start_date, training_end_date, target_column, progress_callback=None):
+        """
+        回测所有候选模型
+
+        参数:
+        panel (pandas.DataFrame): prepare_panel得到的完整面板
+        groups (list): 分组
+        start_date, training_end_date (str): 训练开始和结束日期，回测只使用这段数据
+        target_column (str): 目标列
+        progress_callback (callable): Prophet每完成一个分组调用 progress_callback(已完成数, 总数, 分组)
+
+        返回:
+        pandas.DataFrame: 以分组为索引、候选模型为列的平均误差，未评估的为NaN
+        """
+        start = time.time()
+        deadline = self.deadline = self._deadline(start)
+        history, _ = training_matrix(panel, groups, start_date, training_end_date, target_column)
+        values = history.to_numpy(dtype=np.float64, na_value=0.0)
+        n_obs = values.shape[1]
+        horizon = self.horizon or default_horizon(self.freq, n_obs, self.n_cutoffs)
+        cutoffs = rolling_cutoffs(n_obs, horizon, self.n_cutoffs)
+        self.cutoffs = [history.columns[c] for c in cutoffs]
+        self.horizon_used = horizon
+        scores = pd.DataFrame(np.nan, index=history.index, columns=self.candidates)
+        rows = []
+        if not cutoffs:
+            self.skipped = {model: "not enough training data for backtesting" for model in self.candidates}
+            self.cutoff_scores = pd.DataFrame(columns=['group', 'model', 'cutoff', self.metric])
+            return scores
+        covariates = None
+        if self.covariate_columns:
+            covariates = covariate_matrix(panel, history.index, history.columns, self.covariate_columns)
+
+        for model in self.candidates:
+            if deadline is not None and time.time() >= deadline:
+                self.skipped[model] = TIME_BUDGET_EXHAUSTED
+                continue
+            model_start = time.perf_counter()
+            if model == 'prophet':
+                results, errors = self._prophet_predictions(history, panel, cutoffs, horizon, target_column,
+                                                            deadline, progress_callback)
+                if errors:
+                    self.skipped[model] = f"{len(errors)} groups not evaluated: {next(iter(errors.values()))}"
+                evaluated = [i for i, group in enumerate(history.index) if group in results]
+                predictions = [np.array([results[history.index[i]][k] for i in evaluated])
+                               for k in range(len(cutoffs))] if evaluated else []
+            else:
+                evaluated = list(range(len(history.index)))
+                predictions = self._baseline_predictions(model, values, cutoffs, horizon, covariates)
+            self.timings[model] = time.perf_counter() - model_start
+            if not evaluated:
+                continue
+            errors_by_cutoff = np.array([
+                window_errors(values[evaluated, cutoff:cutoff + horizon], prediction, self.metric)
+                for cutoff, prediction in zip(cutoffs, predictions)])
+            scores.iloc[evaluated, scores.columns.get_loc(model)] = errors_by_cutoff.mean(axis=0)
+            for k, cutoff in enumerate(cutoffs):
+                rows.append(pd.DataFrame({'group': history.index[evaluated], 'model': model,
+                                          'cutoff': history.columns[cutoff], self.metric: errors_by_cutoff[k]}))
+        self.cutoff_scores = (pd.concat(rows, ignore_index=True) if rows else
+                              pd.DataFrame(columns=['group', 'model', 'cutoff', self.metric]))
+        return scores
+
+    def fastest_model(self):
+        """回测中完成评估的最快的基线模型，用作时间预算用完时的回退模型"""
+        baselines = {model: seconds for model, seconds in self.timings.items()
+                     if model != 'prophet' and model not in self.skipped}
+        return min(baselines, key=baselines.get) if baselines else 'seasonal_naive'
+
+    def select(self, scores, default=None):
+        """
+        为每个分组选择平均误差最小的模型，没有任何有效分数的分组使用default（默认第一个候选模型）
+
+        返回:
+        pandas.Series: 分组 -> 模型
+        """
+        default = default or self.candidates[0]
+        finite = scores.replace([np.inf, -np.inf], np.nan)
+        valid = finite.notna().any(axis=1)
+        selection = pd.Series(default, index=scores.index, dtype=object)
+        if valid.any():
+            selection[valid] = finite[valid].idxmin(axis=1)
+        return selection
+
+
+def forecast_selected(panel, groups, selection, start_date, training_end_date, end_date, freq, target_column,
+                      covariate_columns=None, covariate_means=None, interval_width=0.6, use_advanced_model=False,
+                      timeout=None, progress_callback=None, store=None, callback=None, deadline=None,
+                      fallback='seasonal_naive'):
+    """
+    按每个分组选择的模型预测：基线模型按模型一次预测对应的所有分组，Prophet分组由ForecastEngine并行拟合。
+    基线模型先预测；到deadline时仍未完成的Prophet分组改用fallback模型（一次矩阵运算，耗时可以忽略），
+    使回测加最终拟合的总耗时不超过时间预算。
+
+    参数:
+    selection (pandas.Series): 分组 -> 模型，见Backtester.select；改用回退模型的分组在其中更新为fallback
+    store (ModelStore): Prophet分组的已拟合模型存储，见ForecastEngine
+    callback (callable): 每个分组预测完成时调用 callback(分组, 预测结果)，提供时结果不保留在返回的forecasts中
+    deadline (float): 截止时间（time.time()），通常为Backtester.deadline，None表示不限制
+    fallback (str): 回退的基线模型，通常为Backtester.fastest_model()
+    其他参数同forecast_baseline和build_forecast_tasks
+
+    返回:
+    tuple: (forecasts, errors)
+    """
+    forecasts, errors = {}, {}
+
+    def run_baseline(model, model_groups):
+        model_forecasts, task_errors = forecast_baseline(
+            panel.loc[panel['group'].isin(model_groups)], model_groups, start_date, training_end_date,
+            end_date, freq, target_column, model, covariate_columns, interval_width)
+        if callback is not None:
+            for group in list(model_forecasts):
+                callback(group, model_forecasts.pop(group))
+        forecasts.update(model_forecasts)
+        errors.update(task_errors)
+
+    chosen = selection.reindex(groups)
+    models = sorted(pd.unique(chosen.dropna()), key=lambda model: model == 'prophet')
+    for model in models:
+        model_groups = list(chosen.index[chosen == model])
+        if model != 'prophet':
+            run_baseline(model, model_groups)
+            continue
+        tasks, task_errors = build_forecast_tasks(panel, model_groups, start_date, training_end_date, end_date,
+                                                  freq, target_column, covariate_columns, covariate_means)
+        engine = ForecastEngine(interval_width=interval_width, use_advanced_model=use_advanced_model,
+                                covariate_columns=covariate_columns, timeout=timeout, store=store)
+        model_forecasts, fit_errors = engine.run(tasks, progress_callback=progress_callback, callback=callback,
+                                                 deadline=deadline)
+        late = [group for group, error in fit_errors.items() if error == TIME_BUDGET_EXHAUSTED]
+        task_errors.update({group: error for group, error in fit_errors.items() if group not in late})
+        forecasts.update(model_forecasts)
+        errors.update(task_errors)
+        if late:
+            print(f"Time budget exhausted: forecasting {len(late)} Prophet groups with {fallback} instead")
+            selection[late] = fallback
+            run_baseline(fallback, late)
+    for group in chosen.index[chosen.isna()]:
+        errors[group] = "no model selected"
+    return forecasts, errors
@@ -0,0 +1,390 @@
+#baselines.py
+import itertools
+
+import numpy as np
+import pandas as pd
+from pandas.tseries.frequencies import to_offset
+from scipy import stats
+
+DAY = pd.Timedelta(days=1)
+DAYS_PER_YEAR = 365.25
+
+
+def seasonal_periods(freq):
+    """
+    频率对应的季节周期（以期数计），从短到长。例如日数据为 [7, 365.25]，月数据为 [12]。
+
+    参数:
+    freq (str): pandas频率别名
+    """
+    offset = to_offset(freq)
+    name = type(offset).__name__
+    n = getattr(offset, 'n', 1) or 1
+    if 'Month' in name:
+        return [12 / n] if 12 / n >= 2 else []
+    if 'Quarter' in name:
+        return [4 / n] if 4 / n >= 2 else []
+    if 'Year' in name:
+        return []
+    if name == 'Week':
+        return [DAYS_PER_YEAR / 7 / n]
+    if name == 'BusinessDay':
+        return [5 / n, DAYS_PER_YEAR * 5 / 7 / n]
+    try:
+        step = pd.Timedelta(offset)
+    except (TypeError, ValueError):
+        return []
+    candidates = [DAY / step, 7 * DAY / step, DAYS_PER_YEAR * DAY / step]
+    return [period for period in candidates if period >= 2]
+
+
+def season_length(freq, n_periods=None):
+    """最短的整数季节周期（季节性朴素和Holt-Winters使用），训练数据不足两个周期时为1（无季节性）"""
+    for period in seasonal_periods(freq):
+        length = int(round(period))
+        if n_periods is None or 2 * length <= n_periods:
+            return length
+    return 1
+
+
+def _z(interval_width):
+    return float(stats.norm.ppf(0.5 + interval_width / 2))
+
+
+def _season_index(n_obs, horizon, length):
+    """预测期每一步对应的最后一个完整季节中的位置"""
+    return n_obs - length + np.arange(horizon) % length
+
+
+class SeasonalNaive:
+    def __init__(self, season_length=1, interval_width=0.6):
+        """
+        季节性朴素预测：每一期等于上一个季节同一位置的值（season_length=1时为朴素预测）。
+        所有分组作为矩阵的行一起计算。
+
+        参数:
+        season_length (int): 季节周期（期数）
+        interval_width (float): 预测区间宽度
+        """
+        self.season_length = max(1, int(season_length))
+        self.interval_width = interval_width
+
+    def fit(self, values, covariates=None):
+        """
+        参数:
+        values (numpy.ndarray): (分组数, 期数) 的训练数据
+        covariates: 不使用
+        """
+        self.values = np.asarray(values, dtype=np.float64)
+        m = self.season_length
+        n_obs = self.values.shape[1]
+        self.fitted = self.values.copy()
+        if n_obs > m:
+            self.fitted[:, m:] = self.values[:, :-m]
+            residuals = self.values[:, m:] - self.fitted[:, m:]
+            self.sigma = np.sqrt(np.mean(residuals ** 2, axis=1))
+        else:
+            self.sigma = np.zeros(len(self.values))
+        return self
+
+    def predict(self, horizon, future_covariates=None):
+        """
+        返回:
+        tuple: (yhat, yhat_lower, yhat_upper)，形状均为 (分组数, 训练期数 + horizon)
+        """
+        m = min(self.season_length, self.values.shape[1])
+        n_obs = self.values.shape[1]
+        forecast = self.values[:, _season_index(n_obs, horizon, m)]
+        # h步预测的标准差：sigma * sqrt(已跨越的完整季节数 + 1)
+        steps = np.sqrt(np.arange(horizon) // m + 1)
+        width = np.concatenate([np.ones(n_obs), steps]) * self.sigma[:, None] * _z(self.interval_width)
+        yhat = np.concatenate([self.fitted, forecast], axis=1)
+        return yhat, yhat - width, yhat + width
+
+
+class HoltWinters:
+    # 平滑参数的候选值，对每个分组按一步预测误差平方和选择最优组合
+    ALPHAS = (0.05, 0.2, 0.5, 0.8)
+    BETAS = (0.0, 0.05, 0.2)
+    GAMMAS = (0.05, 0.2, 0.5)
+
+    def __init__(self, season_length=1, interval_width=0.6, damping=0.98):
+        """
+        加法Holt-Winters（ETS(A,Ad,A)，阻尼趋势）。平滑递推按时间逐期进行，
+        每一步同时更新所有分组和所有候选参数组合（矩阵运算），再为每个分组选择误差最小的参数。
+
+        参数:
+        season_length (int): 季节周期，1表示无季节项
+        interval_width (float): 预测区间宽度
+        damping (float): 趋势阻尼系数，避免长期预测中趋势无限外推
+        """
+        self.season_length = max(1, int(season_length))
+        self.interval_width = interval_width
+        self.damping = damping
+
+    def _combos(self):
+        gammas = self.GAMMAS if self.season_length > 1 else (0.0,)
+        return np.array(list(itertools.product(self.ALPHAS, self.BETAS, gammas)))
+
+    def fit(self, values, covariates=None):
+        self.__dict__.update(self.fit_checkpoints(values, [np.asarray(values).shape[1]])[0].__dict__)
+        return self
+
+    def fit_checkpoints(self, values, checkpoints):
+        """
+        一次递推得到在多个截断点拟合的模型：截断点之前的递推与只用截断点之前的数据拟合完全相同，
+        在每个截断点记录各参数组合的误差平方和与状态，按截断点之前的误差选择参数（用于滚动回测）。
+
+        参数:
+        values (numpy.ndarray): (分组数, 期数) 的数据
+        checkpoints (list): 截断点（训练期数），每个都不超过期数
+
+        返回:
+        list: 与checkpoints对应的已拟合模型
+        """
+        values = np.asarray(values, dtype=np.float64)
+        n_groups, n_obs = values.shape
+        checkpoints = sorted(set(int(c) for c in checkpoints))
+        m = self.season_length if checkpoints[0] >= 2 * self.season_length else 1
+        self.season_length = m
+        phi = self.damping
+        combos = self._combos()
+        alpha, beta, gamma = (combos[:, i][:, None] for i in range(3))
+
+        # 初始化：第一个季节的均值为水平，前两个季节均值之差为趋势，第一个季节与均值之差为季节项
+        first = values[:, :m].mean(axis=1)
+        second = values[:, m:2 * m].mean(axis=1) if n_obs >= 2 * m else first
+        level = np.broadcast_to(first, (len(combos), n_groups)).copy()
+        trend = np.broadcast_to((second - first) / m if m > 1 else np.zeros(n_groups),
+                                (len(combos), n_groups)).copy()
+        if m > 1:
+            season = np.broadcast_to((values[:, :m] - first[:, None]).T[:, None, :],
+                                     (m, len(combos), n_groups)).copy()
+        else:
+            season = np.zeros((1, len(combos), n_groups))
+
+        sse = np.zeros((len(combos), n_groups))
+        fitted = np.empty((len(combos), n_groups, checkpoints[-1]))
+        models = []
+        for t in range(checkpoints[-1]):
+            s = season[t % m]
+            prediction = level + phi * trend + s
+            fitted[:, :, t] = prediction
+            error = values[:, t] - prediction
+            sse += error ** 2
+            previous_level = level
+            level = alpha * (values[:, t] - s) + (1 - alpha) * (level + phi * trend)
+            trend = beta * (level - previous_level) + (1 - beta) * phi * trend
+            if m > 1:
+                season[t % m] = gamma * (values[:, t] - level) + (1 - gamma) * s
+            if t + 1 in checkpoints:
+                models.append(self._select(combos, sse, level, trend, season, fitted[:, :, :t + 1]))
+        return models
+
+    def _select(self, combos, sse, level, trend, season, fitted):
+        """为每个分组选择误差平方和最小的参数组合，返回保存对应状态的模型"""
+        n_obs = fitted.shape[2]
+        best = np.argmin(sse, axis=0)
+        columns = np.arange(sse.shape[1])
+        model = HoltWinters(self.season_length, self.interval_width, self.damping)
+        model.params = combos[best]
+        model.level = level[best, columns]
+        model.trend = trend[best, columns]
+        # 各季节位置最近一次更新的季节项
+        model.season = season[:, best, columns].T
+        model.fitted = fitted[best, columns]
+        model.sigma = np.sqrt(sse[best, columns] / n_obs)
+        model.n_obs = n_obs
+        return model
+
+    def predict(self, horizon, future_covariates=None):
+        m = self.season_length
+        phi = self.damping
+        steps = np.arange(1, horizon + 1)
+        damped = np.cumsum(phi ** steps)
+        season = self.season[:, (self.n_obs + np.arange(horizon)) % m]
+        forecast = self.level[:, None] + damped[None, :] * self.trend[:, None] + season
+
+        # h步预测方差：sigma^2 * (1 + sum_{j<h} c_j^2)，c_j = alpha(1 + beta*阻尼累计) + gamma*[j为季节整数倍]
+        alpha, beta, gamma = (self.params[:, i][:, None] for i in range(3))
+        j = np.arange(1, horizon)
+        c = alpha * (1 + beta * np.cumsum(phi ** j)[None, :]) + gamma * (j % m == 0)[None, :]
+        variance = np.concatenate([np.ones((len(alpha), 1)), 1 + np.cumsum(c ** 2, axis=1)], axis=1)[:, :horizon]
+        width_future = self.sigma[:, None] * np.sqrt(variance) * _z(self.interval_width)
+        width_fitted = np.repeat(self.sigma[:, None] * _z(self.interval_width), self.n_obs, axis=1)
+        yhat = np.concatenate([self.fitted, forecast], axis=1)
+        width = np.concatenate([width_fitted, width_future], axis=1)
+        return yhat, yhat - width, yhat + width
+
+
+class FourierRidge:
+    def __init__(self, periods=(), interval_width=0.6, harmonics=None, alpha=1.0):
+        """
+        线性趋势 + 各季节周期的傅里叶项 + 协变量的岭回归。
+        没有协变量时所有分组共用同一个设计矩阵，一次求解；有协变量时按分组批量求解小规模的正规方程。
+
+        参数:
+        periods (list): 季节周期（期数），见seasonal_periods
+        interval_width (float): 预测区间宽度
+        harmonics (dict): 周期 -> 傅里叶阶数，默认周期不超过7时为周期的一半，否则为10（与Prophet的年季节相同）
+        alpha (float): 岭回归的惩罚系数（截距和趋势不惩罚）
+        """
+        self.periods = list(periods)
+        self.interval_width = interval_width
+        self.harmonics = harmonics or {}
+        self.alpha = alpha
+
+    def _design(self, t):
+        columns = [np.ones_like(t), t / max(self.n_obs - 1, 1)]
+        for period in self.periods:
+            order = self.harmonics.get(period, int(period // 2) if period <= 7 else 10)
+            for k in range(1, order + 1):
+                angle = 2 * np.pi * k * t / period
+                columns += [np.sin(angle), np.cos(angle)]
+        return np.column_stack(columns)
+
+    def fit(self, values, covariates=None):
+        """
+        参数:
+        values (numpy.ndarray): (分组数, 期数) 的训练数据
+        covariates (numpy.ndarray): (分组数, 期数, 协变量数)，可选
+        """
+        values = np.asarray(values, dtype=np.float64)
+        n_groups, n_obs = values.shape
+        self.n_obs = n_obs
+        # 训练期太短时只保留能被至少两个完整周期支持的季节项
+        self.periods = [period for period in self.periods if n_obs >= 2 * period]
+        base = self._design(np.arange(n_obs, dtype=np.float64))
+        penalty = np.full(base.shape[1], self.alpha)
+        penalty[:2] = 0
+
+        if covariates is None or covariates.shape[2] == 0:
+            self.covariate_scale = None
+            gram = base.T @ base + np.diag(penalty)
+            self.coef = np.linalg.solve(gram, base.T @ values.T).T
+            fitted = self.coef @ base.T
+        else:
+            # 协变量按分组标准化，使惩罚对不同量纲的协变量一致
+            mean = covariates.mean(axis=1, keepdims=True)
+            std = covariates.std(axis=1, keepdims=True)
+            std[std == 0] = 1
+            self.covariate_scale = (mean, std)
+            scaled = (covariates - mean) / std
+            design = np.concatenate([np.broadcast_to(base, (n_groups,) + base.shape), scaled], axis=2)
+            penalty = np.concatenate([penalty, np.full(scaled.shape[2], self.alpha)])
+            gram = np.einsum('gti,gtj->gij', design, design) + np.diag(penalty)
+            rhs = np.einsum('gti,gt->gi', design, values)
+            self.coef = np.linalg.solve(gram, rhs[:, :, None])[:, :, 0]
+            fitted = np.einsum('gti,gi->gt', design, self.coef)
+        self.sigma = np.sqrt(np.mean((values - fitted) ** 2, axis=1))
+        return self
+
+    def predict(self, horizon, future_covariates=None):
+        """
+        参数:
+        horizon (int): 预测期数
+        future_covariates (numpy.ndarray): (分组数, 训练期数 + horizon, 协变量数)，拟合时使用了协变量时必需
+        """
+        t = np.arange(self.n_obs + horizon, dtype=np.float64)
+        base = self._design(t)
+        if self.covariate_scale is None:
+            yhat = self.coef @ base.T
+        else:
+            mean, std = self.covariate_scale
+            scaled = (future_covariates - mean) / std
+            n_base = base.shape[1]
+            yhat = self.coef[:, :n_base] @ base.T + np.einsum('gtk,gk->gt', scaled, self.coef[:, n_base:])
+        width = self.sigma[:, None] * _z(self.interval_width)
+        return yhat, yhat - width, yhat + width
+
+
+# 页面上的模型名称 -> 模型
+BASELINE_MODELS = {
+    'Seasonal naive': 'seasonal_naive',
+    'Holt-Winters (ETS)': 'holt_winters',
+    'Fourier ridge': 'fourier_ridge'
+}
+
+
+def make_baseline(model, freq, n_obs, interval_width=0.6):
+    """按名称创建基线模型，季节周期由频率和训练期长度决定"""
+    if model == 'seasonal_naive':
+        return SeasonalNaive(season_length(freq, n_obs), interval_width)
+    if model == 'holt_winters':
+        return HoltWinters(season_length(freq, n_obs), interval_width)
+    if model == 'fourier_ridge':
+        return FourierRidge(seasonal_periods(freq), interval_width)
+    raise ValueError(f"Unknown baseline model: {model}")
+
+
+def training_matrix(panel, groups, start_date, training_end_date, target_column):
+    """
+    训练期的目标值整理为 (分组数, 期数) 的矩阵（面板中所有分组的日期相同）
+
+    返回:
+    tuple: (history, errors)，history为以分组为行、日期为列的DataFrame，errors为没有训练数据的分组
+    """
+    in_training = (panel['date'] >= start_date) & (panel['date'] <= training_end_date)
+    history = panel.loc[in_training].pivot_table(index='group', columns='date', values=target_column,
+                                                 aggfunc='sum', dropna=False)
+    errors = {group: "no training data between the training start and end dates"
+              for group in groups if group not in history.index}
+    history = history.reindex([group for group in groups if group in history.index])
+    return history, errors
+
+
+def covariate_matrix(panel, groups, dates, covariate_columns):
+    """
+    协变量整理为 (分组数, 日期数, 协变量数) 的数组，面板之外的日期使用该组在前述日期中的均值
+    """
+    values = np.stack([
+        panel.pivot_table(index='group', columns='date', values=col, aggfunc='mean', dropna=False)
+             .reindex(index=groups, columns=dates).to_numpy(dtype=np.float64)
+        for col in covariate_columns], axis=2)
+    with np.errstate(invalid='ignore'):
+        group_means = np.nanmean(values, axis=1, keepdims=True)
+    return np.where(np.isnan(values), np.nan_to_num(group_means), values)
+
+
+def forecast_baseline(panel, groups, start_date, training_end_date, end_date, freq, target_column, model,
+                      covariate_columns=None, interval_width=0.6):
+    """
+    用基线模型一次预测所有分组，输出与Prophet相同格式的 分组 -> (ds, yhat, yhat_lower, yhat_upper)。
+    面板中所有分组的日期相同，训练数据和协变量整理为 (分组数, 期数) 的矩阵。
+
+    参数:
+    panel (pandas.DataFrame): prepare_panel得到的完整面板
+    groups (list): 分组
+    start_date, training_end_date, end_date (str): 训练开始、训练结束和预测结束日期
+    freq (str): 频率
+    target_column (str): 目标列
+    model (str): 'seasonal_naive'、'holt_winters'或'fourier_ridge'
+    covariate_columns (list): 协变量列（仅fourier_ridge使用）
+    interval_width (float): 预测区间宽度
+
+    返回:
+    tuple: (forecasts, errors)
+    """
+    covariate_columns = covariate_columns or []
+    history, errors = training_matrix(panel, groups, start_date, training_end_date, target_column)
+    if history.empty:
+        return {}, errors
+    values = history.to_numpy(dtype=np.float64, na_value=0.0)
+    dates = pd.date_range(start=history.columns[0], end=pd.to_datetime(end_date), freq=freq)
+    n_obs = values.shape[1]
+    horizon = max(len(dates) - n_obs, 0)
+    output_dates = dates[:n_obs + horizon]
+
+    forecaster = make_baseline(model, freq, n_obs, interval_width)
+    covariates = future_covariates = None
+    if model == 'fourier_ridge' and covariate_columns:
+        future_covariates = covariate_matrix(panel, history.index, output_dates, covariate_columns)
+        covariates = future_covariates[:, :n_obs]
+    forecaster.fit(values, covariates)
+    yhat, lower, upper = forecaster.predict(horizon, future_covariates)
+
+    forecasts = {
+        group: pd.DataFrame({'ds': output_dates, 'yhat': yhat[i], 'yhat_lower': lower[i], 'yhat_upper': upper[i]})
+        for i, group in enumerate(history.index)
+    }
+    return forecasts, errors
@@ -0,0 +1,78 @@
+#benchmarks/continuous_profile.py
+# 比较逐列pandas统计（原DataDescription._analyze_continuous的计算方式）与批量列式统计的耗时
+# 用法: python benchmarks/continuous_profile.py [行数] [列数]
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from profiler import profile_continuous
+
+
+def legacy_profile(data, columns):
+    """逐列、逐统计量的计算方式，每个统计量都是一次完整扫描"""
+    profiles = {}
+    for column in columns:
+        col_data = data[column].dropna()
+        q1 = col_data.quantile(0.25)
+        q3 = col_data.quantile(0.75)
+        iqr = q3 - q1
+        outliers = col_data[(col_data < q1 - 1.5 * iqr) | (col_data > q3 + 1.5 * iqr)]
+        profiles[column] = {
+            'count': len(col_data), 'min': float(col_data.min()), 'max': float(col_data.max()),
+            'mean': float(col_data.mean()), 'median': float(col_data.median()), 'std': float(col_data.std()),
+            'q1': float(col_data.quantile(0.25)), 'q3': float(col_data.quantile(0.75)),
+            'iqr': float(col_data.quantile(0.75) - col_data.quantile(0.25)), 'variance': float(col_data.var()),
+            'skewness': float(stats.skew(col_data)), 'kurtosis': float(stats.kurtosis(col_data)),
+            'outlier_count': int(len(outliers))
+        }
+    return profiles
+
+
+def make_data(n_rows, n_cols, seed=0):
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for i in range(n_cols):
+        if i % 4 == 0:
+            values = rng.integers(0, 100_000, n_rows).astype(np.int64)
+        elif i % 4 == 1:
+            values = rng.lognormal(0, 1, n_rows).astype(np.float32)
+        else:
+            values = rng.normal(i, 1, n_rows)
+            values[rng.random(n_rows) < 0.05] = np.nan
+        columns[f"col_{i}"] = values
+    return pd.DataFrame(columns)
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    n_cols = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    df = make_data(n_rows, n_cols)
+    columns = list(df.columns)
+
+    start = time.perf_counter()
+    legacy = legacy_profile(df, columns)
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = profile_continuous(df, columns)
+    batched_time = time.perf_counter() - start
+
+    max_rel_diff = max(
+        abs(batched[c][k] - legacy[c][k]) / max(abs(legacy[c][k]), 1e-12)
+        for c in columns for k in legacy[c]
+    )
+    print(f"rows={n_rows} columns={n_cols}")
+    print(f"per-column pandas: {legacy_time:.2f}s")
+    print(f"batched profiler:  {batched_time:.2f}s")
+    print(f"speedup:           {legacy_time / batched_time:.1f}x")
+    print(f"max relative difference: {max_rel_diff:.2e}")
+
+
+if __name__ == "__main__":
+    main()
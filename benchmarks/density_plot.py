@@ -0,0 +1,67 @@
+#benchmarks/density_plot.py
+# 比较连续变量分布图的两种绘制方式：sns.histplot(kde=True)直接处理原始列，
+# 与分析时预先计算直方图和FFT分箱核密度（density_summary）、绘图时只渲染数组
+# 用法: python benchmarks/density_plot.py [最大行数]
+import os
+import sys
+import time
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+import seaborn as sns
+from scipy.stats import gaussian_kde
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from density import density_summary
+from visualization import _plot_density
+
+
+def seaborn_plot(values):
+    fig, ax = plt.subplots(figsize=(8, 5))
+    sns.histplot(values, kde=True, ax=ax)
+    fig.canvas.draw()
+    plt.close(fig)
+
+
+def precomputed_plot(density):
+    fig, ax = plt.subplots(figsize=(8, 5))
+    _plot_density(ax, density)
+    fig.canvas.draw()
+    plt.close(fig)
+
+
+def main():
+    max_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    rng = np.random.default_rng(0)
+    n_rows = 125_000
+    while n_rows <= max_rows:
+        values = np.concatenate([rng.normal(size=n_rows // 2), rng.lognormal(1, 0.5, n_rows - n_rows // 2) + 3])
+
+        start = time.perf_counter()
+        seaborn_plot(values)
+        seaborn_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        density = density_summary(values)
+        profile_time = time.perf_counter() - start
+        start = time.perf_counter()
+        precomputed_plot(density)
+        render_time = time.perf_counter() - start
+
+        # 精确KDE（相同带宽）只在部分网格点上计算，作为误差参考
+        points = slice(None, None, 16)
+        grid = np.asarray(density["kde_grid"])[points]
+        reference = gaussian_kde(values)(grid)
+        kde_error = np.abs(np.asarray(density["kde_density"])[points] - reference).max() / reference.max()
+        print(f"rows={n_rows:>9} seaborn={seaborn_time:6.2f}s "
+              f"precompute={profile_time:5.3f}s render={render_time:5.3f}s "
+              f"speedup={seaborn_time / (profile_time + render_time):6.1f}x "
+              f"max kde diff={kde_error:.2%} of peak")
+        n_rows *= 2
+
+
+if __name__ == "__main__":
+    main()
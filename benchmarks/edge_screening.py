@@ -0,0 +1,79 @@
+#benchmarks/edge_screening.py
+# 比较DAGRelations在开启/关闭效应量预筛选时的分析耗时
+# 用法: python benchmarks/edge_screening.py [行数]
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dagrelation import DAGRelations, RelationCache
+from edgescreening import EdgeScreener
+
+
+def make_data(n_rows, seed=0):
+    """构造包含强关联和弱关联的混合类型数据"""
+    rng = np.random.default_rng(seed)
+    region = rng.choice([f"R{i}" for i in range(30)], n_rows)
+    channel = rng.choice(['online', 'store', 'partner', 'direct'], n_rows)
+    segment = rng.choice(['A', 'B', 'C'], n_rows)
+    fte = rng.normal(10, 2, n_rows)
+    potential = rng.lognormal(3, 0.5, n_rows)
+    region_effect = pd.Series(rng.normal(0, 5, 30), index=[f"R{i}" for i in range(30)])
+    sales = 3 * fte + 0.5 * potential + region_effect[region].to_numpy() + rng.normal(0, 3, n_rows)
+    noise_num = rng.normal(size=n_rows)
+    tier = np.where(sales > np.median(sales), 'high', 'low')
+    return pd.DataFrame({
+        'region': region, 'channel': channel, 'segment': segment, 'fte': fte,
+        'potential': potential, 'sales': sales, 'noise_num': noise_num, 'tier': tier
+    })
+
+
+DAG_EDGES = [
+    ('fte', 'sales'),
+    ('potential', 'sales'),
+    ('region', 'sales'),
+    ('channel', 'sales'),
+    ('segment', 'sales'),
+    ('noise_num', 'sales'),
+    ('region', 'tier'),
+    ('channel', 'tier'),
+    ('segment', 'channel'),
+    ('noise_num', 'tier'),
+    (['fte', 'potential'], 'sales'),
+    (['channel', 'segment'], 'sales'),
+    (['channel', 'noise_num'], 'tier'),
+]
+
+
+def timed(df, screening):
+    start = time.perf_counter()
+    analyzer = DAGRelations(df, DAG_EDGES, cache=RelationCache(), screening=screening).analyze_relations()
+    return time.perf_counter() - start, analyzer
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    df = make_data(n_rows)
+
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        full_time, _ = timed(df, None)
+        screened_time, analyzer = timed(df, EdgeScreener())
+    finally:
+        sys.stdout.close()
+        sys.stdout = sys.__stdout__
+
+    print(f"rows={n_rows} edges={len(DAG_EDGES)} screened_out={len(analyzer.screened_edges)}")
+    print(f"full analysis:     {full_time:.2f}s")
+    print(f"with screening:    {screened_time:.2f}s")
+    print(f"time saved:        {(1 - screened_time / full_time) * 100:.1f}%")
+    for edge, result in analyzer.screened_edges.items():
+        print(f"  weak: {edge[0]} -> {edge[1]} (strength={result['strength']:.4f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#benchmarks/excel_ingestion.py
+# 比较pandas.read_excel与XlsxReader解析同一个销售工作簿的耗时，以及页面重新运行时从Parquet缓存加载的耗时
+# 用法: python benchmarks/excel_ingestion.py [行数]   默认200000行
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingestion import IngestionCache, XlsxReader, load_table
+
+
+def make_data(n_rows, seed=0):
+    """预测页面的典型输入：日期、分组、目标和协变量"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'date': pd.Timestamp('2015-01-01') + pd.to_timedelta(rng.integers(0, 3000, n_rows), unit='D'),
+        'month': rng.integers(201501, 202412, n_rows),
+        'region': rng.choice(['North', 'South', 'East', 'West'], n_rows),
+        'store': rng.choice([f"S{i:03d}" for i in range(300)], n_rows),
+        'sales': rng.gamma(2, 50, n_rows).round(2),
+        'units': rng.integers(0, 200, n_rows),
+        'price': rng.uniform(1, 20, n_rows).round(2),
+        # 有空白的布尔列：read_excel推断为float64，解析结果的dtype需要一致
+        'promo': np.where(rng.random(n_rows) < 0.1, None, rng.random(n_rows) < 0.3),
+    })
+
+
+def timed(func, repeat=1):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'sales.xlsx')
+        make_data(n_rows).to_excel(path, index=False)
+        print(f"rows={n_rows} file={os.path.getsize(path) / 1e6:.1f}MB")
+
+        expected, read_excel_time = timed(lambda: pd.read_excel(path))
+        result, reader_time = timed(lambda: XlsxReader(path).read())
+        pd.testing.assert_frame_equal(expected, result)
+        print(f"dtypes match pd.read_excel: {dict(result.dtypes.astype(str))}")
+        print(f"{'pd.read_excel':<28} {read_excel_time:7.3f}s")
+        print(f"{'XlsxReader':<28} {reader_time:7.3f}s  ({read_excel_time / reader_time:.1f}x)")
+        _, usecols_time = timed(lambda: XlsxReader(path).read(usecols=['date', 'store', 'sales']))
+        print(f"{'XlsxReader (3 columns)':<28} {usecols_time:7.3f}s")
+
+        cache = IngestionCache(os.path.join(directory, 'cache'))
+        _, miss_time = timed(lambda: load_table(path, cache=cache))
+        cached, hit_time = timed(lambda: load_table(path, cache=cache), repeat=5)
+        pd.testing.assert_frame_equal(expected, cached)
+        print(f"{'load_table (first upload)':<28} {miss_time:7.3f}s")
+        print(f"{'load_table (rerun, cached)':<28} {hit_time:7.3f}s  ({read_excel_time / hit_time:.0f}x)")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#benchmarks/forecast_baselines.py
+# 比较基线预测模型（一次拟合所有分组）与逐组拟合的Prophet的耗时和验证期准确度
+# 用法: python benchmarks/forecast_baselines.py [分组数]   默认20个分组×6年月数据，最后12个月为验证期
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from baselines import BASELINE_MODELS, forecast_baseline
+from forecasting import ForecastEngine, build_forecast_tasks, prepare_panel, write_forecasts
+from forecastmetrics import forecast_metrics
+
+START, TRAINING_END, END = '2019-01-01', '2023-12-01', '2024-12-01'
+
+
+def make_data(n_groups, seed=0):
+    """月数据：分组各自的水平、趋势和年季节振幅，乘以价格弹性，加噪声"""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(START, END, freq='MS')
+    t = np.arange(len(dates))
+    level = rng.uniform(50, 500, (n_groups, 1))
+    trend = rng.normal(0.005, 0.005, (n_groups, 1))
+    amplitude = rng.uniform(0.05, 0.3, (n_groups, 1))
+    price = rng.normal(10, 1, (n_groups, len(dates)))
+    sales = level * (1 + trend * t) * (1 + amplitude * np.sin(2 * np.pi * t / 12)) * (1 - 0.05 * (price - 10))
+    sales = sales * rng.normal(1, 0.05, sales.shape)
+    data = pd.DataFrame({
+        'date': np.tile(dates, n_groups),
+        'group': np.repeat([f"store_{i}" for i in range(n_groups)], len(dates)),
+        'sales': sales.ravel(),
+        'price': price.ravel()
+    })
+    return data, dates
+
+
+def evaluate(panel, forecasts):
+    panel = write_forecasts(panel.copy(), forecasts)
+    periods = {
+        'training': (panel['date'] >= START) & (panel['date'] <= TRAINING_END),
+        'validation': panel['date'] > TRAINING_END
+    }
+    metrics = forecast_metrics(panel, 'sales', periods, season_length=12, overall=False)
+    validation = metrics.xs('validation', level='period')
+    return validation['wape'].mean(), validation['mase'].mean(), validation['coverage'].mean()
+
+
+def main():
+    n_groups = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    data, dates = make_data(n_groups)
+    groups = list(pd.unique(data['group']))
+    panel, covariate_means = prepare_panel(data, dates, groups, 'sales', ['price'], [])
+
+    results = []
+    start = time.perf_counter()
+    tasks, _ = build_forecast_tasks(panel, groups, START, TRAINING_END, END, 'MS', 'sales', ['price'],
+                                    covariate_means)
+    forecasts, errors = ForecastEngine(interval_width=0.6, covariate_columns=['price'], n_jobs=1).run(tasks)
+    assert not errors, errors
+    results.append(('Prophet', time.perf_counter() - start, evaluate(panel, forecasts)))
+
+    for name, model in BASELINE_MODELS.items():
+        start = time.perf_counter()
+        forecasts, errors = forecast_baseline(panel, groups, START, TRAINING_END, END, 'MS', 'sales', model,
+                                              ['price'], interval_width=0.6)
+        assert not errors, errors
+        results.append((name, time.perf_counter() - start, evaluate(panel, forecasts)))
+
+    print(f"groups={n_groups} validation=12 months, interval_width=0.6")
+    for name, seconds, (wape, mase, coverage) in results:
+        print(f"{name:<20} time={seconds:8.3f}s  WAPE={wape:6.2f}%  MASE={mase:5.2f}  coverage={coverage:5.1f}%")
+
+    # 基线模型在大规模分组上的耗时
+    for large in (1_000, 10_000):
+        data, dates = make_data(large)
+        groups = list(pd.unique(data['group']))
+        panel, _ = prepare_panel(data, dates, groups, 'sales', ['price'], [])
+        for name, model in BASELINE_MODELS.items():
+            start = time.perf_counter()
+            forecast_baseline(panel, groups, START, TRAINING_END, END, 'MS', 'sales', model, ['price'])
+            print(f"groups={large:>6} {name:<20} time={time.perf_counter() - start:7.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#benchmarks/forecast_hierarchy.py
+# 比较各层级分别预测再调和与原来的做法（只预测分组，整体为分组预测之和）在总计和分组上的验证期准确度，
+# 以及大规模层级上一次调和的耗时
+# 用法: python benchmarks/forecast_hierarchy.py [模型]   模型为baselines中的名称，默认holt_winters
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from baselines import forecast_baseline
+from forecasting import prepare_panel, write_forecasts
+from forecastmetrics import forecast_metrics
+from hierarchy import RECONCILIATION_METHODS, TOTAL, Hierarchy, reconcile_forecasts
+
+START, TRAINING_END, END = '2019-01-01', '2023-12-01', '2024-12-01'
+
+
+def make_data(n_regions=5, n_stores=40, seed=0):
+    """月数据：区域共同的季节和趋势 + 门店自身的大噪声（分组层面信噪比低，汇总后信号清晰）"""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(START, END, freq='MS')
+    t = np.arange(len(dates))
+    rows = []
+    for r in range(n_regions):
+        regional = (1 + 0.004 * (r + 1) * t) * (1 + 0.25 * np.sin(2 * np.pi * (t + r) / 12))
+        for s in range(n_stores):
+            level = rng.uniform(20, 200)
+            sales = np.maximum(level * regional * rng.normal(1, 0.35, len(dates)), 0)
+            rows.append(pd.DataFrame({'date': dates, 'region': f"R{r}", 'store': f"S{s}", 'sales': sales}))
+    data = pd.concat(rows, ignore_index=True)
+    data['group'] = data['region'] + '_' + data['store']
+    return data, dates
+
+
+def validation_wape(panel):
+    mask = panel['date'] > TRAINING_END
+    metrics = forecast_metrics(panel, 'sales', {'validation': mask}, overall=False)
+    return metrics.xs('validation', level='period')['wape']
+
+
+def main():
+    model = sys.argv[1] if len(sys.argv) > 1 else 'holt_winters'
+    data, dates = make_data()
+    groups = list(pd.unique(data['group']))
+    panel, _ = prepare_panel(data, dates, groups, 'sales', [], ['region', 'store'])
+    hierarchy = Hierarchy.from_panel(panel, ['region', 'store'])
+    aggregate_panel = hierarchy.aggregate_panel(panel, 'sales')
+    base_panel = pd.concat([panel[aggregate_panel.columns], aggregate_panel], ignore_index=True)
+    nodes = hierarchy.nodes['node'].tolist()
+
+    forecasts, errors = forecast_baseline(base_panel, nodes, START, TRAINING_END, END, 'MS', 'sales', model)
+    assert not errors, errors
+    history = base_panel.pivot_table(index='group', columns='date', values='sales', aggfunc='sum')
+    training_dates = dates[dates <= TRAINING_END]
+
+    def evaluate(node_forecasts):
+        scored = write_forecasts(base_panel.copy(), node_forecasts)
+        wape = validation_wape(scored)
+        return wape[TOTAL], wape[hierarchy.aggregate_nodes[1:]].mean(), wape[groups].mean()
+
+    # 原来的做法：只预测分组，汇总节点为分组预测之和（即bottom_up）
+    leaf_only = reconcile_forecasts(hierarchy, {g: forecasts[g] for g in groups}, history, training_dates,
+                                    'bottom_up')
+    print(f"model={model} regions=5 stores/region=40, WAPE over the 12-month validation period")
+    total, region, leaf = evaluate(leaf_only)
+    print(f"{'sum of groups (before)':<24} total={total:6.2f}%  regions={region:6.2f}%  groups={leaf:6.2f}%")
+    total, region, leaf = evaluate(forecasts)
+    print(f"{'base (incoherent)':<24} total={total:6.2f}%  regions={region:6.2f}%  groups={leaf:6.2f}%")
+    for method in RECONCILIATION_METHODS:
+        reconciled = reconcile_forecasts(hierarchy, forecasts, history, training_dates, method)
+        total, region, leaf = evaluate(reconciled)
+        print(f"{method:<24} total={total:6.2f}%  regions={region:6.2f}%  groups={leaf:6.2f}%")
+
+    # 大规模：20个区域 x 500个门店（10000个分组），5年日数据预测1年
+    rng = np.random.default_rng(1)
+    leaves = pd.DataFrame({'region': np.repeat([f"R{i}" for i in range(20)], 500),
+                           'store': np.tile([f"S{i}" for i in range(500)], 20)})
+    leaves['group'] = leaves['region'] + '_' + leaves['store']
+    start = time.perf_counter()
+    large = Hierarchy(leaves, ['region', 'store'])
+    build_time = time.perf_counter() - start
+    base = rng.normal(100, 10, (len(large.nodes), 365 * 6))
+    variance = rng.uniform(1, 10, len(large.nodes))
+    for method in ['bottom_up', 'wls', 'mint']:
+        start = time.perf_counter()
+        large.reconcile(base, method, residual_variance=variance)
+        print(f"nodes={len(large.nodes)} dates={base.shape[1]} {method:<10} reconcile={time.perf_counter() - start:6.3f}s "
+              f"(hierarchy build {build_time:.3f}s)")
+
+
+if __name__ == "__main__":
+    main()
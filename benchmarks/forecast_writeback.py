@@ -0,0 +1,70 @@
+#benchmarks/forecast_writeback.py
+# 比较销售预测结果写回面板数据的两种方式：逐行布尔掩码+.loc赋值（原实现）与按(group, date)的索引对齐
+# 用法: python benchmarks/forecast_writeback.py [最大分组数]
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from forecasting import write_forecasts
+
+N_DATES = 60
+
+
+def make_data(n_groups, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2021-01-01', periods=N_DATES, freq='MS')
+    groups = np.array([f"store_{i}" for i in range(n_groups)], dtype=object)
+    panel = pd.DataFrame({'date': np.tile(dates, n_groups), 'group': np.repeat(groups, N_DATES)})
+    panel['sales'] = rng.gamma(5, 10, len(panel))
+    forecasts = {}
+    for group in groups:
+        yhat = rng.gamma(5, 10, N_DATES)
+        forecasts[group] = pd.DataFrame({'ds': dates, 'yhat': yhat, 'yhat_lower': yhat * 0.8, 'yhat_upper': yhat * 1.2})
+    return panel.sort_values(['group', 'date']), forecasts
+
+
+def legacy_write_back(df_copy, forecasts):
+    for group, forecast in forecasts.items():
+        for i, row in forecast.iterrows():
+            forecast_date = row['ds']
+            mask = (df_copy['group'] == group) & (df_copy['date'] == forecast_date)
+            df_copy.loc[mask, 'forecast'] = row['yhat']
+            df_copy.loc[mask, 'forecast_lower'] = row['yhat_lower']
+            df_copy.loc[mask, 'forecast_upper'] = row['yhat_upper']
+    return df_copy
+
+
+def main():
+    max_groups = int(sys.argv[1]) if len(sys.argv) > 1 else 80
+    n_groups = 10
+    while n_groups <= max_groups:
+        panel, forecasts = make_data(n_groups)
+
+        start = time.perf_counter()
+        legacy = legacy_write_back(panel.copy(), forecasts)
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        indexed = write_forecasts(panel.copy(), forecasts)
+        indexed_time = time.perf_counter() - start
+
+        columns = ['forecast', 'forecast_lower', 'forecast_upper']
+        assert np.allclose(legacy[columns].to_numpy(), indexed[columns].to_numpy())
+        print(f"groups={n_groups:>5} rows={len(panel):>7} loop={legacy_time:7.2f}s "
+              f"indexed={indexed_time:6.4f}s speedup={legacy_time / indexed_time:7.0f}x")
+        n_groups *= 2
+    # 原实现的耗时随行数平方增长，更大的规模只测量索引对齐
+    for n_groups in (10_000, 50_000):
+        panel, forecasts = make_data(n_groups)
+        start = time.perf_counter()
+        write_forecasts(panel, forecasts)
+        print(f"groups={n_groups:>5} rows={len(panel):>7} indexed={time.perf_counter() - start:6.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+#benchmarks/model_store.py
+# 比较磁盘缓存每次写入都扫描目录（evict_every=1）与分批清理的写入耗时：列描述缓存（ProfileCache）
+# 和已拟合模型存储（ModelStore），并检查模型存储占用的磁盘空间不超过max_bytes
+# 用法: python benchmarks/model_store.py [模型数]   默认5000个
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modelstore import ModelStore
+from profilecache import ProfileCache
+
+# 与一个小型Prophet模型的JSON大小相当
+PAYLOAD = 'x' * 20_000
+
+
+def fill(store, n_models):
+    start = time.perf_counter()
+    for i in range(n_models):
+        store.put(f"group_{i}", {'format': 'prophet-json', 'payload': PAYLOAD})
+    return time.perf_counter() - start
+
+
+def main():
+    n_models = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    max_bytes = n_models * len(PAYLOAD) // 4
+    directory = tempfile.mkdtemp()
+    try:
+        for name, make in (
+                ('ProfileCache', lambda path, **kwargs: ProfileCache(path, max_entries=n_models // 2, **kwargs)),
+                ('ModelStore', lambda path, **kwargs: ModelStore(path, max_entries=n_models, max_bytes=max_bytes,
+                                                                 **kwargs))):
+            per_write_scan = fill(make(os.path.join(directory, f"{name}_scan"), evict_every=1), n_models)
+            store = make(os.path.join(directory, name))
+            batched = fill(store, n_models)
+            print(f"{name + ' (scan on every put)':<34} {per_write_scan:7.2f}s")
+            print(f"{name:<34} {batched:7.2f}s  ({per_write_scan / batched:.1f}x)")
+        used = sum(entry.stat().st_size for entry in os.scandir(store.directory))
+        assert used <= max_bytes, f"model store uses {used} bytes, limit {max_bytes}"
+        print(f"models={n_models} kept={len(store)} disk={used / 1e6:.1f}MB (limit {max_bytes / 1e6:.1f}MB)")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#benchmarks/parallel_profile.py
+# 比较DataDescription串行与多进程模式在宽表（含大量文本列）上的耗时
+# 用法: python benchmarks/parallel_profile.py [行数] [文本列数] [进程数]
+import contextlib
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datadescription import DataDescription
+
+WORDS = np.array("the quick brown fox jumps over lazy dog revenue growth customer region "
+                 "product market channel order forecast 销售 客户 区域 产品 增长".split())
+
+
+def make_data(n_rows, n_text, seed=0):
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for i in range(n_text):
+        lengths = rng.integers(3, 15, n_rows)
+        tokens = rng.choice(WORDS, lengths.sum())
+        columns[f"text_{i}"] = [" ".join(t) for t in np.split(tokens, np.cumsum(lengths)[:-1])]
+        columns[f"cat_{i}"] = rng.choice(['A', 'B', 'C', 'D'], n_rows)
+        columns[f"num_{i}"] = rng.normal(size=n_rows)
+    return pd.DataFrame(columns)
+
+
+def timed(df, n_jobs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        describer = DataDescription(df, n_jobs=n_jobs).analyze_data()
+        elapsed = time.perf_counter() - start
+    return elapsed, describer
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    n_text = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    n_jobs = int(sys.argv[3]) if len(sys.argv) > 3 else (os.cpu_count() or 1)
+    df = make_data(n_rows, n_text)
+
+    serial_time, serial = timed(df, 1)
+    parallel_time, parallel = timed(df, n_jobs)
+    identical = (list(serial.descriptions) == list(parallel.descriptions) and serial.errors == parallel.errors)
+
+    print(f"rows={n_rows} columns={df.shape[1]} cores={os.cpu_count()} n_jobs={n_jobs}")
+    print(f"serial:   {serial_time:.2f}s")
+    print(f"parallel: {parallel_time:.2f}s")
+    print(f"speedup:  {serial_time / parallel_time:.2f}x")
+    print(f"same column order and errors: {identical}")
+
+
+if __name__ == "__main__":
+    main()
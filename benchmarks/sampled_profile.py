@@ -0,0 +1,73 @@
+#benchmarks/sampled_profile.py
+# 比较DataDescription全量分析与分层抽样模式（sample_rows='auto'）在不同行数下的耗时和误差
+# 运行前先检查稀疏列：样本中全部缺失、但传入的类型为continuous的列也要得到精确的描述
+# 用法: python benchmarks/sampled_profile.py [最大行数]
+import contextlib
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datadescription import DataDescription
+
+
+def make_data(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    texts = np.array(["good product fast shipping", "bad", "would buy again. great value", "ok"])
+    return pd.DataFrame({
+        "revenue": rng.lognormal(size=n_rows),
+        "units": rng.poisson(20, n_rows).astype(float),
+        "region": rng.choice(list("ABCDE"), n_rows, p=[.4, .3, .15, .1, .05]),
+        "promo": rng.random(n_rows) < .3,
+        "date": pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 1000, n_rows), "D"),
+        "comment": texts[rng.integers(0, 4, n_rows)],
+    })
+
+
+def timed(df, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        describer = DataDescription(df, **kwargs).analyze_data()
+        return time.perf_counter() - start, describer.descriptions
+
+
+def check_sparse_column(n_rows=300_000):
+    """非缺失值都不在样本中的稀疏列：用页面传入的列类型时也应对非缺失行精确分析，而不是报错丢弃"""
+    df = make_data(n_rows)
+    df["sparse"] = np.nan
+    sampled_rows = set(DataDescription(df, sample_rows='auto')._sample_positions())
+    rows = [i for i in range(n_rows) if i not in sampled_rows][:3]
+    df.loc[rows, "sparse"] = [0.5, 1.25, 7.0]
+    with contextlib.redirect_stdout(io.StringIO()):
+        describer = DataDescription(df, sample_rows='auto', column_types={"sparse": "continuous"}).analyze_data()
+    assert not describer.errors, describer.errors
+    sparse = describer.descriptions["sparse"]
+    assert sparse["type"] == "continuous" and sparse["count"] == 3 and sparse["mean"] == np.mean([0.5, 1.25, 7.0])
+    print("sparse column outside the sample: ok")
+
+
+def main():
+    check_sparse_column()
+    max_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 4_000_000
+    n_rows = 250_000
+    while n_rows <= max_rows:
+        df = make_data(n_rows)
+        exact_time, exact = timed(df)
+        sampled_time, sampled = timed(df, sample_rows='auto')
+        approximation = sampled["revenue"]["approximation"]
+        mean_error = abs(sampled["revenue"]["mean"] - exact["revenue"]["mean"])
+        share_error = abs(sampled["region"]["most_common"]["percentage"] - exact["region"]["most_common"]["percentage"])
+        print(f"rows={n_rows:>9} exact={exact_time:6.2f}s sampled={sampled_time:5.2f}s "
+              f"sample={approximation['sample_count']} "
+              f"|mean err|={mean_error:.4f} (margin {approximation['mean_margin']:.4f}) "
+              f"|share err|={share_error:.2f}pp (margin {approximation['proportion_margin']:.2f}pp)")
+        n_rows *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+#dagdiscovery.py
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+
+def column_types_from_description(descriptions):
+    """
+    将DataDescription.descriptions或TypeInference.column_types中的列类型转换为结构学习使用的类型
+
+    参数:
+    descriptions (dict): 列名 -> 列描述（含'type'）或类型字符串
+
+    返回:
+    dict: 列名 -> 'continuous' 或 'categorical'（布尔列按分类处理，字符串、日期等列不参与结构学习）
+    """
+    column_types = {}
+    for col, desc in descriptions.items():
+        col_type = desc.get('type') if isinstance(desc, dict) else desc
+        if col_type == 'continuous':
+            column_types[col] = 'continuous'
+        elif col_type in ('categorical', 'boolean'):
+            column_types[col] = 'categorical'
+    return column_types
+
+
+class StructureDiscovery:
+    def __init__(self, data, column_types=None, alpha=0.01, max_cond_size=2,
+                 max_categories=20, n_bins=5, max_rows=50000, max_columns=30,
+                 seed=42, n_jobs=4):
+        """
+        基于PC算法（PC-stable）的本地DAG结构学习，支持连续与分类混合数据。
+
+        Parameters:
+        data (pandas.DataFrame): 数据
+        column_types (dict): 列名 -> 'continuous'/'categorical'，可由column_types_from_description生成；
+                             为None时根据dtype和唯一值数量推断
+        alpha (float): 条件独立性检验的显著性水平
+        max_cond_size (int): 条件集的最大大小
+        max_categories (int): 分类变量允许的最大类别数，超过的列被忽略
+        n_bins (int): 连续变量参与混合检验时的分位数分箱数
+        max_rows (int): 参与学习的最大行数（超出时随机抽样）
+        max_columns (int): 参与学习的最大列数
+        seed (int): 抽样的随机种子
+        n_jobs (int): 并行执行条件独立性检验的线程数
+        """
+        self.data = data
+        self.alpha = alpha
+        self.max_cond_size = max_cond_size
+        self.max_categories = max_categories
+        self.n_bins = n_bins
+        self.max_rows = max_rows
+        self.max_columns = max_columns
+        self.seed = seed
+        self.n_jobs = n_jobs
+        self.column_types = self._resolve_column_types(column_types)
+        self.columns = list(self.column_types)
+        self.adjacency = {}
+        self.sepsets = {}
+        self.pvalues = {}
+        self.directed = set()
+        self.undirected = set()
+        self.n_tests = 0
+        self.elapsed = None
+        self._counts_cache = {}
+
+    def _resolve_column_types(self, column_types):
+        if column_types is None:
+            column_types = {}
+            for col in self.data.columns:
+                series = self.data[col]
+                n_unique = series.nunique(dropna=True)
+                if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series) \
+                        and n_unique > min(10, len(series) // 10):
+                    column_types[col] = 'continuous'
+                elif 1 < n_unique <= self.max_categories:
+                    column_types[col] = 'categorical'
+
+        resolved = {}
+        for col, col_type in column_types.items():
+            if col not in self.data.columns or col_type not in ('continuous', 'categorical'):
+                continue
+            if col_type == 'categorical' and not 1 < self.data[col].nunique(dropna=True) <= self.max_categories:
+                continue
+            resolved[col] = col_type
+            if len(resolved) >= self.max_columns:
+                print(f"Structure discovery limited to the first {self.max_columns} usable columns")
+                break
+        return resolved
+
+    def _prepare(self):
+        """抽样并预计算充分统计量：连续变量相关矩阵和所有变量的离散编码"""
+        frame = self.data[self.columns].dropna()
+        if len(frame) > self.max_rows:
+            frame = frame.sample(self.max_rows, random_state=self.seed)
+        self.n = len(frame)
+
+        self.codes = {}
+        self.cardinality = {}
+        for col in self.columns:
+            if self.column_types[col] == 'continuous':
+                ranks = frame[col].rank(method='first').to_numpy()
+                codes = np.minimum(((ranks - 1) * self.n_bins / max(self.n, 1)).astype(np.int64), self.n_bins - 1)
+            else:
+                codes = pd.factorize(frame[col])[0].astype(np.int64)
+            self.codes[col] = codes
+            self.cardinality[col] = int(codes.max()) + 1 if len(codes) else 0
+
+        self.continuous = [c for c in self.columns if self.column_types[c] == 'continuous']
+        self._cont_index = {c: i for i, c in enumerate(self.continuous)}
+        if self.continuous:
+            self.corr = np.atleast_2d(np.corrcoef(frame[self.continuous].to_numpy(dtype=float), rowvar=False))
+        else:
+            self.corr = np.zeros((0, 0))
+
+    def _counts(self, columns):
+        """多个离散编码列的联合频数表（按列组合缓存）"""
+        key = tuple(columns)
+        table = self._counts_cache.get(key)
+        if table is None:
+            shape = tuple(self.cardinality[c] for c in columns)
+            flat = np.ravel_multi_index([self.codes[c] for c in columns], shape)
+            table = np.bincount(flat, minlength=int(np.prod(shape))).reshape(shape)
+            self._counts_cache[key] = table
+        return table
+
+    def _fisher_z(self, x, y, cond):
+        idx = [self._cont_index[c] for c in (x, y) + tuple(cond)]
+        sub = self.corr[np.ix_(idx, idx)]
+        precision = np.linalg.pinv(sub)
+        denom = np.sqrt(precision[0, 0] * precision[1, 1])
+        r = -precision[0, 1] / denom if denom > 0 else 0.0
+        r = float(np.clip(r, -0.999999, 0.999999))
+        dof = self.n - len(cond) - 3
+        if dof <= 0:
+            return 1.0
+        z = 0.5 * np.log((1 + r) / (1 - r)) * np.sqrt(dof)
+        return float(2 * stats.norm.sf(abs(z)))
+
+    def _g_test(self, x, y, cond):
+        x, y = sorted((x, y))
+        table = self._counts((x, y) + tuple(sorted(cond))).astype(float)
+        table = table.reshape(table.shape[0], table.shape[1], -1)
+        n_xz = table.sum(axis=1, keepdims=True)
+        n_yz = table.sum(axis=0, keepdims=True)
+        n_z = table.sum(axis=(0, 1), keepdims=True)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            expected = n_xz * n_yz / n_z
+            g = 2 * np.nansum(np.where(table > 0, table * np.log(table / expected), 0.0))
+        rows = (n_xz[:, 0, :] > 0).sum(axis=0)
+        cols = (n_yz[0, :, :] > 0).sum(axis=0)
+        dof = int(np.sum(np.maximum(rows - 1, 0) * np.maximum(cols - 1, 0)))
+        # 样本量相对自由度不足时检验不可靠，按独立处理
+        if dof <= 0 or self.n < 5 * dof:
+            return 1.0
+        return float(stats.chi2.sf(g, dof))
+
+    def ci_test(self, x, y, cond):
+        """条件独立性检验，返回p值（越大越倾向于条件独立）"""
+        if all(self.column_types[c] == 'continuous' for c in (x, y) + tuple(cond)):
+            return self._fisher_z(x, y, cond)
+        return self._g_test(x, y, cond)
+
+    def _test_pair(self, x, y, candidates, level):
+        """在给定大小的条件集中寻找使x、y独立的集合"""
+        max_p = 0.0
+        tests = 0
+        for cond in itertools.combinations(sorted(candidates), level):
+            p = self.ci_test(x, y, cond)
+            tests += 1
+            max_p = max(max_p, p)
+            if p > self.alpha:
+                return (x, y), cond, p, tests
+        return (x, y), None, max_p, tests
+
+    def discover(self):
+        """运行PC-stable算法：学习骨架，再确定v结构并应用Meek规则定向"""
+        start = time.time()
+        self._prepare()
+        self.adjacency = {c: set(self.columns) - {c} for c in self.columns}
+        self.sepsets = {}
+        self.pvalues = {}
+        self.n_tests = 0
+
+        level = 0
+        with ThreadPoolExecutor(max_workers=max(1, self.n_jobs)) as executor:
+            while level <= self.max_cond_size:
+                # PC-stable: 同一层的检验使用本层开始时的邻接关系，彼此独立可并行
+                snapshot = {c: set(adj) for c, adj in self.adjacency.items()}
+                jobs = []
+                for x, y in itertools.combinations(self.columns, 2):
+                    if y not in snapshot[x]:
+                        continue
+                    candidates = (snapshot[x] | snapshot[y]) - {x, y} if level > 0 else set()
+                    if len(candidates) < level:
+                        continue
+                    jobs.append((x, y, candidates))
+                if not jobs:
+                    break
+
+                results = executor.map(lambda job: self._test_pair(job[0], job[1], job[2], level), jobs)
+                for (x, y), cond, p, tests in results:
+                    self.n_tests += tests
+                    key = frozenset((x, y))
+                    if cond is not None:
+                        self.adjacency[x].discard(y)
+                        self.adjacency[y].discard(x)
+                        self.sepsets[key] = set(cond)
+                        self.pvalues.pop(key, None)
+                    else:
+                        self.pvalues[key] = min(self.pvalues.get(key, 1.0), p)
+                level += 1
+
+        self._orient()
+        self.elapsed = time.time() - start
+        print(f"Structure discovery: {len(self.columns)} columns, {self.n_tests} CI tests, "
+              f"{len(self.directed)} directed and {len(self.undirected)} undirected edges in {self.elapsed:.2f}s")
+        return self
+
+    def _orient(self):
+        directed = set()
+        undirected = {frozenset((x, y)) for x in self.columns for y in self.adjacency[x]}
+
+        # v结构: x - z - y 且 x、y不相邻、z不在sepset(x, y)中 => x -> z <- y
+        for z in self.columns:
+            for x, y in itertools.combinations(sorted(self.adjacency[z]), 2):
+                if y in self.adjacency[x]:
+                    continue
+                if z in self.sepsets.get(frozenset((x, y)), set()):
+                    continue
+                for a in (x, y):
+                    if frozenset((a, z)) in undirected and (z, a) not in directed:
+                        undirected.discard(frozenset((a, z)))
+                        directed.add((a, z))
+
+        # Meek规则1和2
+        changed = True
+        while changed:
+            changed = False
+            for edge in list(undirected):
+                a, b = tuple(edge)
+                for u, v in ((a, b), (b, a)):
+                    rule1 = any(w != v and v not in self.adjacency[w] and (w, u) in directed for w in self.columns)
+                    rule2 = any((u, w) in directed and (w, v) in directed for w in self.columns)
+                    if rule1 or rule2:
+                        undirected.discard(edge)
+                        directed.add((u, v))
+                        changed = True
+                        break
+
+        self.directed = directed
+        self.undirected = undirected
+
+    def dag_edges(self, include_multi=True, max_parents=4):
+        """
+        转换为DAGRelations可用的边列表。无法确定方向的边按列顺序定向（保持无环）。
+
+        Parameters:
+        include_multi (bool): 为有多个父节点的变量额外生成多对一关系
+        max_parents (int): 多对一关系中的最大父节点数
+        """
+        order = {c: i for i, c in enumerate(self.columns)}
+        edges = set(self.directed)
+        for edge in sorted(self.undirected, key=lambda e: sorted(order[c] for c in e)):
+            a, b = sorted(edge, key=order.get)
+            edges.add((b, a) if self._reaches(edges, b, a) else (a, b))
+
+        ordered = sorted(edges, key=lambda e: (order[e[1]], order[e[0]]))
+        dag = [(src, tgt) for src, tgt in ordered]
+        if include_multi:
+            parents = {}
+            for src, tgt in ordered:
+                parents.setdefault(tgt, []).append(src)
+            for tgt, srcs in parents.items():
+                if 2 <= len(srcs) <= max_parents:
+                    dag.append((srcs, tgt))
+        return dag
+
+    @staticmethod
+    def _reaches(edges, start, goal):
+        """edges中是否存在从start到goal的有向路径"""
+        stack, seen = [start], set()
+        while stack:
+            node = stack.pop()
+            if node == goal:
+                return True
+            if node in seen:
+                continue
+            seen.add(node)
+            stack.extend(t for s, t in edges if s == node)
+        return False
+
+    def to_dag_definition(self):
+        """生成与LLM输出相同格式的dag_edges定义文本"""
+        lines = ["dag_edges = ["]
+        lines += [f"    {edge!r}," for edge in self.dag_edges()]
+        lines.append("]")
+        return "\n".join(lines)
+
+    def to_prompt(self):
+        """生成作为LLM先验的候选DAG说明"""
+        lines = [f"本地结构学习（PC算法，alpha={self.alpha}，{self.n}行，{self.n_tests}次条件独立性检验）得到的候选关系："]
+        for src, tgt in sorted(self.directed):
+            p = self.pvalues.get(frozenset((src, tgt)))
+            lines.append(f"- {src} -> {tgt}" + (f" (p={p:.2g})" if p is not None else ""))
+        for edge in sorted(self.undirected, key=sorted):
+            a, b = sorted(edge)
+            p = self.pvalues.get(edge)
+            lines.append(f"- {a} -- {b}（方向无法从数据确定）" + (f" (p={p:.2g})" if p is not None else ""))
+        if not self.directed and not self.undirected:
+            lines.append("- 未发现显著的依赖关系")
+        ignored = [c for c in self.data.columns if c not in self.column_types]
+        if ignored:
+            lines.append(f"未参与结构学习的列（文本、日期或类别过多）：{', '.join(map(str, ignored))}")
+        return "\n".join(lines)
@@ -1,4 +1,5 @@
 #verison 3.1 add more details on categorical vars + add condition prob for multi -> categorical analysis + 修改报告输出以优化分类变量统计信息的显示
+#verison 3.2 边分析支持重抽样置信区间、弱边预筛选，缓存条目记录筛选结果
 
 import pandas as pd
 import numpy as np
@@ -7,50 +8,334 @@ from sklearn.linear_model import LinearRegression
 from sklearn.preprocessing import LabelEncoder
 import statsmodels.api as sm
 import warnings
+from collections import OrderedDict
+from fingerprint import column_fingerprint, combine_fingerprints
+from dagreport import build_report
+
+# 分析逻辑版本号，修改任何边的计算方式时需要递增，使旧的缓存结果失效
+ANALYSIS_VERSION = "3.2"
+
+
+def _is_numeric_dtype(dtype):
+    """数值类型判断（兼容Int64等可空类型），布尔列视为分类变量"""
+    return pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+
+
+def _drop_unused_categories(frame, columns):
+    """删除category列中已不出现的类别（如删除缺失值后），避免分组统计和列联表中出现空类别"""
+    categorical = [col for col in columns if isinstance(frame[col].dtype, pd.CategoricalDtype)]
+    if not categorical:
+        return frame
+    frame = frame.copy(deep=False)
+    for col in categorical:
+        frame[col] = frame[col].cat.remove_unused_categories()
+    return frame
+
+
+class RelationCache:
+    """按内容寻址的边分析结果缓存（LRU）"""
+
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# 进程内共享的默认缓存，使重新构建的DAGRelations也能复用已分析的边
+_default_cache = RelationCache()
+
 
 class DAGRelations:
-    def __init__(self, data, dag_edges):
+    def __init__(self, data, dag_edges, cache=None, resampling=None, screening=None):
         self.data = data
         self.dag = dag_edges
         self.relations = {}
         self.errors = []
+        # 每条边产生的错误，以及其对应的缓存键
+        self.edge_errors = {}
+        self.edge_cache_keys = {}
+        self.cache = _default_cache if cache is None else cache
+        self.last_diff = None
+        self._column_fingerprints = {}
+        # 可选的重抽样显著性引擎（ResamplingEngine），为每条边补充置换p值和自助法置信区间
+        self.resampling = resampling
+        self._pending_resampling = []
+        # 可选的效应量预筛选（EdgeScreener），弱关联的边跳过完整分析
+        self.screening = screening
+        self.screened_edges = {}
         
     def _handle_categorical(self, s):
         """编码分类变量"""
         return LabelEncoder().fit_transform(s.astype(str))
 
+    def _edge_key(self, relation):
+        """将DAG边转换为字典键，多对一关系的源变量使用元组"""
+        if isinstance(relation[0], list):
+            return (tuple(relation[0]), relation[1])
+        return (relation[0], relation[1])
+
+    def _edge_columns(self, edge_key):
+        src, tgt = edge_key
+        return (list(src) if isinstance(src, tuple) else [src]) + [tgt]
+
+    def _column_fingerprint(self, column):
+        if column not in self.data.columns:
+            return None
+        if column not in self._column_fingerprints:
+            self._column_fingerprints[column] = column_fingerprint(self.data[column])
+        return self._column_fingerprints[column]
+
+    def _cache_key(self, edge_key):
+        """缓存键：(边所涉及列的数据指纹, 边, 分析版本)"""
+        columns = self._edge_columns(edge_key)
+        data_fingerprint = combine_fingerprints(
+            [len(self.data)] + [(col, self._column_fingerprint(col)) for col in columns]
+        )
+        resampling_key = self.resampling.config_key() if self.resampling is not None else None
+        screening_key = self.screening.config_key() if self.screening is not None else None
+        return (data_fingerprint, edge_key, ANALYSIS_VERSION, resampling_key, screening_key)
+
     def analyze_relations(self):
         """遍历DAG边并分析关系，支持多对一关系"""
         # Suppress specific warnings
         warnings.filterwarnings("ignore", category=stats.DegenerateDataWarning)
         warnings.filterwarnings("ignore", category=FutureWarning, module="pandas")
         
+        self.relations = {}
+        self.errors = []
+        self.edge_errors = {}
+        self.edge_cache_keys = {}
+        self.screened_edges = {}
+        self._column_fingerprints = {}
         for relation in self.dag:
-            # 支持多对一关系，源可以是单个变量或变量列表
-            if isinstance(relation[0], list):
-                src_list = relation[0]
-                tgt = relation[1]
-                # 使用元组而不是列表作为字典键
-                edge_key = (tuple(src_list), tgt)
-                try:
-                    self._analyze_multi_to_one(src_list, tgt, edge_key)
-                except Exception as e:
-                    error_msg = f"Error analyzing {src_list} -> {tgt}: {str(e)}"
-                    print(error_msg)
-                    self.errors.append(error_msg)
+            self._analyze_edge(relation)
+        self._run_resampling()
+        self._print_screening_summary()
+        
+        return self
+
+    def update_dag(self, dag_edges, data=None):
+        """
+        使用修订后的DAG边增量更新分析结果：
+        只计算新增或数据已变化的边，复用未变化的边，并删除已移除的边
+        """
+        warnings.filterwarnings("ignore", category=stats.DegenerateDataWarning)
+        warnings.filterwarnings("ignore", category=FutureWarning, module="pandas")
+        
+        if data is not None:
+            self.data = data
+        # 重新计算指纹，以便识别原地修改过的列
+        self._column_fingerprints = {}
+        
+        old_relations = self.relations
+        old_errors = self.edge_errors
+        old_cache_keys = self.edge_cache_keys
+        old_screened = self.screened_edges
+        
+        self.dag = dag_edges
+        self.relations = {}
+        self.errors = []
+        self.edge_errors = {}
+        self.edge_cache_keys = {}
+        self.screened_edges = {}
+        diff = {'added': [], 'changed': [], 'reused': [], 'removed': []}
+        
+        for relation in dag_edges:
+            edge_key = self._edge_key(relation)
+            if edge_key in self.edge_cache_keys:
+                # 同一条边重复出现，只保留一次结果
+                continue
+            cache_key = self._cache_key(edge_key)
+            if old_cache_keys.get(edge_key) == cache_key:
+                if edge_key in old_relations:
+                    self.relations[edge_key] = old_relations[edge_key]
+                self.edge_errors[edge_key] = old_errors.get(edge_key, [])
+                self.errors.extend(self.edge_errors[edge_key])
+                self.edge_cache_keys[edge_key] = cache_key
+                if edge_key in old_screened:
+                    self.screened_edges[edge_key] = old_screened[edge_key]
+                diff['reused'].append(edge_key)
             else:
-                src = relation[0]
-                tgt = relation[1]
-                edge_key = (src, tgt)
-                try:
-                    self._analyze_single_to_one(src, tgt, edge_key)
-                except Exception as e:
-                    error_msg = f"Error analyzing {src} -> {tgt}: {str(e)}"
-                    print(error_msg)
-                    self.errors.append(error_msg)
+                reused = self._analyze_edge(relation)
+                if reused:
+                    diff['reused'].append(edge_key)
+                elif edge_key in old_cache_keys:
+                    diff['changed'].append(edge_key)
+                else:
+                    diff['added'].append(edge_key)
         
+        self._run_resampling()
+        self._print_screening_summary()
+        diff['removed'] = [k for k in old_cache_keys if k not in self.edge_cache_keys]
+        self.last_diff = diff
+        print(f"DAG updated: {len(diff['added'])} added, {len(diff['changed'])} changed, "
+              f"{len(diff['reused'])} reused, {len(diff['removed'])} removed")
         return self
+
+    def _analyze_edge(self, relation):
+        """分析单条边，命中缓存时直接复用结果；返回是否复用了缓存"""
+        edge_key = self._edge_key(relation)
+        cache_key = self._cache_key(edge_key)
+        self.edge_cache_keys[edge_key] = cache_key
+        self.relations.pop(edge_key, None)
+        
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            if cached['relation'] is not None:
+                self.relations[edge_key] = cached['relation']
+            self.edge_errors[edge_key] = list(cached['errors'])
+            self.errors.extend(cached['errors'])
+            if cached.get('screening') is not None:
+                self.screened_edges[edge_key] = cached['screening']
+            return True
+        
+        start = len(self.errors)
+        screening = self._screen_edge(edge_key)
+        if screening is not None:
+            self.edge_errors[edge_key] = []
+            self.cache.put(cache_key, {
+                'relation': self.relations.get(edge_key),
+                'errors': [],
+                'screening': screening
+            })
+            return False
+        
+        # 支持多对一关系，源可以是单个变量或变量列表
+        if isinstance(relation[0], list):
+            src_list = relation[0]
+            tgt = relation[1]
+            try:
+                self._analyze_multi_to_one(src_list, tgt, edge_key)
+            except Exception as e:
+                error_msg = f"Error analyzing {src_list} -> {tgt}: {str(e)}"
+                print(error_msg)
+                self.errors.append(error_msg)
+        else:
+            src = relation[0]
+            tgt = relation[1]
+            try:
+                self._analyze_single_to_one(src, tgt, edge_key)
+            except Exception as e:
+                error_msg = f"Error analyzing {src} -> {tgt}: {str(e)}"
+                print(error_msg)
+                self.errors.append(error_msg)
+        
+        self.edge_errors[edge_key] = self.errors[start:]
+        if self.resampling is not None and edge_key in self.relations:
+            self._pending_resampling.append(edge_key)
+        self.cache.put(cache_key, {
+            'relation': self.relations.get(edge_key),
+            'errors': list(self.edge_errors[edge_key])
+        })
+        return False
     
+    def _screen_edge(self, edge_key):
+        """
+        效应量预筛选：边为弱关联时记录筛选结果（按配置保留轻量摘要或完全跳过）并返回筛选结果，
+        否则返回None，由调用方进行完整分析
+        """
+        if self.screening is None:
+            return None
+        columns = self._edge_columns(edge_key)
+        if any(col not in self.data.columns for col in columns):
+            return None
+        try:
+            result = self.screening.screen(self.data, columns[:-1], columns[-1], self._column_fingerprint)
+        except Exception as e:
+            print(f"Screening failed for {edge_key[0]} -> {edge_key[1]}: {str(e)}")
+            return None
+        if not result['weak']:
+            return None
+        
+        print(f"Skipping full analysis of {edge_key[0]} -> {edge_key[1]}: "
+              f"association strength {result['strength']:.4f} below {result['threshold']}")
+        self.screened_edges[edge_key] = result
+        if self.screening.action == 'summary':
+            self.relations[edge_key] = {
+                'type': 'screened (weak association)',
+                'strength': result['strength'],
+                'threshold': result['threshold'],
+                'screening': result['sources']
+            }
+        return result
+
+    def _print_screening_summary(self):
+        if self.screening is not None and self.dag:
+            print(f"Screening: {len(self.screened_edges)} of {len(self.edge_cache_keys)} edges "
+                  f"below association threshold {self.screening.threshold}")
+
+    def _run_resampling(self):
+        """为新分析的边批量计算置换p值和自助法置信区间（结果写入relation['resampling']）"""
+        pending, self._pending_resampling = self._pending_resampling, []
+        if self.resampling is None or not pending:
+            return
+        
+        tasks = []
+        for edge_key in pending:
+            try:
+                task = self._resampling_task(edge_key)
+            except Exception as e:
+                self.relations[edge_key]['resampling'] = {'error': f"Resampling failed: {str(e)}"}
+                continue
+            if task is not None:
+                tasks.append(task)
+        
+        print(f"Running resampling for {len(tasks)} relationships...")
+        for edge_key, result in self.resampling.evaluate(tasks).items():
+            self.relations[edge_key]['resampling'] = result
+
+    def _resampling_task(self, edge_key):
+        """根据关系类型构建重抽样任务 (edge_key, kind, arrays)"""
+        metrics = self.relations[edge_key]
+        columns = self._edge_columns(edge_key)
+        src_cols, tgt = columns[:-1], columns[-1]
+        temp_data = _drop_unused_categories(self.data[columns].dropna(), columns)
+        rel_type = metrics['type']
+        
+        if rel_type == 'categorical->numeric':
+            # 与参数检验一致，只保留至少有两个观测值的组
+            counts = temp_data[src_cols[0]].map(temp_data[src_cols[0]].value_counts())
+            temp_data = temp_data[counts > 1]
+            groups = pd.factorize(temp_data[src_cols[0]])[0]
+            return (edge_key, 'anova', {'groups': groups, 'y': temp_data[tgt].to_numpy(dtype=float)})
+        
+        if rel_type == 'categorical->categorical':
+            return (edge_key, 'chi2', {
+                'a': pd.factorize(temp_data[src_cols[0]])[0],
+                'b': pd.factorize(temp_data[tgt])[0]
+            })
+        
+        # 其余关系统一使用线性模型的R²（分类变量使用哑变量编码）
+        design = pd.get_dummies(temp_data[src_cols], drop_first=True).astype(float)
+        if rel_type == 'numeric->categorical':
+            target = self._handle_categorical(temp_data[tgt]).astype(float)
+        elif rel_type in ['mixed->categorical', 'multi-categorical->categorical']:
+            target = pd.get_dummies(temp_data[tgt].astype(str)).to_numpy(dtype=float)
+        else:
+            target = temp_data[tgt].to_numpy(dtype=float)
+        return (edge_key, 'linear', {
+            'X': design.to_numpy(),
+            'T': target,
+            'names': [str(c) for c in design.columns]
+        })
+
     def _analyze_single_to_one(self, src, tgt, edge_key):
         """分析单个变量到单个变量的关系"""
         # 检查列是否存在
@@ -71,6 +356,7 @@ class DAGRelations:
                 return
         else:
             temp_data = self.data
+        temp_data = _drop_unused_categories(temp_data, [src, tgt])
         
         src_type = temp_data[src].dtype
         tgt_type = temp_data[tgt].dtype
@@ -78,7 +364,7 @@ class DAGRelations:
         print(f"Analyzing {src} -> {tgt}...")
         
         # 数值 -> 数值 (回归分析)
-        if np.issubdtype(src_type, np.number) and np.issubdtype(tgt_type, np.number):
+        if _is_numeric_dtype(src_type) and _is_numeric_dtype(tgt_type):
             # 使用LinearRegression获取系数和截距
             model = LinearRegression().fit(temp_data[[src]], temp_data[tgt])
             
@@ -98,8 +384,8 @@ class DAGRelations:
             }
         
         # 分类 -> 数值 (ANOVA)
-        elif not np.issubdtype(src_type, np.number) and np.issubdtype(tgt_type, np.number):
-            groups = temp_data.groupby(src)[tgt].apply(list)
+        elif not _is_numeric_dtype(src_type) and _is_numeric_dtype(tgt_type):
+            groups = temp_data.groupby(src, observed=True)[tgt].apply(list)
             if len(groups) <= 1:
                 error_msg = f"Error analyzing {src} -> {tgt}: Need at least two groups for ANOVA"
                 print(error_msg)
@@ -122,7 +408,7 @@ class DAGRelations:
                 f_val, p_val = stats.f_oneway(*valid_groups)
                 
                 # 计算每个类别的详细统计信息
-                category_stats = temp_data.groupby(src)[tgt].agg(['mean', 'std', 'count', 'min', 'max'])
+                category_stats = temp_data.groupby(src, observed=True)[tgt].agg(['mean', 'std', 'count', 'min', 'max'])
                 # 计算总体均值用于比较
                 total_mean = temp_data[tgt].mean()
                 
@@ -148,7 +434,7 @@ class DAGRelations:
                 self.errors.append(error_msg)
         
         # 分类 -> 分类 (卡方检验)
-        elif not np.issubdtype(src_type, np.number) and not np.issubdtype(tgt_type, np.number):
+        elif not _is_numeric_dtype(src_type) and not _is_numeric_dtype(tgt_type):
             contingency = pd.crosstab(temp_data[src], temp_data[tgt])
             
             # 检查列联表是否有效
@@ -248,6 +534,7 @@ class DAGRelations:
                 return
         else:
             temp_data = self.data
+        temp_data = _drop_unused_categories(temp_data, cols_to_check)
         
         # 检查源变量和目标变量类型
         tgt_type = temp_data[tgt].dtype
@@ -256,7 +543,7 @@ class DAGRelations:
         print(f"Analyzing {src_list} -> {tgt}...")
         
         # 所有源变量均为数值 -> 数值 (多元回归)
-        if np.issubdtype(tgt_type, np.number) and all(np.issubdtype(t, np.number) for t in src_types):
+        if _is_numeric_dtype(tgt_type) and all(_is_numeric_dtype(t) for t in src_types):
             # 使用LinearRegression获取系数和截距
             model = LinearRegression().fit(temp_data[src_list], temp_data[tgt])
             
@@ -286,10 +573,10 @@ class DAGRelations:
             }
         
         # 混合类型 -> 数值 (ANCOVA)
-        elif np.issubdtype(tgt_type, np.number):
+        elif _is_numeric_dtype(tgt_type):
             # 将分类变量和数值变量分离
-            cat_vars = [src for src, t in zip(src_list, src_types) if not np.issubdtype(t, np.number)]
-            num_vars = [src for src, t in zip(src_list, src_types) if np.issubdtype(t, np.number)]
+            cat_vars = [src for src, t in zip(src_list, src_types) if not _is_numeric_dtype(t)]
+            num_vars = [src for src, t in zip(src_list, src_types) if _is_numeric_dtype(t)]
             
             if not cat_vars or not num_vars:
                 # 如果没有混合类型，则按照单一类型处理
@@ -312,7 +599,7 @@ class DAGRelations:
                     # 为每个分类变量添加类别均值信息
                     category_stats = {}
                     for var in cat_vars:
-                        category_stats[var] = temp_data.groupby(var)[tgt].agg(['mean', 'std', 'count'])
+                        category_stats[var] = temp_data.groupby(var, observed=True)[tgt].agg(['mean', 'std', 'count'])
                     
                     self.relations[edge_key] = {
                         'type': 'multi-categorical->numeric',
@@ -340,7 +627,7 @@ class DAGRelations:
                 # 为分类变量添加类别均值信息
                 category_stats = {}
                 for var in cat_vars:
-                    category_stats[var] = temp_data.groupby(var)[tgt].agg(['mean', 'std', 'count'])
+                    category_stats[var] = temp_data.groupby(var, observed=True)[tgt].agg(['mean', 'std', 'count'])
                 
                 self.relations[edge_key] = {
                     'type': 'mixed->numeric',
@@ -367,8 +654,8 @@ class DAGRelations:
             target_categories = temp_data[tgt].unique()
             
             # 分离分类变量和数值变量
-            cat_vars = [src for src, t in zip(src_list, src_types) if not np.issubdtype(t, np.number)]
-            num_vars = [src for src, t in zip(src_list, src_types) if np.issubdtype(t, np.number)]
+            cat_vars = [src for src, t in zip(src_list, src_types) if not _is_numeric_dtype(t)]
+            num_vars = [src for src, t in zip(src_list, src_types) if _is_numeric_dtype(t)]
             
             # 计算条件概率
             conditional_probs = {}
@@ -523,494 +810,16 @@ class DAGRelations:
                 'target_distribution': {cat: (temp_data[tgt] == cat).mean() for cat in target_categories}
             }
 
+    def build_report(self):
+        """构建结构化报告（DAGReport），可渲染为文本、Markdown、JSON或LLM提示"""
+        return build_report(self.relations, self.errors)
+
     def print_report(self, output_to_console=True):
         """输出关系报告并返回文本格式的报告"""
-        report_lines = []
-        
-        if not self.relations:
-            message = "No valid relationships found!"
-            if output_to_console:
-                print(message)
-            report_lines.append(message)
-            return '\n'.join(report_lines)
-        
-        for edge, metrics in self.relations.items():
-            # 处理单变量关系
-            if not isinstance(edge[0], tuple):
-                header = f"\nRelationship {edge[0]} -> {edge[1]}"
-                type_info = f"Type: {metrics['type']}"
-                
-                if output_to_console:
-                    print(header)
-                    print(type_info)
-                
-                report_lines.append(header)
-                report_lines.append(type_info)
-                
-                # 处理categorical->numeric关系
-                if metrics['type'] == 'categorical->numeric':
-                    # 打印基本统计指标
-                    for k in ['f_value', 'p_value']:
-                        if metrics.get(k) is not None:
-                            line = f"{k:>15}: {metrics[k]:.4f}"
-                            if output_to_console:
-                                print(line)
-                            report_lines.append(line)
-                    
-                    # 添加解释
-                    significance = "significant" if metrics.get('p_value', 1) < 0.05 else "not significant"
-                    interpretation = f"\nThe relationship is statistically {significance} (p={metrics.get('p_value', 'N/A'):.4f})."
-                    if output_to_console:
-                        print(interpretation)
-                    report_lines.append(interpretation)
-                    
-                    # 打印每个类别的统计信息
-                    cat_stats_header = "\nCategory Statistics:"
-                    if output_to_console:
-                        print(cat_stats_header)
-                    report_lines.append(cat_stats_header)
-                    
-                    if 'category_stats' in metrics:
-                        # 格式化表格头部
-                        header_line = f"{'Category':>15} | {'Count':>8} | {'Mean':>10} | {'Std Dev':>10} | {'% Diff from Mean':>15}"
-                        divider = "-" * len(header_line)
-                        
-                        if output_to_console:
-                            print(header_line)
-                            print(divider)
-                        report_lines.append(header_line)
-                        report_lines.append(divider)
-                        
-                        # 检查类别数量，如果超过15个，只显示最显著的类别
-                        category_stats = metrics['category_stats']
-                        if len(category_stats) > 15:
-                            # 计算每个类别的显著性分数（基于样本量和与均值的差异）
-                            significance_scores = []
-                            for cat_name, row in category_stats.iterrows():
-                                # 计算与总体均值的百分比差异
-                                pct_diff = abs((row['mean'] - metrics['total_mean']) / metrics['total_mean'] * 100) if metrics['total_mean'] != 0 else float('inf')
-                                # 显著性分数 = 样本量 * 百分比差异
-                                significance_score = row['count'] * pct_diff
-                                significance_scores.append((cat_name, row, significance_score))
-                            
-                            # 按显著性分数排序并选择前15个
-                            significance_scores.sort(key=lambda x: x[2], reverse=True)
-                            top_categories = significance_scores[:15]
-                            
-                            # 添加说明
-                            note_line = f"Note: Showing only the 15 most significant categories out of {len(category_stats)} total categories."
-                            if output_to_console:
-                                print(note_line)
-                            report_lines.append(note_line)
-                            
-                            # 打印选定的类别
-                            for cat_name, row, _ in top_categories:
-                                # 计算与总体均值的百分比差异
-                                pct_diff = ((row['mean'] - metrics['total_mean']) / metrics['total_mean'] * 100) if metrics['total_mean'] != 0 else float('inf')
-                                
-                                # 格式化输出
-                                line = f"{str(cat_name):>15} | {int(row['count']):>8} | {row['mean']:>10.4f} | {row['std']:>10.4f} | {pct_diff:>15.2f}%"
-                                if output_to_console:
-                                    print(line)
-                                report_lines.append(line)
-                        else:
-                            # 打印所有类别
-                            for cat_name, row in category_stats.iterrows():
-                                # 计算与总体均值的百分比差异
-                                pct_diff = ((row['mean'] - metrics['total_mean']) / metrics['total_mean'] * 100) if metrics['total_mean'] != 0 else float('inf')
-                                
-                                # 格式化输出
-                                line = f"{str(cat_name):>15} | {int(row['count']):>8} | {row['mean']:>10.4f} | {row['std']:>10.4f} | {pct_diff:>15.2f}%"
-                                if output_to_console:
-                                    print(line)
-                                report_lines.append(line)
-                    
-                    # 添加显著差异类别的解释
-                    if metrics.get('significant_categories'):
-                        sig_header = "\nCategories with Significant Differences:"
-                        if output_to_console:
-                            print(sig_header)
-                        report_lines.append(sig_header)
-                        
-                        # 如果显著类别超过10个，只显示最显著的10个
-                        sig_categories = metrics['significant_categories']
-                        if len(sig_categories) > 10:
-                            # 按照与均值的差异程度排序
-                            sig_categories.sort(key=lambda x: abs(x[1] - metrics['total_mean']), reverse=True)
-                            sig_categories = sig_categories[:10]
-                            
-                            # 添加说明
-                            note_line = f"Note: Showing only the 10 most significant categories out of {len(metrics['significant_categories'])} significant categories."
-                            if output_to_console:
-                                print(note_line)
-                            report_lines.append(note_line)
-                        
-                        for cat, mean, direction in sig_categories:
-                            line = f"- {cat}: {mean:.4f} ({direction} than overall mean of {metrics['total_mean']:.4f})"
-                            if output_to_console:
-                                print(line)
-                            report_lines.append(line)
-                
-                # 处理categorical->categorical关系
-                elif metrics['type'] == 'categorical->categorical':
-                    # 打印基本统计指标
-                    for k in ['chi2', 'p_value', 'cramers_v']:
-                        if metrics.get(k) is not None:
-                            line = f"{k:>15}: {metrics[k]:.4f}"
-                            if output_to_console:
-                                print(line)
-                            report_lines.append(line)
-                    
-                    # 添加解释
-                    significance = "significant" if metrics.get('p_value', 1) < 0.05 else "not significant"
-                    association = "strong" if metrics.get('cramers_v', 0) > 0.3 else ("moderate" if metrics.get('cramers_v', 0) > 0.1 else "weak")
-                    interpretation = f"\nThe association is statistically {significance} (p={metrics.get('p_value', 'N/A'):.4f}) and {association} (Cramer's V={metrics.get('cramers_v', 'N/A'):.4f})."
-                    if output_to_console:
-                        print(interpretation)
-                    report_lines.append(interpretation)
-                    
-                    # 打印最强关联
-                    if 'strongest_association' in metrics:
-                        src_val, tgt_val = metrics['strongest_association']
-                        strongest_line = f"\nStrongest association: When {edge[0]} is '{src_val}', {edge[1]} is most likely to be '{tgt_val}'"
-                        strongest_detail = f"  Observed: {metrics['strongest_association_value']}, Expected: {metrics['strongest_association_expected']:.2f}"
-                        
-                        if output_to_console:
-                            print(strongest_line)
-                            print(strongest_detail)
-                        report_lines.append(strongest_line)
-                        report_lines.append(strongest_detail)
-                    
-                    # 打印最高条件概率
-                    if metrics.get('max_conditional_probability'):
-                        (src_val, tgt_val), prob = metrics['max_conditional_probability']
-                        prob_line = f"\nHighest conditional probability: P({edge[1]}='{tgt_val}' | {edge[0]}='{src_val}') = {prob:.4f}"
-                        if output_to_console:
-                            print(prob_line)
-                        report_lines.append(prob_line)
-                
-                ###
-                # Add this to the print_report method where it handles different relationship types
-                # Inside the "else" block where it handles multi-variable relationships
-
-                elif metrics['type'] in ['mixed->categorical', 'multi-categorical->categorical']:
-                    # Print target distribution
-                    dist_header = "\nTarget Variable Distribution:"
-                    if output_to_console:
-                        print(dist_header)
-                    report_lines.append(dist_header)
-                    
-                    for cat, prob in metrics['target_distribution'].items():
-                        line = f"{str(cat):>15}: {prob:.4f} ({prob*100:.1f}%)"
-                        if output_to_console:
-                            print(line)
-                        report_lines.append(line)
-                    
-                    # Print conditional probabilities for categorical variables
-                    if 'conditional_probs' in metrics:
-                        cond_header = "\nConditional Probabilities:"
-                        if output_to_console:
-                            print(cond_header)
-                        report_lines.append(cond_header)
-                        
-                        for var, prob_table in metrics['conditional_probs'].items():
-                            var_header = f"\nVariable: {var}"
-                            if output_to_console:
-                                print(var_header)
-                            report_lines.append(var_header)
-                            
-                            # Format table header with target categories
-                            header_parts = ["Category"] + [f"{col}" for col in prob_table.columns]
-                            header_line = " | ".join(f"{part:>15}" for part in header_parts)
-                            divider = "-" * len(header_line)
-                            
-                            if output_to_console:
-                                print(header_line)
-                                print(divider)
-                            report_lines.append(header_line)
-                            report_lines.append(divider)
-                            
-                            # Print each row
-                            for idx, row in prob_table.iterrows():
-                                row_parts = [str(idx)] + [f"{val:.4f}" if not pd.isna(val) else "N/A" for val in row]
-                                line = " | ".join(f"{part:>15}" for part in row_parts)
-                                if output_to_console:
-                                    print(line)
-                                report_lines.append(line)
-                            
-                            # Find and highlight most predictive categories
-                            most_predictive = []
-                            for col in prob_table.columns:
-                                if not prob_table[col].isna().all():
-                                    max_val = prob_table[col].max()
-                                    max_idx = prob_table[col].idxmax()
-                                    # Only include if probability is significantly higher than base rate
-                                    if max_val > metrics['target_distribution'].get(col, 0) * 1.5:
-                                        most_predictive.append((max_idx, col, max_val))
-                            
-                            if most_predictive:
-                                predict_header = "\nMost predictive categories:"
-                                if output_to_console:
-                                    print(predict_header)
-                                report_lines.append(predict_header)
-                                
-                                for cat, tgt_cat, prob in most_predictive:
-                                    base_rate = metrics['target_distribution'].get(tgt_cat, 0)
-                                    lift = prob / base_rate if base_rate > 0 else float('inf')
-                                    line = f"- When {var} is '{cat}', {tgt} is '{tgt_cat}' with probability {prob:.4f} ({lift:.2f}x base rate)"
-                                    if output_to_console:
-                                        print(line)
-                                    report_lines.append(line)
-                    
-                    # Print combined variable effects
-                    if metrics.get('combined_probs'):
-                        combined_header = f"\nCombined Effect of {' and '.join(metrics['combined_probs']['vars'])}:"
-                        if output_to_console:
-                            print(combined_header)
-                        report_lines.append(combined_header)
-                        
-                        # Print most significant combinations
-                        sig_header = "\nMost significant combinations:"
-                        if output_to_console:
-                            print(sig_header)
-                        report_lines.append(sig_header)
-                        
-                        for tgt_cat, (comb, prob) in metrics['combined_probs']['max_probs'].items():
-                            base_rate = metrics['target_distribution'].get(tgt_cat, 0)
-                            lift = prob / base_rate if base_rate > 0 else float('inf')
-                            line = f"- For {tgt}='{tgt_cat}': Combination '{comb}' with probability {prob:.4f} ({lift:.2f}x base rate)"
-                            if output_to_console:
-                                print(line)
-                            report_lines.append(line)
-                    
-                    # Print numerical variable effects
-                    if metrics.get('num_var_effects'):
-                        num_header = "\nNumerical Variable Effects:"
-                        if output_to_console:
-                            print(num_header)
-                        report_lines.append(num_header)
-                        
-                        for var, effects in metrics['num_var_effects'].items():
-                            var_header = f"\nVariable: {var}"
-                            if output_to_console:
-                                print(var_header)
-                            report_lines.append(var_header)
-                            
-                            if 'error' in effects:
-                                error_line = f"Error: {effects['error']}"
-                                if output_to_console:
-                                    print(error_line)
-                                report_lines.append(error_line)
-                                continue
-                            
-                            # Print F-test results
-                            if 'f_value' in effects and 'p_value' in effects:
-                                f_line = f"F-value: {effects['f_value']:.4f}, p-value: {effects['p_value']:.4f}"
-                                significance = "significant" if effects['p_value'] < 0.05 else "not significant"
-                                sig_line = f"The effect is statistically {significance}"
-                                
-                                if output_to_console:
-                                    print(f_line)
-                                    print(sig_line)
-                                report_lines.append(f_line)
-                                report_lines.append(sig_line)
-                            
-                            # Print statistics for each target category
-                            stats_header = "\nStatistics by target category:"
-                            if output_to_console:
-                                print(stats_header)
-                            report_lines.append(stats_header)
-                            
-                            # Format table header
-                            header_line = f"{'Target Category':>20} | {'Count':>8} | {'Mean':>10} | {'Std Dev':>10}"
-                            divider = "-" * len(header_line)
-                            
-                            if output_to_console:
-                                print(header_line)
-                                print(divider)
-                            report_lines.append(header_line)
-                            report_lines.append(divider)
-                            
-                            # Print statistics for each category
-                            for cat, stats in effects['stats'].items():
-                                line = f"{str(cat):>20} | {int(stats['count']):>8} | {stats['mean']:>10.4f} | {stats['std']:>10.4f}"
-                                if output_to_console:
-                                    print(line)
-                                report_lines.append(line)
-                    
-                    # Print overall prediction quality
-                    if 'prediction_quality' in metrics:
-                        pred_header = "\nOverall Prediction Quality:"
-                        if output_to_console:
-                            print(pred_header)
-                        report_lines.append(pred_header)
-                        
-                        pred_quality = metrics['prediction_quality']
-                        if 'error' in pred_quality:
-                            error_line = f"Error: {pred_quality['error']}"
-                            if output_to_console:
-                                print(error_line)
-                            report_lines.append(error_line)
-                        else:
-                            for k, v in pred_quality.items():
-                                if k != 'model_type':
-                                    line = f"{k:>15}: {v:.4f}" if isinstance(v, float) else f"{k:>15}: {v}"
-                                    if output_to_console:
-                                        print(line)
-                                    report_lines.append(line)
-                            
-                            # Add interpretation
-                            accuracy = pred_quality.get('accuracy', 0)
-                            if accuracy > 0.8:
-                                quality = "excellent"
-                            elif accuracy > 0.7:
-                                quality = "good"
-                            elif accuracy > 0.6:
-                                quality = "moderate"
-                            else:
-                                quality = "poor"
-                                
-                            interp_line = f"\nThe combined predictive power of all variables is {quality} (accuracy: {accuracy:.4f})"
-                            if output_to_console:
-                                print(interp_line)
-                            report_lines.append(interp_line)
-                # 处理其他类型关系
-                else:
-                    for k, v in metrics.items():
-                        if k != 'type':
-                            if v is None:
-                                line = f"{k:>15}: Not calculable"
-                            else:
-                                line = f"{k:>15}: {v:.4f}" if isinstance(v, float) else f"{k:>15}: {v}"
-                            
-                            if output_to_console:
-                                print(line)
-                            report_lines.append(line)
-            
-            # 处理多变量关系
-            else:
-                src_tuple, tgt = edge
-                src_list = list(src_tuple)  # 转换回列表以便打印
-                header = f"\nRelationship {src_list} -> {tgt}"
-                type_info = f"Type: {metrics['type']}"
-                
-                if output_to_console:
-                    print(header)
-                    print(type_info)
-                
-                report_lines.append(header)
-                report_lines.append(type_info)
-                
-                if metrics['type'] == 'multi-numeric->numeric':
-                    r2_line = f"{'R-squared':>15}: {metrics['r2']:.4f}"
-                    intercept_line = f"{'Intercept':>15}: {metrics['intercept']:.4f}"
-                    coef_header = "\nCoefficients and p-values:"
-                    
-                    if output_to_console:
-                        print(r2_line)
-                        print(intercept_line)
-                        print(coef_header)
-                    
-                    report_lines.append(r2_line)
-                    report_lines.append(intercept_line)
-                    report_lines.append(coef_header)
-                    
-                    for src in src_list:
-                        coef_val = metrics['coefs'].get(src, None)
-                        p_val = metrics['p_values'].get(src, None)
-                        coef_str = f"{coef_val:.4f}" if coef_val is not None else "Not calculable"
-                        p_str = f"(p={p_val:.4f})" if p_val is not None else "(p=Not calculable)"
-                        line = f"{src:>15}: {coef_str} {p_str}"
-                        
-                        if output_to_console:
-                            print(line)
-                        report_lines.append(line)
-                
-                elif metrics['type'] in ['multi-categorical->numeric', 'mixed->numeric']:
-                    r2_line = f"{'R-squared':>15}: {metrics['r2']:.4f}"
-                    f_line = f"{'F-value':>15}: {metrics['f_value']:.4f}"
-                    p_line = f"{'Overall p-value':>15}: {metrics['overall_p_value']:.4f}"
-                    p_header = "\nIndividual p-values:"
-                    
-                    if output_to_console:
-                        print(r2_line)
-                        print(f_line)
-                        print(p_line)
-                        print(p_header)
-                    
-                    report_lines.append(r2_line)
-                    report_lines.append(f_line)
-                    report_lines.append(p_line)
-                    report_lines.append(p_header)
-                    
-                    for var, p in metrics['p_values'].items():
-                        if p is not None:
-                            line = f"{var:>15}: {p:.4f}"
-                        else:
-                            line = f"{var:>15}: Not calculable"
-                        
-                        if output_to_console:
-                            print(line)
-                        report_lines.append(line)
-                    
-                    # 添加分类变量的类别统计信息
-                    if 'category_stats' in metrics:
-                        cat_stats_header = "\nCategory Statistics:"
-                        if output_to_console:
-                            print(cat_stats_header)
-                        report_lines.append(cat_stats_header)
-                        
-                        for var, stats_df in metrics['category_stats'].items():
-                            var_header = f"\nVariable: {var}"
-                            if output_to_console:
-                                print(var_header)
-                            report_lines.append(var_header)
-                            
-                            # 格式化表格头部
-                            header_line = f"{'Category':>15} | {'Count':>8} | {'Mean':>10} | {'Std Dev':>10}"
-                            divider = "-" * len(header_line)
-                            
-                            if output_to_console:
-                                print(header_line)
-                                print(divider)
-                            report_lines.append(header_line)
-                            report_lines.append(divider)
-                            
-                            # 打印每个类别的详细信息
-                            for cat_name, row in stats_df.iterrows():
-                                line = f"{str(cat_name):>15} | {int(row['count']):>8} | {row['mean']:>10.4f} | {row['std']:>10.4f}"
-                                if output_to_console:
-                                    print(line)
-                                report_lines.append(line)
-                
-                else:
-                    for k, v in metrics.items():
-                        if k != 'type':
-                            if v is None:
-                                line = f"{k:>15}: Not calculable"
-                            else:
-                                line = f"{k:>15}: {v:.4f}" if isinstance(v, float) else f"{k:>15}: {v}"
-                            
-                            if output_to_console:
-                                print(line)
-                            report_lines.append(line)
-        
-        if self.errors:
-            error_header = "\n\nErrors encountered during analysis:"
-            
-            if output_to_console:
-                print(error_header)
-            report_lines.append(error_header)
-            
-            for i, error in enumerate(self.errors, 1):
-                line = f"{i}. {error}"
-                
-                if output_to_console:
-                    print(line)
-                report_lines.append(line)
-        
-        # Return the report as a string
-        return '\n'.join(report_lines)
+        report = self.build_report().to_text()
+        if output_to_console:
+            print(report)
+        return report
     
 
 # # 示例使用
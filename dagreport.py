@@ -0,0 +1,597 @@
+#dagreport.py
+import json
+from dataclasses import dataclass, field
+from functools import reduce
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from tokenbudget import estimate_tokens
+
+
+@dataclass
+class ReportColumn:
+    """报告表格的一列：表头、文本宽度和printf格式（None表示值已是字符串）"""
+    header: str
+    width: int
+    fmt: Optional[str] = None
+
+
+@dataclass
+class ReportTable:
+    """报告中的表格，数据按列存储，渲染时按列整体格式化"""
+    name: str
+    columns: List[ReportColumn]
+    data: pd.DataFrame
+    note: Optional[str] = None
+    # 行的重要性，用于token预算下的截断（越大越优先保留）
+    priority: Optional[np.ndarray] = None
+
+    def _cells(self, compact=False):
+        cells = []
+        for col, (_, values) in zip(self.columns, self.data.items()):
+            values = values.to_numpy()
+            if col.fmt is None:
+                formatted = values.astype(str)
+                if not compact:
+                    formatted = np.char.rjust(formatted, col.width)
+            else:
+                formatted = np.char.mod(col.fmt, values)
+                if compact:
+                    formatted = np.char.strip(formatted)
+            cells.append(formatted)
+        return cells
+
+    @staticmethod
+    def _join(cells, sep):
+        if not cells or len(cells[0]) == 0:
+            return []
+        return reduce(lambda a, b: np.char.add(np.char.add(a, sep), b), cells).tolist()
+
+    def text_lines(self):
+        header_line = " | ".join(f"{col.header:>{col.width}}" for col in self.columns)
+        lines = [header_line, "-" * len(header_line)]
+        if self.note:
+            lines.append(self.note)
+        return lines + self._join(self._cells(), " | ")
+
+    def markdown_lines(self):
+        lines = ["| " + " | ".join(col.header for col in self.columns) + " |",
+                 "| " + " | ".join("---" for _ in self.columns) + " |"]
+        rows = self._join(self._cells(compact=True), " | ")
+        return lines + [f"| {row} |" for row in rows]
+
+    def prompt_lines(self, max_rows=None):
+        data = self
+        omitted = 0
+        if max_rows is not None and len(self.data) > max_rows:
+            if self.priority is not None:
+                order = np.argsort(-np.nan_to_num(self.priority, nan=-np.inf), kind='stable')[:max_rows]
+            else:
+                order = np.arange(max_rows)
+            data = ReportTable(self.name, self.columns, self.data.iloc[np.sort(order)])
+            omitted = len(self.data) - max_rows
+        if max_rows == 0:
+            return [f"[{self.name}: {len(self.data)} rows omitted]"]
+        lines = [f"[{self.name}] " + "|".join(col.header for col in self.columns)]
+        lines += data._join(data._cells(compact=True), "|")
+        if omitted:
+            lines.append(f"(+{omitted} more rows)")
+        return lines
+
+    def records(self):
+        frame = self.data.copy()
+        frame.columns = [col.header for col in self.columns]
+        frame = frame.astype(object).where(frame.notna(), None)
+        return frame.to_dict('records')
+
+
+@dataclass
+class ReportLine:
+    """
+    报告中的一行文本。
+    kind: 'text'、'heading'（小节标题）、'metric'（名称: 值）、'note'（截断说明）
+    gap: 文本格式中是否在该行前空一行
+    """
+    text: str
+    kind: str = 'text'
+    label: Optional[str] = None
+    gap: bool = False
+
+    def render_text(self):
+        prefix = "\n" if self.gap else ""
+        if self.kind == 'metric':
+            return f"{prefix}{self.label:>15}: {self.text}"
+        return prefix + self.text
+
+    def render_markdown(self):
+        if self.kind == 'metric':
+            return f"- **{self.label.strip()}**: {self.text}"
+        if self.kind == 'heading':
+            return f"**{self.text.rstrip(':')}**"
+        if self.kind == 'note':
+            return f"*{self.text}*"
+        return self.text.strip()
+
+
+@dataclass
+class EdgeReport:
+    """单条DAG边的结构化报告"""
+    source: Union[str, List[str]]
+    target: str
+    relation_type: str
+    metrics: Dict[str, Any] = field(default_factory=dict)
+    blocks: List[Union[ReportLine, ReportTable]] = field(default_factory=list)
+
+    @property
+    def title(self):
+        return f"{self.source} -> {self.target}"
+
+    @property
+    def significance(self):
+        """用于排序的p值（越小越重要），缺失时视为1"""
+        for key in ('p_value', 'overall_p_value'):
+            value = self.metrics.get(key)
+            if isinstance(value, (int, float)) and not np.isnan(value):
+                return float(value)
+        p_values = [v for v in (self.metrics.get('p_values') or {}).values()
+                    if isinstance(v, (int, float)) and not np.isnan(v)]
+        return min(p_values) if p_values else 1.0
+
+    def text_lines(self):
+        lines = [f"\nRelationship {self.title}", f"Type: {self.relation_type}"]
+        for block in self.blocks:
+            if isinstance(block, ReportTable):
+                lines.extend(block.text_lines())
+            else:
+                lines.append(block.render_text())
+        return lines
+
+    def markdown_lines(self):
+        lines = [f"### {self.title}", f"- **Type**: {self.relation_type}"]
+        previous_table = False
+        for block in self.blocks:
+            if isinstance(block, ReportTable):
+                lines.append("")
+                lines.extend(block.markdown_lines())
+                previous_table = True
+            else:
+                if previous_table or block.gap or block.kind == 'heading':
+                    lines.append("")
+                lines.append(block.render_markdown())
+                previous_table = False
+        lines.append("")
+        return lines
+
+    def prompt_lines(self, max_rows=None):
+        lines = [f"## {self.title} ({self.relation_type})"]
+        metric_parts = []
+        for block in self.blocks:
+            if isinstance(block, ReportLine) and block.kind == 'metric':
+                metric_parts.append(f"{block.label.strip()}={block.text}")
+                continue
+            if metric_parts:
+                lines.append("; ".join(metric_parts))
+                metric_parts = []
+            if isinstance(block, ReportTable):
+                lines.extend(block.prompt_lines(max_rows))
+            elif block.kind != 'note':
+                lines.append(block.text.strip())
+        if metric_parts:
+            lines.append("; ".join(metric_parts))
+        return lines
+
+    def to_dict(self):
+        return {
+            'source': self.source,
+            'target': self.target,
+            'type': self.relation_type,
+            'metrics': self.metrics,
+            'tables': {table.name: table.records() for table in self.blocks if isinstance(table, ReportTable)},
+            'notes': [block.text.strip() for block in self.blocks
+                      if isinstance(block, ReportLine) and block.kind == 'text']
+        }
+
+
+@dataclass
+class DAGReport:
+    """DAGRelations分析结果的结构化报告，可渲染为文本、Markdown、JSON和LLM提示"""
+    edges: List[EdgeReport] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+
+    def _error_lines(self):
+        if not self.errors:
+            return []
+        return ["\n\nErrors encountered during analysis:"] + [f"{i}. {error}" for i, error in enumerate(self.errors, 1)]
+
+    def to_text(self):
+        if not self.edges:
+            return "No valid relationships found!"
+        lines = []
+        for edge in self.edges:
+            lines.extend(edge.text_lines())
+        lines.extend(self._error_lines())
+        return '\n'.join(lines)
+
+    def to_markdown(self):
+        if not self.edges:
+            return "No valid relationships found!"
+        lines = []
+        for edge in self.edges:
+            lines.extend(edge.markdown_lines())
+        if self.errors:
+            lines.append("### Errors encountered during analysis")
+            lines.extend(f"{i}. {error}" for i, error in enumerate(self.errors, 1))
+        return '\n'.join(lines)
+
+    def to_dict(self):
+        return {'relationships': [edge.to_dict() for edge in self.edges], 'errors': self.errors}
+
+    def to_json(self, indent=2):
+        return json.dumps(self.to_dict(), indent=indent, ensure_ascii=False, default=_json_default)
+
+    def to_prompt(self, token_budget=None):
+        """
+        紧凑的LLM提示格式。超过token预算时依次减少表格行数、省略表格，
+        最后按显著性从低到高省略整条边。
+        """
+        if not self.edges:
+            return "No valid relationships found!"
+        error_lines = ["Errors:"] + [f"{i}. {e}" for i, e in enumerate(self.errors, 1)] if self.errors else []
+        error_tokens = estimate_tokens('\n'.join(error_lines))
+
+        for max_rows in (None, 20, 10, 5, 3, 1, 0):
+            edge_texts = ['\n'.join(edge.prompt_lines(max_rows)) for edge in self.edges]
+            edge_tokens = [estimate_tokens(text) for text in edge_texts]
+            if token_budget is None or sum(edge_tokens) + error_tokens <= token_budget:
+                return '\n'.join(edge_texts + error_lines)
+
+        # 仍超出预算：按显著性从低到高省略整条边
+        keep = np.ones(len(self.edges), dtype=bool)
+        total = sum(edge_tokens) + error_tokens
+        for i in sorted(range(len(self.edges)), key=lambda i: self.edges[i].significance, reverse=True):
+            if total <= token_budget:
+                break
+            keep[i] = False
+            total -= edge_tokens[i]
+        omitted = int((~keep).sum())
+        lines = [text for text, kept in zip(edge_texts, keep) if kept]
+        if omitted:
+            lines.append(f"({omitted} less significant relationships omitted)")
+        return '\n'.join(lines + error_lines)
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.to_dict()
+    return str(value)
+
+
+def _scalar(value):
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+
+def _summary_metrics(metrics):
+    """提取可序列化的核心指标（标量及变量级p值/系数）"""
+    summary = {}
+    for key, value in metrics.items():
+        if key == 'type':
+            continue
+        if value is None or isinstance(value, (int, float, np.number)):
+            summary[key] = _scalar(value)
+        elif key in ('p_values', 'coefs') and isinstance(value, dict):
+            summary[key] = {str(k): _scalar(v) for k, v in value.items()}
+        elif key in ('resampling', 'screening') and isinstance(value, dict):
+            summary[key] = value
+    return summary
+
+
+def _metric_line(label, value):
+    if value is None:
+        return ReportLine("Not calculable", 'metric', label=label)
+    text = f"{value:.4f}" if isinstance(value, float) else f"{value}"
+    return ReportLine(text, 'metric', label=label)
+
+
+def _category_table(name, stats_df, total_mean=None):
+    """类别统计表：类别、样本数、均值、标准差（以及与总体均值的差异）"""
+    columns = [ReportColumn('Category', 15), ReportColumn('Count', 8, '%8d'),
+               ReportColumn('Mean', 10, '%10.4f'), ReportColumn('Std Dev', 10, '%10.4f')]
+    data = pd.DataFrame({
+        'Category': stats_df.index.map(str),
+        'Count': stats_df['count'].to_numpy(),
+        'Mean': stats_df['mean'].to_numpy(dtype=float),
+        'Std Dev': stats_df['std'].to_numpy(dtype=float)
+    })
+    priority = None
+    if total_mean is not None:
+        if total_mean != 0:
+            pct_diff = (data['Mean'].to_numpy() - total_mean) / total_mean * 100
+        else:
+            pct_diff = np.full(len(data), np.inf)
+        data['% Diff from Mean'] = pct_diff
+        columns.append(ReportColumn('% Diff from Mean', 15, '%15.2f%%'))
+        priority = data['Count'].to_numpy() * np.abs(pct_diff)
+    return ReportTable(name, columns, data, priority=priority)
+
+
+def _categorical_numeric_blocks(edge, metrics):
+    blocks = []
+    for k in ['f_value', 'p_value']:
+        if metrics.get(k) is not None:
+            blocks.append(ReportLine(f"{metrics[k]:.4f}", 'metric', label=k))
+
+    p_value = metrics.get('p_value', 1)
+    significance = "significant" if p_value < 0.05 else "not significant"
+    blocks.append(ReportLine(f"The relationship is statistically {significance} (p={p_value:.4f}).", gap=True))
+    blocks.append(ReportLine("Category Statistics:", 'heading', gap=True))
+
+    if 'category_stats' in metrics:
+        total_mean = metrics['total_mean']
+        table = _category_table('Category Statistics', metrics['category_stats'], total_mean)
+        # 类别超过15个时，只显示最显著的类别（显著性分数 = 样本量 * 百分比差异）
+        if len(table.data) > 15:
+            order = np.argsort(-table.priority, kind='stable')[:15]
+            table = ReportTable(
+                table.name, table.columns, table.data.iloc[order].reset_index(drop=True),
+                note=f"Note: Showing only the 15 most significant categories out of {len(table.data)} total categories.",
+                priority=table.priority[order]
+            )
+        blocks.append(table)
+
+    sig_categories = metrics.get('significant_categories')
+    if sig_categories:
+        blocks.append(ReportLine("Categories with Significant Differences:", 'heading', gap=True))
+        total_mean = metrics['total_mean']
+        shown = sig_categories
+        if len(sig_categories) > 10:
+            shown = sorted(sig_categories, key=lambda x: abs(x[1] - total_mean), reverse=True)[:10]
+            blocks.append(ReportLine(
+                f"Note: Showing only the 10 most significant categories out of {len(sig_categories)} significant categories.",
+                'note'))
+        for cat, mean, direction in shown:
+            blocks.append(ReportLine(f"- {cat}: {mean:.4f} ({direction} than overall mean of {total_mean:.4f})"))
+    return blocks
+
+
+def _categorical_categorical_blocks(edge, metrics):
+    blocks = []
+    for k in ['chi2', 'p_value', 'cramers_v']:
+        if metrics.get(k) is not None:
+            blocks.append(ReportLine(f"{metrics[k]:.4f}", 'metric', label=k))
+
+    p_value = metrics.get('p_value', 1)
+    cramers_v = metrics.get('cramers_v') or 0
+    significance = "significant" if p_value < 0.05 else "not significant"
+    association = "strong" if cramers_v > 0.3 else ("moderate" if cramers_v > 0.1 else "weak")
+    blocks.append(ReportLine(
+        f"The association is statistically {significance} (p={p_value:.4f}) and {association} (Cramer's V={cramers_v:.4f}).",
+        gap=True))
+
+    if 'strongest_association' in metrics:
+        src_val, tgt_val = metrics['strongest_association']
+        blocks.append(ReportLine(
+            f"Strongest association: When {edge[0]} is '{src_val}', {edge[1]} is most likely to be '{tgt_val}'", gap=True))
+        blocks.append(ReportLine(
+            f"  Observed: {metrics['strongest_association_value']}, Expected: {metrics['strongest_association_expected']:.2f}"))
+
+    if metrics.get('max_conditional_probability'):
+        (src_val, tgt_val), prob = metrics['max_conditional_probability']
+        blocks.append(ReportLine(
+            f"Highest conditional probability: P({edge[1]}='{tgt_val}' | {edge[0]}='{src_val}') = {prob:.4f}", gap=True))
+    return blocks
+
+
+def _categorical_target_blocks(edge, metrics):
+    """(混合类型或分类) -> 分类 关系：目标分布、条件概率、组合效应和数值变量效应"""
+    tgt = edge[1]
+    target_distribution = metrics['target_distribution']
+    blocks = [ReportLine("Target Variable Distribution:", 'heading', gap=True)]
+    for cat, prob in target_distribution.items():
+        blocks.append(ReportLine(f"{str(cat):>15}: {prob:.4f} ({prob*100:.1f}%)"))
+
+    if 'conditional_probs' in metrics:
+        blocks.append(ReportLine("Conditional Probabilities:", 'heading', gap=True))
+        for var, prob_table in metrics['conditional_probs'].items():
+            blocks.append(ReportLine(f"Variable: {var}", gap=True))
+            probs = prob_table.astype(float)
+            data = {'Category': prob_table.index.map(str)}
+            columns = [ReportColumn('Category', 15)]
+            for i, col in enumerate(probs.columns):
+                values = probs.iloc[:, i].to_numpy()
+                data[i] = np.where(np.isnan(values), "N/A", np.char.mod('%.4f', values))
+                columns.append(ReportColumn(f"{col}", 15))
+            blocks.append(ReportTable(f"P({tgt} | {var})", columns, pd.DataFrame(data)))
+
+            # 找出比基础概率高出50%以上的最具预测性的类别
+            valid = probs.loc[:, probs.notna().any()]
+            most_predictive = []
+            if not valid.empty:
+                max_vals = valid.max()
+                max_idx = valid.idxmax()
+                for tgt_cat in valid.columns:
+                    if max_vals[tgt_cat] > target_distribution.get(tgt_cat, 0) * 1.5:
+                        most_predictive.append((max_idx[tgt_cat], tgt_cat, max_vals[tgt_cat]))
+            if most_predictive:
+                blocks.append(ReportLine("Most predictive categories:", 'heading', gap=True))
+                for cat, tgt_cat, prob in most_predictive:
+                    base_rate = target_distribution.get(tgt_cat, 0)
+                    lift = prob / base_rate if base_rate > 0 else float('inf')
+                    blocks.append(ReportLine(
+                        f"- When {var} is '{cat}', {tgt} is '{tgt_cat}' with probability {prob:.4f} ({lift:.2f}x base rate)"))
+
+    if metrics.get('combined_probs'):
+        combined = metrics['combined_probs']
+        blocks.append(ReportLine(f"Combined Effect of {' and '.join(combined['vars'])}:", 'heading', gap=True))
+        blocks.append(ReportLine("Most significant combinations:", 'heading', gap=True))
+        for tgt_cat, (comb, prob) in combined['max_probs'].items():
+            base_rate = target_distribution.get(tgt_cat, 0)
+            lift = prob / base_rate if base_rate > 0 else float('inf')
+            blocks.append(ReportLine(
+                f"- For {tgt}='{tgt_cat}': Combination '{comb}' with probability {prob:.4f} ({lift:.2f}x base rate)"))
+
+    if metrics.get('num_var_effects'):
+        blocks.append(ReportLine("Numerical Variable Effects:", 'heading', gap=True))
+        for var, effects in metrics['num_var_effects'].items():
+            blocks.append(ReportLine(f"Variable: {var}", gap=True))
+            if 'error' in effects:
+                blocks.append(ReportLine(f"Error: {effects['error']}"))
+                continue
+            if 'f_value' in effects and 'p_value' in effects:
+                significance = "significant" if effects['p_value'] < 0.05 else "not significant"
+                blocks.append(ReportLine(f"F-value: {effects['f_value']:.4f}, p-value: {effects['p_value']:.4f}"))
+                blocks.append(ReportLine(f"The effect is statistically {significance}"))
+            blocks.append(ReportLine("Statistics by target category:", 'heading', gap=True))
+            stats_df = pd.DataFrame.from_dict(effects['stats'], orient='index')
+            data = pd.DataFrame({
+                'Target Category': stats_df.index.map(str),
+                'Count': stats_df['count'].to_numpy(),
+                'Mean': stats_df['mean'].to_numpy(dtype=float),
+                'Std Dev': stats_df['std'].to_numpy(dtype=float)
+            })
+            columns = [ReportColumn('Target Category', 20), ReportColumn('Count', 8, '%8d'),
+                       ReportColumn('Mean', 10, '%10.4f'), ReportColumn('Std Dev', 10, '%10.4f')]
+            blocks.append(ReportTable(f"{var} by {tgt}", columns, data))
+
+    if 'prediction_quality' in metrics:
+        blocks.append(ReportLine("Overall Prediction Quality:", 'heading', gap=True))
+        pred_quality = metrics['prediction_quality']
+        if 'error' in pred_quality:
+            blocks.append(ReportLine(f"Error: {pred_quality['error']}"))
+        else:
+            for k, v in pred_quality.items():
+                if k != 'model_type':
+                    blocks.append(_metric_line(k, v))
+            accuracy = pred_quality.get('accuracy', 0)
+            if accuracy > 0.8:
+                quality = "excellent"
+            elif accuracy > 0.7:
+                quality = "good"
+            elif accuracy > 0.6:
+                quality = "moderate"
+            else:
+                quality = "poor"
+            blocks.append(ReportLine(
+                f"The combined predictive power of all variables is {quality} (accuracy: {accuracy:.4f})", gap=True))
+    return blocks
+
+
+def _multi_numeric_blocks(src_list, metrics):
+    blocks = [ReportLine(f"{metrics['r2']:.4f}", 'metric', label='R-squared'),
+              ReportLine(f"{metrics['intercept']:.4f}", 'metric', label='Intercept'),
+              ReportLine("Coefficients and p-values:", 'heading', gap=True)]
+    for src in src_list:
+        coef_val = metrics['coefs'].get(src, None)
+        p_val = metrics['p_values'].get(src, None)
+        coef_str = f"{coef_val:.4f}" if coef_val is not None else "Not calculable"
+        p_str = f"(p={p_val:.4f})" if p_val is not None else "(p=Not calculable)"
+        blocks.append(ReportLine(f"{coef_str} {p_str}", 'metric', label=src))
+    return blocks
+
+
+def _multi_anova_blocks(metrics):
+    blocks = [ReportLine(f"{metrics['r2']:.4f}", 'metric', label='R-squared'),
+              ReportLine(f"{metrics['f_value']:.4f}", 'metric', label='F-value'),
+              ReportLine(f"{metrics['overall_p_value']:.4f}", 'metric', label='Overall p-value'),
+              ReportLine("Individual p-values:", 'heading', gap=True)]
+    for var, p in metrics['p_values'].items():
+        blocks.append(ReportLine(f"{p:.4f}" if p is not None else "Not calculable", 'metric', label=var))
+
+    if 'category_stats' in metrics:
+        blocks.append(ReportLine("Category Statistics:", 'heading', gap=True))
+        for var, stats_df in metrics['category_stats'].items():
+            blocks.append(ReportLine(f"Variable: {var}", gap=True))
+            blocks.append(_category_table(f"{var} Category Statistics", stats_df))
+    return blocks
+
+
+def _generic_blocks(metrics):
+    return [_metric_line(k, v) for k, v in metrics.items() if k not in ('type', 'resampling')]
+
+
+def _screened_blocks(metrics):
+    """预筛选判定为弱关联的边：只输出各源变量在样本上的关联强度"""
+    blocks = [ReportLine(f"{metrics['strength']:.4f}", 'metric', label='Strength'),
+              ReportLine(f"Weak association (below screening threshold {metrics['threshold']}); full analysis skipped.",
+                         gap=True)]
+    for src, result in metrics['screening'].items():
+        blocks.append(ReportLine(
+            f"{result['measure']}={result['effect_size']:.4f}, "
+            f"information coefficient={result['information_coefficient']:.4f} (n={result['sample_size']})",
+            'metric', label=str(src)))
+    return blocks
+
+
+def _resampling_blocks(metrics):
+    """重抽样显著性结果"""
+    result = metrics.get('resampling')
+    if not result:
+        return []
+    if 'error' in result:
+        return [ReportLine(f"Resampling: {result['error']}")]
+
+    stopped = " (stopped early)" if result['permutation_stopped_early'] else ""
+    blocks = [ReportLine("Resampling Significance:", 'heading', gap=True),
+              ReportLine(f"{result['permutation_p_value']:.4f} "
+                         f"({result['n_permutations']} permutations of {result['statistic']}{stopped})",
+                         'metric', label='Permutation p')]
+    level = int(round(result['confidence_level'] * 100))
+    for name, (low, high) in result['bootstrap_ci'].items():
+        if low is None:
+            blocks.append(ReportLine("Not calculable", 'metric', label=name))
+        else:
+            blocks.append(ReportLine(f"{result['observed'][name]:.4f} [{level}% CI {low:.4f}, {high:.4f}]",
+                                     'metric', label=name))
+    blocks.append(ReportLine(f"(bootstrap resamples: {result['n_bootstrap']})"))
+    return blocks
+
+
+def build_edge_report(edge, metrics):
+    """将DAGRelations中单条边的分析结果转换为EdgeReport"""
+    rel_type = metrics['type']
+    if 'screening' in metrics:
+        source = list(edge[0]) if isinstance(edge[0], tuple) else edge[0]
+        return EdgeReport(source, edge[1], rel_type, _summary_metrics(metrics), _screened_blocks(metrics))
+    if isinstance(edge[0], tuple):
+        src_list = list(edge[0])
+        source = src_list
+        if rel_type == 'multi-numeric->numeric':
+            blocks = _multi_numeric_blocks(src_list, metrics)
+        elif rel_type in ['multi-categorical->numeric', 'mixed->numeric']:
+            blocks = _multi_anova_blocks(metrics)
+        elif rel_type in ['mixed->categorical', 'multi-categorical->categorical']:
+            blocks = _categorical_target_blocks(edge, metrics)
+        else:
+            blocks = _generic_blocks(metrics)
+    else:
+        source = edge[0]
+        if rel_type == 'categorical->numeric':
+            blocks = _categorical_numeric_blocks(edge, metrics)
+        elif rel_type == 'categorical->categorical':
+            blocks = _categorical_categorical_blocks(edge, metrics)
+        else:
+            blocks = _generic_blocks(metrics)
+
+    blocks.extend(_resampling_blocks(metrics))
+    return EdgeReport(source, edge[1], rel_type, _summary_metrics(metrics), blocks)
+
+
+def build_report(relations, errors):
+    """
+    从DAGRelations的分析结果构建结构化报告
+
+    参数:
+    relations (dict): DAGRelations.relations
+    errors (list): DAGRelations.errors
+
+    返回:
+    DAGReport: 结构化报告
+    """
+    return DAGReport([build_edge_report(edge, metrics) for edge, metrics in relations.items()], list(errors))
@@ -1,12 +1,116 @@
 import pandas as pd
 import numpy as np
 import json
+import time
 from scipy import stats
 import warnings
-import re
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from profiler import profile_continuous
+from density import density_summary
+from textanalysis import TextAnalyzer
+from datetimeanalysis import DatetimeAnalyzer
+from fingerprint import column_fingerprint, combine_fingerprints
+from profilecache import PROFILE_CACHE_VERSION
+from descriptionprompt import DescriptionPrompt
+from tokenbudget import estimate_tokens
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+
+# Per-process analyzer in worker processes, built by _init_worker from the shared data
+_worker_describer = None
+_worker_shm = None
+
+
+def _attach_shared_memory(name):
+    """Attach to an existing shared memory block (workers share the resource_tracker; the main process frees it)"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+def _init_worker(payload, include_histogram, string_threshold, include_density):
+    """
+    Worker initializer: read Arrow IPC data from shared memory for an ('arrow', name, size) payload,
+    or use the DataFrame of a ('pickle', DataFrame) payload directly.
+    """
+    global _worker_describer, _worker_shm
+    if payload[0] == 'arrow':
+        _, name, size = payload
+        _worker_shm = _attach_shared_memory(name)
+        data = pa.ipc.open_stream(_worker_shm.buf[:size]).read_all().to_pandas()
+    else:
+        data = payload[1]
+    _worker_describer = DataDescription(data, include_histogram=include_histogram,
+                                        string_threshold=string_threshold, include_density=include_density)
+
+
+def _describe_in_worker(column, kind):
+    """Analyze one column in a worker process and return (column, description, errors)"""
+    warnings.filterwarnings("ignore", category=FutureWarning, module="pandas")
+    describer = _worker_describer
+    describer.errors = []
+    try:
+        describer._analyze_column(column, kind)
+    except Exception as e:
+        describer.errors.append(f"Error analyzing {column}: {str(e)}")
+    describer._text_analyzers.pop(column, None)
+    return column, describer.descriptions.pop(column, None), list(describer.errors)
+
+
+def _share_frame(data):
+    """
+    Write the data to shared memory in Arrow IPC format and return (payload, shared memory).
+    Falls back to a pickle payload when pyarrow is unavailable or cannot convert the data.
+    """
+    if pa is not None and all(isinstance(col, str) for col in data.columns):
+        try:
+            table = pa.Table.from_pandas(data, preserve_index=False)
+            sink = pa.BufferOutputStream()
+            with pa.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table)
+            buffer = sink.getvalue()
+        except Exception as e:
+            print(f"Arrow shared memory unavailable, sending data to workers directly: {str(e)}")
+        else:
+            shm = shared_memory.SharedMemory(create=True, size=max(buffer.size, 1))
+            shm.buf[:buffer.size] = memoryview(buffer).cast('B')
+            return ('arrow', shm.name, buffer.size), shm
+    return ('pickle', data), None
+
+
+def required_sample_size(n_rows, error=0.01, confidence=0.95):
+    """
+    Number of sampled rows needed to reach an error target, with finite-population correction.
+    Takes the largest of three requirements: proportions (normal approximation, worst case p=0.5),
+    means (error in standard deviations) and quantiles (DKW bound on the empirical CDF).
+    
+    Parameters:
+    n_rows (int): Total number of rows
+    error (float): Target absolute error for proportions and ranks (error standard deviations for means)
+    confidence (float): Confidence level
+    
+    Returns:
+    int: Sample size (at most n_rows)
+    """
+    z = stats.norm.ppf(0.5 + confidence / 2)
+    proportion = z * z * 0.25 / error ** 2
+    mean = z * z / error ** 2
+    quantile = np.log(2 / (1 - confidence)) / (2 * error ** 2)
+    size = max(proportion, mean, quantile)
+    size = size / (1 + (size - 1) / max(n_rows, 1))
+    return int(min(np.ceil(size), n_rows))
+
 
 class DataDescription:
-    def __init__(self, data, include_histogram=False, string_threshold=30):
+    def __init__(self, data, include_histogram=False, string_threshold=30, n_jobs=1,
+                 parallel_min_cells=1_000_000, sample_rows=None, sample_error=0.01,
+                 sample_confidence=0.95, seed=42, cache=None, column_types=None, include_density=False):
         """
         Initialize the data description analyzer.
         
@@ -14,12 +118,42 @@ class DataDescription:
         data (pandas.DataFrame): DataFrame to analyze
         include_histogram (bool): Whether to include histogram data for continuous variables
         string_threshold (int): Maximum average word length to classify as categorical instead of string
+        n_jobs (int): Number of worker processes for per-column analysis (1 = serial)
+        parallel_min_cells (int): Minimum number of cells before the worker pool is used
+        sample_rows (int or str): Profile a stratified row sample instead of every row: None = exact,
+                                  'auto' = sized by sample_error/sample_confidence, int = fixed sample size
+        sample_error (float): Target absolute error for proportions and quantile ranks ('auto' sampling)
+        sample_confidence (float): Confidence level of the sampling error bounds
+        seed (int): Random seed for the row sample
+        cache (ProfileCache): Optional persistent cache of per-column descriptions keyed by content fingerprint
+        column_types (dict): Precomputed column types (e.g. TypeInference.column_types) that skip type detection
+        include_density (bool): Whether to store plotting data (histogram and binned KDE) for continuous variables;
+                                it is kept out of to_json
         """
         self.data = data
         self.descriptions = {}
         self.errors = []
         self.include_histogram = include_histogram
+        self.include_density = include_density
         self.string_threshold = string_threshold
+        self.n_jobs = n_jobs or 1
+        self.parallel_min_cells = parallel_min_cells
+        # Batched statistics for continuous columns (computed by profile_continuous)
+        self._profiles = {}
+        # Single-scan text analyzers, shared by type detection and string analysis
+        self._text_analyzers = {}
+        self.sample_rows = sample_rows
+        self.sample_error = sample_error
+        self.sample_confidence = sample_confidence
+        self.seed = seed
+        # Sampling details for dataset_info in to_json (None when every row is profiled)
+        self.sampling = None
+        # Optional persistent cache (ProfileCache): unchanged columns reuse their previous description
+        self.cache = cache
+        # Precomputed column types (TypeInference) that skip per-column type detection
+        self.column_types = column_types or {}
+        # Size and timing of the last to_prompt call, compared with the full JSON
+        self.prompt_stats = None
         
     def analyze_data(self):
         """
@@ -29,16 +163,319 @@ class DataDescription:
         # Suppress specific warnings
         warnings.filterwarnings("ignore", category=FutureWarning, module="pandas")
         
-        for column in self.data.columns:
+        columns = list(self.data.columns)
+        positions = self._sample_positions()
+        
+        # Columns whose content and parameters are unchanged come from the cache; only new or modified columns are analyzed
+        keys, cached = {}, {}
+        if self.cache is not None:
+            keys = {column: self._cache_key(column, positions is not None) for column in columns}
+            for column in columns:
+                entry = self.cache.get(keys[column])
+                if entry is not None:
+                    cached[column] = entry
+            if cached:
+                print(f"Reusing cached profiles for {len(cached)} of {len(columns)} columns")
+        pending = [column for column in columns if column not in cached]
+        
+        results, column_errors = {}, {}
+        if pending and positions is None:
+            results, column_errors = self._analyze_rows(pending)
+        elif pending:
+            # Profile the sampled rows, then correct cheap statistics such as counts and missing values from the full data
+            full_data = self.data
+            print(f"Profiling a stratified sample of {len(positions)} of {len(full_data)} rows...")
+            self.data = full_data.iloc[positions].reset_index(drop=True)
+            try:
+                results, column_errors = self._analyze_rows(pending)
+            finally:
+                self.data = full_data
+            self._apply_sampling(results, column_errors)
+        if positions is not None:
+            self.sampling = {
+                "method": "stratified row sample",
+                "sample_size": int(len(positions)),
+                "population_rows": int(len(self.data)),
+                "seed": self.seed,
+                "confidence": self.sample_confidence,
+                "target_error": self.sample_error if self.sample_rows == 'auto' else None,
+                "exact": ["count", "missing_count", "missing_percentage", "true_count", "false_count",
+                          "datetime columns"]
+            }
+        
+        for column in columns:
+            if column in cached:
+                description, errors = cached[column]
+            else:
+                description, errors = results.get(column), column_errors[column]
+                # Columns with errors are not cached, so they are analyzed again next time
+                if self.cache is not None and description is not None and not errors:
+                    self.cache.put(keys[column], (description, errors))
+            if description is not None:
+                self.descriptions[column] = description
+            self.errors.extend(errors)
+        return self
+    
+    def _cache_key(self, column, sampled):
+        """
+        Build the persistent cache key of a column's description.
+        
+        Parameters:
+        column (str): Column name
+        sampled (bool): Whether the column is profiled on a row sample
+        
+        Returns:
+        str: Hash of the column content and every parameter that affects its description
+        """
+        sampling = (self.sample_rows, self.sample_error, self.sample_confidence, self.seed) if sampled else None
+        return combine_fingerprints([PROFILE_CACHE_VERSION, str(column), column_fingerprint(self.data[column]),
+                                     self.include_histogram, self.include_density, self.string_threshold, sampling,
+                                     self.column_types.get(column)])
+    
+    def invalidate_cache(self, columns=None):
+        """
+        Remove the cached descriptions of the given columns so they are profiled again.
+        
+        Parameters:
+        columns (list): Columns to invalidate, all columns if None
+        """
+        if self.cache is None:
+            return
+        sampled = self._sample_positions() is not None
+        for column in (self.data.columns if columns is None else columns):
+            self.cache.discard(self._cache_key(column, sampled))
+    
+    def _analyze_rows(self, columns):
+        """
+        Analyze the given columns of self.data.
+        
+        Returns:
+        tuple: (column -> description, column -> list of errors)
+        """
+        parallel = (self.n_jobs > 1 and len(columns) > 1
+                    and len(self.data) * len(columns) >= self.parallel_min_cells)
+        
+        # Collect descriptions and errors per column and merge them in column order, so serial and parallel output match
+        results = {}
+        column_errors = {column: [] for column in columns}
+        kinds = {}
+        for column in columns:
+            # Type detection is expensive for text columns, so the parallel mode leaves it to the workers
+            if parallel and self._is_text_dtype(column) and column not in self.column_types:
+                kinds[column] = None
+                continue
             try:
-                print(f"Analyzing {column}...")
-                self._analyze_column(column)
+                kinds[column] = self._column_kind(column)
             except Exception as e:
                 error_msg = f"Error analyzing {column}: {str(e)}"
                 print(error_msg)
-                self.errors.append(error_msg)
+                column_errors[column].append(error_msg)
+        
+        continuous = [column for column, kind in kinds.items() if kind == 'continuous']
+        others = [column for column, kind in kinds.items() if kind != 'continuous']
+        
+        pool = shm = None
+        futures = []
+        if parallel and others:
+            # Adaptive scheduling: submit the most expensive columns (usually long text) first
+            others = sorted(others, key=self._estimate_cost, reverse=True)
+            payload, shm = _share_frame(self.data)
+            pool = ProcessPoolExecutor(max_workers=min(self.n_jobs, len(others)), initializer=_init_worker,
+                                       initargs=(payload, self.include_histogram, self.string_threshold,
+                                                 self.include_density))
+            print(f"Analyzing {len(others)} columns with {min(self.n_jobs, len(others))} worker processes...")
+            futures = [pool.submit(_describe_in_worker, column, kinds[column]) for column in others]
+            others = []
         
-        return self
+        try:
+            # Continuous columns are profiled in batches per dtype (alongside the workers in parallel mode)
+            if continuous:
+                print(f"Profiling {len(continuous)} continuous columns...")
+                try:
+                    self._profiles = profile_continuous(self.data, continuous)
+                except Exception as e:
+                    print(f"Batch profiling failed, falling back to per-column analysis: {str(e)}")
+                    self._profiles = {}
+            
+            for column in continuous + others:
+                start = len(self.errors)
+                try:
+                    if kinds[column] != 'continuous':
+                        print(f"Analyzing {column}...")
+                    self._analyze_column(column, kinds[column])
+                except Exception as e:
+                    error_msg = f"Error analyzing {column}: {str(e)}"
+                    print(error_msg)
+                    self.errors.append(error_msg)
+                column_errors[column].extend(self.errors[start:])
+                del self.errors[start:]
+                if column in self.descriptions:
+                    results[column] = self.descriptions.pop(column)
+            
+            for future in futures:
+                column, description, errors = future.result()
+                for error_msg in errors:
+                    print(error_msg)
+                column_errors[column].extend(errors)
+                if description is not None:
+                    results[column] = description
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+        
+        # Text analyzers hold the concatenated text; release them once the analysis is done
+        self._text_analyzers = {}
+        
+        return results, column_errors
+    
+    def _sample_positions(self):
+        """
+        Choose the rows to profile in sampling mode.
+        
+        Returns:
+        numpy.ndarray: Sorted row positions, or None when every row should be profiled
+        """
+        if self.sample_rows is None:
+            return None
+        n_rows = len(self.data)
+        if self.sample_rows == 'auto':
+            size = required_sample_size(n_rows, self.sample_error, self.sample_confidence)
+        else:
+            size = int(self.sample_rows)
+        if size <= 0 or size >= n_rows:
+            return None
+        # One random row from each of size equal strata of the row order, so files sorted by time are covered evenly
+        rng = np.random.default_rng(self.seed)
+        edges = np.arange(size + 1, dtype=np.int64) * n_rows // size
+        return edges[:-1] + (rng.random(size) * np.diff(edges)).astype(np.int64)
+    
+    def _apply_sampling(self, results, column_errors):
+        """
+        Correct the sample-based descriptions with exact counts from the full data and
+        attach estimated errors.
+        
+        Parameters:
+        results (dict): Column name -> description computed on the sample (updated in place)
+        column_errors (dict): Column name -> list of errors (updated in place)
+        """
+        n_rows = len(self.data)
+        z = float(stats.norm.ppf(0.5 + self.sample_confidence / 2))
+        
+        for column, desc in list(results.items()):
+            missing_count = int(self.data[column].isna().sum())
+            count = n_rows - missing_count
+            if desc["type"] == 'unknown' and count > 0:
+                # Entirely missing in the sample: the few non-missing rows are analyzed exactly
+                column_types = {column: self.column_types[column]} if column in self.column_types else None
+                describer = DataDescription(self.data[[column]].dropna(), include_histogram=self.include_histogram,
+                                            string_threshold=self.string_threshold,
+                                            include_density=self.include_density,
+                                            column_types=column_types).analyze_data()
+                column_errors[column].extend(describer.errors)
+                if column not in describer.descriptions:
+                    continue
+                desc = results[column] = describer.descriptions[column]
+                sample_count = count
+            else:
+                sample_count = desc.get("count", 0)
+            desc["missing_count"] = missing_count
+            desc["missing_percentage"] = float(missing_count / n_rows * 100) if n_rows else 0
+            if desc["type"] == 'datetime' and sample_count < count:
+                # Gaps, duplicate timestamps and frequency cannot be estimated from a sample; the datetime analysis
+                # is a sort plus integer arithmetic, so it is computed exactly on the full data
+                desc.update(DatetimeAnalyzer(self.data[column]).summary())
+                desc["count"] = count
+                continue
+            if desc["type"] == 'unknown' or sample_count >= count:
+                continue
+            desc["count"] = count
+            self._scale_counts(column, desc, count / sample_count if sample_count else 0)
+            
+            # The error depends on the effective sample of non-missing values, with finite-population correction
+            fpc = np.sqrt((count - sample_count) / (count - 1)) if count > 1 else 0.0
+            proportion_margin = z * 0.5 / np.sqrt(sample_count) * fpc if sample_count else None
+            approximation = {
+                "method": "stratified row sample",
+                "sample_count": int(sample_count),
+                "proportion_margin": float(proportion_margin * 100) if proportion_margin is not None else None
+            }
+            if desc["type"] == 'continuous' and sample_count:
+                approximation["mean_margin"] = float(z * desc["std"] / np.sqrt(sample_count) * fpc)
+                # DKW bound on the empirical CDF deviation, i.e. the quantile rank error
+                approximation["quantile_rank_error"] = float(
+                    np.sqrt(np.log(2 / (1 - self.sample_confidence)) / (2 * sample_count)) * fpc)
+            if desc["type"] in ('categorical', 'string'):
+                approximation["unique_values_is_lower_bound"] = True
+            desc["approximation"] = approximation
+    
+    def _scale_counts(self, column, desc, scale):
+        """
+        Rescale the frequency counts of a sample-based description to the full data.
+        
+        Parameters:
+        column (str): Column name
+        desc (dict): Description computed on the sample (updated in place)
+        scale (float): Ratio of non-missing values in the full data to those in the sample
+        """
+        scaled = lambda value: int(round(value * scale))
+        col_type = desc["type"]
+        if col_type == 'continuous':
+            desc["outliers"]["count"] = scaled(desc["outliers"]["count"])
+            for key in ("histogram", "density"):
+                if key in desc:
+                    desc[key]["counts"] = [scaled(value) for value in desc[key]["counts"]]
+        elif col_type == 'categorical':
+            categories = desc.get("categories", {})
+            entries = list(categories["top_10"].values()) if "top_10" in categories else list(categories.values())
+            for entry in entries + [desc.get("most_common", {}), desc.get("least_common", {})]:
+                if "count" in entry:
+                    entry["count"] = scaled(entry["count"])
+        elif col_type == 'string':
+            if "word_frequency" in desc:
+                frequency = desc["word_frequency"]
+                frequency["total_words"] = scaled(frequency["total_words"])
+                frequency["top_words"] = {word: scaled(value) for word, value in frequency["top_words"].items()}
+        elif col_type == 'boolean':
+            # Boolean true counts are cheap to compute exactly
+            col_data = self.data[column].dropna()
+            true_count = int(col_data.sum())
+            false_count = len(col_data) - true_count
+            desc.update({
+                "true_count": true_count,
+                "false_count": false_count,
+                "true_percentage": float(true_count / len(col_data) * 100) if len(col_data) else 0,
+                "false_percentage": float(false_count / len(col_data) * 100) if len(col_data) else 0
+            })
+    
+    def _is_text_dtype(self, column):
+        dtype = self.data[column].dtype
+        return dtype == object or pd.api.types.is_string_dtype(dtype) and not isinstance(dtype, pd.CategoricalDtype)
+    
+    def _estimate_cost(self, column):
+        """Estimate the relative cost of analyzing a column; text columns are weighted by their average sample length"""
+        col_data = self.data[column]
+        cost = float(len(col_data))
+        if self._is_text_dtype(column):
+            sample = col_data.dropna().head(200).astype(str)
+            cost *= 1 + (sample.str.len().mean() if len(sample) else 0)
+        return cost
+    
+    def _text_analyzer(self, column):
+        """
+        Get the cached single-scan text analyzer for a column.
+        
+        Parameters:
+        column (str): Column name to analyze
+        
+        Returns:
+        TextAnalyzer: Analyzer over the column's non-missing values
+        """
+        if column not in self._text_analyzers:
+            self._text_analyzers[column] = TextAnalyzer(self.data[column])
+        return self._text_analyzers[column]
     
     def _is_string_type(self, column):
         """
@@ -50,22 +487,22 @@ class DataDescription:
         Returns:
         bool: True if the column should be classified as string, False otherwise
         """
-        col_data = self.data[column].dropna().astype(str)
+        summary = self._text_analyzer(column).summary()
         
-        if len(col_data) == 0:
+        if summary["count"] == 0:
             return False
             
         # Check if values contain longer text
-        avg_length = col_data.str.len().mean()
+        avg_length = summary["avg_chars"]
         
         # Check for word count
-        avg_word_count = col_data.str.split().str.len().mean()
+        avg_word_count = summary["avg_words"]
         
         # Check if values contain sentences (periods, exclamation, question marks)
-        has_sentences = any(col_data.str.contains(r'[.!?]\s+[A-Z]'))
+        has_sentences = summary["has_sentences"]
         
         # Check uniqueness ratio - high uniqueness suggests strings/descriptions
-        uniqueness_ratio = len(col_data.unique()) / len(col_data)
+        uniqueness_ratio = summary["uniqueness_ratio"]
         
         # Determine if string type based on thresholds
         is_string = (avg_length > self.string_threshold or 
@@ -75,15 +512,57 @@ class DataDescription:
         
         return is_string
     
-    def _analyze_column(self, column):
+    def _column_kind(self, column):
+        """
+        Determine how a column should be analyzed.
+        
+        Parameters:
+        column (str): Column name to classify
+        
+        Returns:
+        str: One of 'unknown', 'continuous', 'categorical', 'boolean', 'datetime' or 'string'
+        """
+        # Check for missing values first: with sampling, a sparse column can be entirely missing in the sample,
+        # and the type inferred from the full data does not apply
+        col_data = self.data[column]
+        if col_data.isna().all():
+            return 'unknown'
+        if column in self.column_types:
+            return self.column_types[column]
+        
+        col_type = col_data.dtype
+        
+        # Determine if the column should be treated as categorical, continuous, or string
+        # (pandas API checks also cover nullable Int64/boolean and category dtypes)
+        if pd.api.types.is_bool_dtype(col_type):
+            return 'boolean'
+        elif pd.api.types.is_numeric_dtype(col_type):
+            # Additional check for binary or few-valued numeric columns
+            unique_values = col_data.dropna().unique()
+            if len(unique_values) <= min(10, len(col_data) // 10):  # Heuristic for categorical numeric data
+                return 'categorical'
+            return 'continuous'
+        elif pd.api.types.is_datetime64_any_dtype(col_type):
+            return 'datetime'
+        # Check if this should be treated as a string field rather than categorical
+        if self._is_string_type(column):
+            return 'string'
+        # For strings with shorter values, analyze as categorical
+        return 'categorical'
+    
+    def _analyze_column(self, column, kind=None):
         """
         Analyze a single column based on its data type.
         
         Parameters:
         column (str): Column name to analyze
+        kind (str): Precomputed result of _column_kind, detected if None
         """
+        if kind is None:
+            kind = self._column_kind(column)
+        
         # Skip analysis if column has all NaN values
-        if self.data[column].isna().all():
+        if kind == 'unknown':
             self.descriptions[column] = {
                 "type": "unknown",
                 "missing_count": len(self.data),
@@ -92,33 +571,19 @@ class DataDescription:
             }
             return
         
-        # Determine the data type
-        col_data = self.data[column]
-        col_type = col_data.dtype
-        
         # Count missing values
+        col_data = self.data[column]
         missing_count = col_data.isna().sum()
         missing_percentage = (missing_count / len(col_data)) * 100
         
-        # Determine if the column should be treated as categorical, continuous, or string
-        if np.issubdtype(col_type, np.number):
-            # Additional check for binary or few-valued numeric columns
-            unique_values = col_data.dropna().unique()
-            if len(unique_values) <= min(10, len(col_data) // 10):  # Heuristic for categorical numeric data
-                self._analyze_categorical(column, missing_count, missing_percentage)
-            else:
-                self._analyze_continuous(column, missing_count, missing_percentage)
-        elif col_type == 'bool':
-            self._analyze_boolean(column, missing_count, missing_percentage)
-        elif np.issubdtype(col_type, np.datetime64):
-            self._analyze_datetime(column, missing_count, missing_percentage)
-        else:
-            # Check if this should be treated as a string field rather than categorical
-            if self._is_string_type(column):
-                self._analyze_string(column, missing_count, missing_percentage)
-            else:
-                # For strings with shorter values, analyze as categorical
-                self._analyze_categorical(column, missing_count, missing_percentage)
+        analyzers = {
+            'continuous': self._analyze_continuous,
+            'categorical': self._analyze_categorical,
+            'boolean': self._analyze_boolean,
+            'datetime': self._analyze_datetime,
+            'string': self._analyze_string
+        }
+        analyzers[kind](column, missing_count, missing_percentage)
     
     def _analyze_continuous(self, column, missing_count, missing_percentage):
         """
@@ -126,37 +591,38 @@ class DataDescription:
         """
         col_data = self.data[column].dropna()
         
+        # Statistics come from the batched profile, or are computed here when a single column is analyzed
+        profile = self._profiles.get(column)
+        if profile is None:
+            profile = profile_continuous(self.data, [column])[column]
+        
         # Basic statistics
         stats_dict = {
             "type": "continuous",
-            "count": len(col_data),
+            "count": profile["count"],
             "missing_count": missing_count,
             "missing_percentage": missing_percentage,
-            "min": float(col_data.min()),
-            "max": float(col_data.max()),
-            "mean": float(col_data.mean()),
-            "median": float(col_data.median()),
-            "std": float(col_data.std()),
-            "q1": float(col_data.quantile(0.25)),
-            "q3": float(col_data.quantile(0.75)),
-            "iqr": float(col_data.quantile(0.75) - col_data.quantile(0.25))
+            "min": profile["min"],
+            "max": profile["max"],
+            "mean": profile["mean"],
+            "median": profile["median"],
+            "std": profile["std"],
+            "q1": profile["q1"],
+            "q3": profile["q3"],
+            "iqr": profile["iqr"]
         }
         
         # Add variance
-        stats_dict["variance"] = float(col_data.var())
+        stats_dict["variance"] = profile["variance"]
         
         # Add skewness and kurtosis
-        try:
-            stats_dict["skewness"] = float(stats.skew(col_data))
-            stats_dict["kurtosis"] = float(stats.kurtosis(col_data))
-        except:
-            stats_dict["skewness"] = None
-            stats_dict["kurtosis"] = None
+        stats_dict["skewness"] = profile["skewness"]
+        stats_dict["kurtosis"] = profile["kurtosis"]
         
         # Test for normality
         try:
             if len(col_data) >= 8:  # Minimum sample size for Shapiro-Wilk test
-                shapiro_test = stats.shapiro(col_data.sample(min(5000, len(col_data))))
+                shapiro_test = stats.shapiro(col_data.sample(min(5000, len(col_data)), random_state=self.seed))
                 stats_dict["normality_test"] = {
                     "test": "shapiro",
                     "statistic": float(shapiro_test[0]),
@@ -167,28 +633,26 @@ class DataDescription:
             pass
         
         # Detect outliers using IQR method
-        q1 = col_data.quantile(0.25)
-        q3 = col_data.quantile(0.75)
-        iqr = q3 - q1
-        lower_bound = q1 - 1.5 * iqr
-        upper_bound = q3 + 1.5 * iqr
-        outliers = col_data[(col_data < lower_bound) | (col_data > upper_bound)]
-        
+        outlier_count = profile["outlier_count"]
         stats_dict["outliers"] = {
-            "count": int(len(outliers)),
-            "percentage": float((len(outliers) / len(col_data)) * 100) if len(col_data) > 0 else 0,
-            "lower_bound": float(lower_bound),
-            "upper_bound": float(upper_bound)
+            "count": outlier_count,
+            "percentage": float((outlier_count / profile["count"]) * 100) if profile["count"] > 0 else 0,
+            "lower_bound": profile["lower_bound"],
+            "upper_bound": profile["upper_bound"]
         }
         
         # Calculate histogram data for distribution overview only if requested
-        if self.include_histogram:
+        # Histogram and KDE are computed in one pass and reused by the plots without rescanning the data
+        if self.include_histogram or self.include_density:
             try:
-                hist_values, hist_bins = np.histogram(col_data, bins='auto')
-                stats_dict["histogram"] = {
-                    "bin_edges": hist_bins.tolist(),
-                    "counts": hist_values.tolist()
-                }
+                density = density_summary(col_data.to_numpy(dtype=np.float64))
+                if self.include_histogram:
+                    stats_dict["histogram"] = {
+                        "bin_edges": density["bin_edges"],
+                        "counts": density["counts"]
+                    }
+                if self.include_density:
+                    stats_dict["density"] = density
             except:
                 pass
         
@@ -201,8 +665,10 @@ class DataDescription:
         col_data = self.data[column].dropna()
         
         # Get value counts and calculate percentages
+        # (category dtype also reports unused categories with a zero count)
         value_counts = col_data.value_counts()
-        value_percentages = (col_data.value_counts(normalize=True) * 100).round(2)
+        value_counts = value_counts[value_counts > 0]
+        value_percentages = (value_counts / value_counts.sum() * 100).round(2)
         
         # Combine counts and percentages
         categories = {}
@@ -268,60 +734,39 @@ class DataDescription:
         """
         col_data = self.data[column].dropna().astype(str)
         
-        # Basic text statistics
-        char_lengths = col_data.str.len()
-        word_counts = col_data.str.split().str.len()
+        # Lengths, word counts, pattern flags and word frequencies all come from the single-scan text analysis
+        analyzer = self._text_analyzer(column)
+        summary = analyzer.summary()
         
         stats_dict = {
             "type": "string",
-            "count": int(len(col_data)),
+            "count": summary["count"],
             "missing_count": int(missing_count),
             "missing_percentage": float(missing_percentage),
-            "unique_values": int(len(col_data.unique())),
-            "uniqueness_ratio": float(len(col_data.unique()) / len(col_data)) if len(col_data) > 0 else 0,
+            "unique_values": summary["unique_values"],
+            "uniqueness_ratio": summary["uniqueness_ratio"],
             "text_length": {
-                "min_chars": int(char_lengths.min()) if not char_lengths.empty else 0,
-                "max_chars": int(char_lengths.max()) if not char_lengths.empty else 0,
-                "avg_chars": float(char_lengths.mean()) if not char_lengths.empty else 0,
-                "min_words": int(word_counts.min()) if not word_counts.empty else 0,
-                "max_words": int(word_counts.max()) if not word_counts.empty else 0,
-                "avg_words": float(word_counts.mean()) if not word_counts.empty else 0
+                "min_chars": summary["min_chars"],
+                "max_chars": summary["max_chars"],
+                "avg_chars": summary["avg_chars"],
+                "min_words": summary["min_words"],
+                "max_words": summary["max_words"],
+                "avg_words": summary["avg_words"]
             }
         }
         
-        # Check for patterns
-        has_emails = col_data.str.contains(r'[^@]+@[^@]+\.[^@]+').any()
-        has_urls = col_data.str.contains(r'https?://\S+|www\.\S+').any()
-        has_numbers = col_data.str.contains(r'\d+').any()
-        has_special_chars = col_data.str.contains(r'[^\w\s]').any()
-        
         stats_dict["patterns"] = {
-            "contains_emails": bool(has_emails),
-            "contains_urls": bool(has_urls),
-            "contains_numbers": bool(has_numbers),
-            "contains_special_chars": bool(has_special_chars)
+            "contains_emails": summary["contains_emails"],
+            "contains_urls": summary["contains_urls"],
+            "contains_numbers": summary["contains_numbers"],
+            "contains_special_chars": summary["contains_special_chars"]
         }
         
         # Common words and their frequency (if more than one word present)
-        if word_counts.max() > 1:
-            # Flatten all words into a single list
-            all_words = []
-            for text in col_data:
-                words = re.findall(r'\b\w+\b', text.lower())
-                all_words.extend(words)
-            
-            # Count word frequencies
-            if all_words:
-                word_freq = pd.Series(all_words).value_counts()
-                top_words = {}
-                for word, count in word_freq.head(10).items():
-                    top_words[word] = int(count)
-                
-                stats_dict["word_frequency"] = {
-                    "total_words": len(all_words),
-                    "unique_words": len(word_freq),
-                    "top_words": top_words
-                }
+        if summary["max_words"] > 1:
+            word_frequency = analyzer.word_frequency(top_k=10)
+            if word_frequency["total_words"]:
+                stats_dict["word_frequency"] = word_frequency
         
         # Sample values (first few values)
         if len(col_data) > 0:
@@ -356,33 +801,39 @@ class DataDescription:
         """
         Analyze a datetime column.
         """
-        col_data = self.data[column].dropna()
+        # Distribution, duplicate timestamps, frequency, gaps and period counts are computed once on sorted int64 timestamps
+        analyzer = DatetimeAnalyzer(self.data[column])
         
         stats_dict = {
             "type": "datetime",
-            "count": int(len(col_data)),
+            "count": int(analyzer.count),
             "missing_count": int(missing_count),
-            "missing_percentage": float(missing_percentage),
-            "min": col_data.min().isoformat() if not col_data.empty else None,
-            "max": col_data.max().isoformat() if not col_data.empty else None,
-            "range_days": int((col_data.max() - col_data.min()).days) if not col_data.empty else None
+            "missing_percentage": float(missing_percentage)
         }
-        
-        # Calculate time distribution by year, month, day of week
-        if not col_data.empty:
-            years_count = col_data.dt.year.value_counts().to_dict()
-            months_count = col_data.dt.month.value_counts().sort_index().to_dict()
-            weekdays_count = col_data.dt.dayofweek.value_counts().sort_index().to_dict()
-            
-            # Convert keys to strings for JSON serialization
-            stats_dict["distribution"] = {
-                "years": {str(k): int(v) for k, v in years_count.items()},
-                "months": {str(k): int(v) for k, v in months_count.items()},
-                "weekdays": {str(k): int(v) for k, v in weekdays_count.items()}
-            }
+        stats_dict.update(analyzer.summary())
         
         self.descriptions[column] = stats_dict
     
+    def _dataset_info(self):
+        """
+        Summarize the size and missing values of the whole dataset.
+        
+        Returns:
+        dict: Row, column, cell and missing-cell counts
+        """
+        rows, columns = len(self.data), len(self.data.columns)
+        missing_cells = int(self.data.isna().sum().sum())
+        info = {
+            "rows": int(rows),
+            "columns": int(columns),
+            "total_cells": int(rows * columns),
+            "missing_cells": missing_cells,
+            "missing_percentage": float((missing_cells / (rows * columns) * 100) if rows * columns > 0 else 0)
+        }
+        if self.sampling is not None:
+            info["sampling"] = self.sampling
+        return info
+    
     def to_json(self, indent=2):
         """
         Convert the descriptions to a JSON string.
@@ -394,15 +845,11 @@ class DataDescription:
         str: JSON string representation of the data descriptions
         """
         # Create a copy to avoid modifying the original
+        # Plotting density arrays are kept out of the JSON
         output_dict = {
-            "column_descriptions": self.descriptions,
-            "dataset_info": {
-                "rows": int(len(self.data)),
-                "columns": int(len(self.data.columns)),
-                "total_cells": int(len(self.data) * len(self.data.columns)),
-                "missing_cells": int(self.data.isna().sum().sum()),
-                "missing_percentage": float((self.data.isna().sum().sum() / (len(self.data) * len(self.data.columns)) * 100) if len(self.data) * len(self.data.columns) > 0 else 0)
-            }
+            "column_descriptions": {column: {key: value for key, value in desc.items() if key != "density"}
+                                    for column, desc in self.descriptions.items()},
+            "dataset_info": self._dataset_info()
         }
         
         # Add data types summary
@@ -419,6 +866,37 @@ class DataDescription:
         # Convert to JSON
         return json.dumps(output_dict, indent=indent, default=str)
     
+    def to_prompt(self, dag_edges=None, token_budget=None):
+        """
+        Convert the descriptions to a compact, token-budgeted text for LLM prompts.
+        
+        Parameters:
+        dag_edges (list): DAG edges; columns in the DAG are ranked first and dropped last
+        token_budget (int): Maximum estimated number of tokens, unlimited if None
+        
+        Returns:
+        str: Dense tabular encoding of the column descriptions
+        """
+        start = time.perf_counter()
+        prompt = DescriptionPrompt(self.descriptions, self._dataset_info(), self.errors, dag_edges).to_prompt(token_budget)
+        prompt_time = time.perf_counter() - start
+        
+        # Record how much smaller the prompt is than the full JSON
+        start = time.perf_counter()
+        json_tokens = estimate_tokens(self.to_json())
+        json_time = time.perf_counter() - start
+        prompt_tokens = estimate_tokens(prompt)
+        self.prompt_stats = {
+            "prompt_tokens": prompt_tokens,
+            "json_tokens": json_tokens,
+            "token_savings_percentage": float((1 - prompt_tokens / json_tokens) * 100) if json_tokens else 0,
+            "prompt_seconds": prompt_time,
+            "json_seconds": json_time
+        }
+        print(f"Data description prompt: {prompt_tokens} tokens "
+              f"(JSON: {json_tokens} tokens, {self.prompt_stats['token_savings_percentage']:.1f}% smaller)")
+        return prompt
+    
     def save_json(self, filename):
         """
         Save the descriptions to a JSON file.
@@ -0,0 +1,284 @@
+#datetimeanalysis.py
+import numpy as np
+import pandas as pd
+from pandas.tseries.frequencies import to_offset
+
+DAY_NS = 86_400 * 10 ** 9
+HOUR_NS = 3_600 * 10 ** 9
+# 等于最常见步长的间隔占比低于该值时视为不规则
+MIN_REGULARITY = 0.5
+_WEEKDAYS = ['MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT', 'SUN']
+_MONTHS = ['JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN', 'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC']
+
+
+def _alias(new, old):
+    """pandas 2.2起月末/季末/年末的频率别名改为ME/QE/YE，旧版本使用M/Q/A"""
+    try:
+        to_offset(new)
+        return new
+    except ValueError:
+        return old
+
+
+_MONTH_END, _QUARTER_END, _YEAR_END = _alias('ME', 'M'), _alias('QE', 'Q'), _alias('YE', 'A')
+_YEAR_START = _alias('YS', 'AS')
+
+
+def _runs(codes):
+    """已排序整数数组的游程：返回 (每段的值, 每段的长度)"""
+    if len(codes) == 0:
+        return codes, np.zeros(0, dtype=np.int64)
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    return codes[starts], np.diff(np.r_[starts, len(codes)])
+
+
+def _grouped(codes, weights):
+    """已排序整数数组按相同值分段：返回 (每段的值, 每段weights之和)"""
+    if len(codes) == 0:
+        return codes, np.zeros(0, dtype=np.int64)
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    return codes[starts], np.add.reduceat(weights, starts)
+
+
+def _mode(values):
+    unique, counts = np.unique(values, return_counts=True)
+    return unique[np.argmax(counts)]
+
+
+class DatetimeAnalyzer:
+    # 周期计数的分辨率，从粗到细
+    RESOLUTIONS = ['year', 'quarter', 'month', 'week', 'day', 'hour']
+
+    def __init__(self, values):
+        """
+        日期时间列的单次扫描分析：排序一次得到int64纳秒时间戳，之后的分布、重复时间戳、
+        采样频率、缺口和多分辨率的周期计数都在整数数组上向量化计算，不再逐次使用.dt转换。
+
+        参数:
+        values (pandas.Series): datetime64类型的列（缺失值会被忽略，带时区时按当地时间分析）
+        """
+        values = pd.Series(values).dropna()
+        tz = getattr(values.dt, 'tz', None)
+        if tz is not None:
+            values = values.dt.tz_localize(None)
+        timestamps = np.sort(values.to_numpy(dtype='datetime64[ns]').view(np.int64))
+        self._set_counts(*_runs(timestamps), tz)
+
+    @classmethod
+    def from_counts(cls, timestamps, counts, tz=None):
+        """
+        由去重后的时间戳及其行数构造（例如分块累计的计数），结果与在展开后的列上分析相同
+
+        参数:
+        timestamps (numpy.ndarray): int64纳秒时间戳（当地时间），不要求排序
+        counts (numpy.ndarray): 每个时间戳的行数
+        tz: 时间戳所属的时区，输出的时间带该时区
+        """
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        order = np.argsort(timestamps, kind='stable')
+        analyzer = cls.__new__(cls)
+        analyzer._set_counts(*_grouped(timestamps[order], np.asarray(counts, dtype=np.int64)[order]), tz)
+        return analyzer
+
+    def _set_counts(self, unique, repeats, tz):
+        self.tz = tz
+        self._unique, self._repeats = unique, repeats
+        self.count = int(repeats.sum())
+        self._frequency = None
+
+    # ---- 整数日历编码（均随时间单调，排序后的数组上可直接求游程） ----
+    def _days(self, ns):
+        return ns // DAY_NS
+
+    def _months(self, ns):
+        """1970年1月起的月序号"""
+        return ns.view('datetime64[ns]').astype('datetime64[M]').astype(np.int64)
+
+    def _codes(self, resolution, ns):
+        if resolution == 'year':
+            return self._months(ns) // 12
+        if resolution == 'quarter':
+            return self._months(ns) // 3
+        if resolution == 'month':
+            return self._months(ns)
+        if resolution == 'week':
+            # 1970-01-01是星期四，按周一开始的周编号
+            return (self._days(ns) + 3) // 7
+        if resolution == 'day':
+            return self._days(ns)
+        return ns // HOUR_NS
+
+    def _label(self, resolution, code):
+        code = int(code)
+        if resolution == 'year':
+            return str(1970 + code)
+        if resolution == 'quarter':
+            return f"{1970 + code // 4}Q{code % 4 + 1}"
+        if resolution == 'month':
+            return f"{1970 + code // 12}-{code % 12 + 1:02d}"
+        if resolution == 'week':
+            return str(np.datetime64(code * 7 - 3, 'D'))
+        if resolution == 'day':
+            return str(np.datetime64(code, 'D'))
+        return str(np.datetime64(code, 'h')).replace('T', ' ') + ':00'
+
+    def _timestamp(self, ns):
+        stamp = pd.Timestamp(int(ns))
+        return stamp.tz_localize(self.tz) if self.tz is not None else stamp
+
+    # ---- 统计量 ----
+    def distribution(self):
+        """与原来.dt统计相同的年份、月份（1-12）和星期（0=周一）分布"""
+        months = self._months(self._unique)
+        years, year_counts = _grouped(months // 12, self._repeats)
+        # 年份按行数从多到少排列（与value_counts相同）
+        order = np.argsort(-year_counts, kind='stable')
+        years, year_counts = years[order], year_counts[order]
+        month_counts = np.bincount(months % 12 + 1, weights=self._repeats, minlength=13)
+        weekday_counts = np.bincount((self._days(self._unique) + 3) % 7, weights=self._repeats, minlength=7)
+        return {
+            "years": {str(1970 + year): int(count) for year, count in zip(years, year_counts)},
+            "months": {str(month): int(month_counts[month]) for month in range(1, 13) if month_counts[month]},
+            "weekdays": {str(day): int(weekday_counts[day]) for day in range(7) if weekday_counts[day]}
+        }
+
+    def duplicates(self):
+        """重复时间戳：面板数据（多个分组共用日期）中重复是正常的"""
+        repeats = self._repeats
+        return {
+            "unique_timestamps": int(len(self._unique)),
+            "duplicate_rows": int(self.count - len(self._unique)),
+            "duplicated_timestamps": int((repeats > 1).sum()),
+            "max_rows_per_timestamp": int(repeats.max()) if len(repeats) else 0
+        }
+
+    def frequency(self):
+        """
+        推断采样频率：在去重后的时间戳上按日历（月/季/年）或固定步长（周、日、小时等）判断最常见的间隔
+
+        返回:
+        dict: alias（pandas频率别名，无法推断或不规则时为None）、regularity（等于最常见步长的间隔占比）、
+              median_interval，以及内部使用的steps（每个间隔相当于多少个周期）
+        """
+        if self._frequency is not None:
+            return self._frequency
+        unique = self._unique
+        result = {"alias": None, "regularity": None, "median_interval": None, "steps": None}
+        if len(unique) < 3:
+            self._frequency = result
+            return result
+
+        alias, steps = None, None
+        if np.all(unique % DAY_NS == 0):
+            months = self._months(unique)
+            days = self._days(unique)
+            day_of_month = days - (months.view('datetime64[M]').astype('datetime64[D]').astype(np.int64))
+            next_month_start = (months + 1).view('datetime64[M]').astype('datetime64[D]').astype(np.int64)
+            month_start = np.all(day_of_month == 0)
+            month_end = np.all(days == next_month_start - 1)
+            month_step = int(_mode(np.diff(months)))
+            if (month_start or month_end) and month_step in (1, 3, 12):
+                steps = np.diff(months) / month_step
+                first = months[0] % 12
+                if month_step == 1:
+                    alias = 'MS' if month_start else _MONTH_END
+                elif month_step == 3:
+                    # QS按季度首月锚定（JAN/FEB/MAR），QE按季度末月所在的财年末锚定（OCT/NOV/DEC）
+                    alias = f"QS-{_MONTHS[first % 3]}" if month_start else f"{_QUARTER_END}-{_MONTHS[first % 3 + 9]}"
+                else:
+                    alias = f"{_YEAR_START if month_start else _YEAR_END}-{_MONTHS[first]}"
+            else:
+                weekdays = (days + 3) % 7
+                day_step = int(_mode(np.diff(days)))
+                if day_step == 1 and weekdays.max() < 5 and days[-1] - days[0] >= 14:
+                    # 只有工作日的日数据
+                    alias = 'B'
+                    steps = np.busday_count(days[:-1].astype('datetime64[D]'), days[1:].astype('datetime64[D]'))
+                elif day_step == 7:
+                    alias = f"W-{_WEEKDAYS[weekdays[0]]}"
+                    steps = np.diff(days) / 7
+        if alias is None:
+            diffs = np.diff(unique)
+            step = int(_mode(diffs))
+            alias = to_offset(pd.Timedelta(step, unit='ns')).freqstr
+            steps = diffs / step
+
+        regularity = float(np.mean(np.isclose(steps, 1)))
+        result["regularity"] = regularity
+        result["median_interval"] = str(pd.Timedelta(int(np.median(np.diff(unique))), unit='ns'))
+        # 大多数间隔都不等于最常见步长时视为不规则的时间序列，不给出频率
+        if regularity >= MIN_REGULARITY:
+            result.update({"alias": alias, "steps": steps})
+        self._frequency = result
+        return result
+
+    def gaps(self, top=5):
+        """
+        相对推断频率的缺口：间隔超过1个周期的位置、缺少的周期数以及最大的几个缺口
+        """
+        frequency = self.frequency()
+        steps = frequency["steps"]
+        if steps is None:
+            return {"count": 0, "missing_periods": 0, "largest": []}
+        periods = np.rint(steps).astype(np.int64)
+        positions = np.flatnonzero(periods > 1)
+        largest = positions[np.argsort(-periods[positions], kind='stable')[:top]]
+        return {
+            "count": int(len(positions)),
+            "missing_periods": int((periods[positions] - 1).sum()),
+            "largest": [{
+                "after": self._timestamp(self._unique[i]).isoformat(),
+                "before": self._timestamp(self._unique[i + 1]).isoformat(),
+                "missing_periods": int(periods[i] - 1)
+            } for i in sorted(largest)]
+        }
+
+    def period_counts(self, max_periods=120):
+        """
+        多分辨率的每周期行数（年、季、月、周、日、小时），只保留周期数不超过max_periods的分辨率；
+        带时间的数据才输出小时分辨率
+        """
+        counts = {}
+        has_time = bool(np.any(self._unique % DAY_NS))
+        for resolution in self.RESOLUTIONS:
+            if resolution == 'hour' and not has_time:
+                continue
+            values, lengths = _grouped(self._codes(resolution, self._unique), self._repeats)
+            if len(values) > max_periods:
+                continue
+            counts[resolution] = {self._label(resolution, code): int(length) for code, length in zip(values, lengths)}
+        return counts
+
+    def summary(self, max_periods=120):
+        """
+        全部统计量
+
+        返回:
+        dict: min, max, range_days, distribution, duplicates, frequency, gaps, period_counts
+        """
+        if self.count == 0:
+            return {"min": None, "max": None, "range_days": None}
+        first, last = self._timestamp(self._unique[0]), self._timestamp(self._unique[-1])
+        frequency = self.frequency()
+        return {
+            "min": first.isoformat(),
+            "max": last.isoformat(),
+            "range_days": int((last - first).days),
+            "distribution": self.distribution(),
+            "duplicates": self.duplicates(),
+            "frequency": {key: frequency[key] for key in ("alias", "regularity", "median_interval")},
+            "gaps": self.gaps(),
+            "period_counts": self.period_counts(max_periods)
+        }
+
+
+def infer_frequency(values, default=None):
+    """
+    推断日期列的pandas频率别名，无法推断时返回default
+
+    参数:
+    values (pandas.Series): datetime64类型的列
+    default (str): 默认频率
+    """
+    alias = DatetimeAnalyzer(values).frequency()["alias"]
+    return alias if alias is not None else default
@@ -0,0 +1,214 @@
+#descriptionprompt.py
+import numpy as np
+
+from tokenbudget import estimate_tokens
+
+# 各类型列的表格：每个详细程度对应的列头，详细程度越高（数字越大）越紧凑
+_TYPE_ORDER = ['continuous', 'categorical', 'boolean', 'datetime', 'string']
+_TYPE_TITLES = {
+    'continuous': 'Numeric', 'categorical': 'Categorical', 'boolean': 'Boolean',
+    'datetime': 'Datetime', 'string': 'Text'
+}
+_HEADERS = {
+    'continuous': [
+        'name|n|miss%|mean|std|min|q1|median|q3|max|skew|kurt|outlier%|normal',
+        'name|n|miss%|mean|std|min|median|max|outlier%',
+        'name|miss%|mean|std|min|max'
+    ],
+    'categorical': [
+        'name|n|miss%|unique|top values (share%)|entropy_norm',
+        'name|n|miss%|unique|top values (share%)',
+        'name|miss%|unique|top value (share%)'
+    ],
+    'boolean': ['name|n|miss%|true%', 'name|n|miss%|true%', 'name|miss%|true%'],
+    'datetime': ['name|n|miss%|min|max|range_days|freq|gaps', 'name|n|miss%|min|max|freq', 'name|miss%|min|max'],
+    'string': [
+        'name|n|miss%|unique|avg_chars|avg_words|top words',
+        'name|n|miss%|unique|avg_words|top words',
+        'name|miss%|unique|avg_words'
+    ]
+}
+DETAIL_LEVELS = 3
+
+
+def _fmt(value):
+    """紧凑的数值格式：浮点数保留4位有效数字，缺失为'-'"""
+    if value is None:
+        return '-'
+    if isinstance(value, (bool, np.bool_)):
+        return 'Y' if value else 'N'
+    if isinstance(value, (int, np.integer)):
+        return str(int(value))
+    if isinstance(value, (float, np.floating)):
+        return '-' if np.isnan(value) else f"{float(value):.4g}"
+    return str(value).replace('|', '/').replace('\n', ' ')
+
+
+def _date(value):
+    return _fmt(value)[:10] if value else '-'
+
+
+def column_relevance(columns, dag_edges=None):
+    """
+    按与DAG边的关系计算列的相关度：作为目标变量每次计2分，作为源变量每次计1分
+
+    参数:
+    columns (list): 列名
+    dag_edges (list): DAG边，格式为 [源变量或源变量列表, 目标变量]
+
+    返回:
+    dict: 列名 -> 相关度（不在DAG中的列为0）
+    """
+    relevance = {column: 0 for column in columns}
+    for edge in dag_edges or []:
+        try:
+            sources, target = edge[0], edge[1]
+        except (TypeError, IndexError):
+            continue
+        for source in (sources if isinstance(sources, (list, tuple)) else [sources]):
+            if source in relevance:
+                relevance[source] += 1
+        if target in relevance:
+            relevance[target] += 2
+    return relevance
+
+
+def _top_items(items, k):
+    return ', '.join(f"{_fmt(name)} {_fmt(share)}" for name, share in list(items)[:k])
+
+
+def _row(name, desc, level):
+    """单列的表格行"""
+    col_type = desc['type']
+    miss = desc.get('missing_percentage')
+    n = desc.get('count')
+    if col_type == 'continuous':
+        outliers = desc.get('outliers', {}).get('percentage')
+        normal = desc.get('normality_test', {}).get('is_normal')
+        cells = {
+            0: [n, miss, desc.get('mean'), desc.get('std'), desc.get('min'), desc.get('q1'), desc.get('median'),
+                desc.get('q3'), desc.get('max'), desc.get('skewness'), desc.get('kurtosis'), outliers, normal],
+            1: [n, miss, desc.get('mean'), desc.get('std'), desc.get('min'), desc.get('median'), desc.get('max'),
+                outliers],
+            2: [miss, desc.get('mean'), desc.get('std'), desc.get('min'), desc.get('max')]
+        }[level]
+    elif col_type == 'categorical':
+        categories = desc.get('categories', {})
+        categories = categories['top_10'] if 'top_10' in categories else categories
+        top = [(value, entry.get('percentage')) for value, entry in categories.items()]
+        entropy = desc.get('entropy', {}).get('normalized')
+        cells = {
+            0: [n, miss, desc.get('unique_values'), _top_items(top, 5), entropy],
+            1: [n, miss, desc.get('unique_values'), _top_items(top, 3)],
+            2: [miss, desc.get('unique_values'), _top_items(top, 1)]
+        }[level]
+    elif col_type == 'boolean':
+        true_pct = desc.get('true_percentage')
+        cells = [miss, true_pct] if level == 2 else [n, miss, true_pct]
+    elif col_type == 'datetime':
+        freq = desc.get('frequency', {}).get('alias') or 'irregular'
+        gaps = desc.get('gaps', {}).get('missing_periods')
+        cells = {
+            0: [n, miss, _date(desc.get('min')), _date(desc.get('max')), desc.get('range_days'), freq, gaps],
+            1: [n, miss, _date(desc.get('min')), _date(desc.get('max')), freq],
+            2: [miss, _date(desc.get('min')), _date(desc.get('max'))]
+        }[level]
+    else:
+        length = desc.get('text_length', {})
+        words = desc.get('word_frequency', {}).get('top_words', {})
+        unique = desc.get('unique_values')
+        cells = {
+            0: [n, miss, unique, length.get('avg_chars'), length.get('avg_words'), ', '.join(list(words)[:5])],
+            1: [n, miss, unique, length.get('avg_words'), ', '.join(list(words)[:3])],
+            2: [miss, unique, length.get('avg_words')]
+        }[level]
+    return '|'.join([name] + [_fmt(cell) for cell in cells])
+
+
+class DescriptionPrompt:
+    def __init__(self, descriptions, dataset_info, errors=None, dag_edges=None):
+        """
+        DataDescription结果的紧凑LLM提示格式：每种类型一张以'|'分隔的表，
+        DAG中出现的列标记'*'并排在前面，超过token预算时逐级精简统计量，最后省略相关度最低的列。
+
+        参数:
+        descriptions (dict): 列名 -> 列描述（DataDescription.descriptions）
+        dataset_info (dict): 数据集概况（DataDescription._dataset_info()）
+        errors (list): 分析过程中的错误
+        dag_edges (list): DAG边，用于计算列的相关度
+        """
+        self.descriptions = descriptions
+        self.dataset_info = dataset_info
+        self.errors = errors or []
+        order = {column: i for i, column in enumerate(descriptions)}
+        relevance = column_relevance(list(descriptions), dag_edges)
+        self.relevance = relevance
+        # 相关度从高到低，相同时保持原列顺序
+        self.ranked = sorted(descriptions, key=lambda column: (-relevance[column], order[column]))
+
+    def _header_lines(self):
+        info = self.dataset_info
+        lines = [f"Dataset: {info.get('rows')} rows x {info.get('columns')} columns, "
+                 f"missing {_fmt(info.get('missing_percentage'))}% of cells"]
+        sampling = info.get('sampling')
+        if sampling:
+            lines.append(f"Stats from a stratified sample of {sampling['sample_size']} rows "
+                         f"(counts and missing values exact; see margins in JSON)")
+        if any(self.relevance.values()):
+            lines.append("* = variable in the DAG; columns ordered by relevance to the DAG")
+        return lines
+
+    def _column_lines(self, columns, level):
+        """按类型分组的表格，返回 [(列名或None, 行文本)]，表头行的列名为None"""
+        by_type = {}
+        missing_only = []
+        for column in columns:
+            desc = self.descriptions[column]
+            if desc.get('type') in _HEADERS:
+                by_type.setdefault(desc['type'], []).append(column)
+            else:
+                missing_only.append(column)
+        lines = []
+        for col_type in _TYPE_ORDER:
+            if col_type not in by_type:
+                continue
+            lines.append((None, f"{_TYPE_TITLES[col_type]} ({_HEADERS[col_type][level]}):"))
+            for column in by_type[col_type]:
+                name = f"{column}*" if self.relevance[column] else str(column)
+                lines.append((column, _row(name, self.descriptions[column], level)))
+        if missing_only:
+            lines.append((None, "All missing: " + ', '.join(str(column) for column in missing_only)))
+        return lines
+
+    def _error_lines(self):
+        return ["Errors:"] + [f"{i}. {e}" for i, e in enumerate(self.errors, 1)] if self.errors else []
+
+    def to_prompt(self, token_budget=None):
+        """
+        生成提示文本。超过token预算时依次使用更紧凑的统计量组合，
+        仍超出时按相关度从低到高省略整列（DAG中的列最后省略）。
+        """
+        if not self.descriptions:
+            return "No column descriptions available."
+        fixed = self._header_lines()
+        errors = self._error_lines()
+        fixed_tokens = estimate_tokens('\n'.join(fixed + errors))
+
+        for level in range(DETAIL_LEVELS):
+            lines = self._column_lines(self.ranked, level)
+            text = '\n'.join(fixed + [line for _, line in lines] + errors)
+            if token_budget is None or estimate_tokens(text) <= token_budget:
+                return text
+
+        # 仍超出预算：按相关度从低到高省略列，每行的token数单独估计，避免反复整体计算
+        line_tokens = {column: estimate_tokens(line) + 1 for column, line in lines if column is not None}
+        total = fixed_tokens + sum(estimate_tokens(line) + 1 for _, line in lines)
+        keep = list(self.ranked)
+        omitted = 0
+        while keep and total > token_budget:
+            total -= line_tokens.get(keep.pop(), 0)
+            omitted += 1
+        lines = [line for _, line in self._column_lines(keep, DETAIL_LEVELS - 1)]
+        if omitted:
+            lines.append(f"({omitted} less relevant columns omitted)")
+        return '\n'.join(fixed + lines + errors)
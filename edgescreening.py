@@ -0,0 +1,212 @@
+#edgescreening.py
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from dagrelation import RelationCache
+from fingerprint import column_fingerprint
+
+
+class EdgeScreener:
+    def __init__(self, threshold=0.1, sample_size=20000, n_bins=10, max_categories=50,
+                 seed=42, action='summary', column_cache_size=64, pair_cache_size=4096):
+        """
+        DAG边的效应量预筛选：在按目标变量分层的样本上计算廉价的关联强度，
+        弱关联的边跳过完整分析（或只保留轻量摘要）。
+
+        Parameters:
+        threshold (float): 关联强度阈值（0-1），两种度量均低于该值的边视为弱关联
+        sample_size (int): 每个目标变量的分层样本大小
+        n_bins (int): 数值变量计算互信息时的分位数分箱数
+        max_categories (int): 分类变量保留的最大类别数（其余合并为一类）
+        seed (int): 抽样的随机种子
+        action (str): 'summary'为弱关联的边保留轻量摘要，'skip'完全跳过
+        column_cache_size (int): 最多缓存的列编码和目标变量样本数（每列占用与行数成正比的内存）
+        pair_cache_size (int): 最多缓存的变量对关联强度数
+        """
+        if action not in ('summary', 'skip'):
+            raise ValueError("action must be 'summary' or 'skip'")
+        self.threshold = threshold
+        self.sample_size = sample_size
+        self.n_bins = n_bins
+        self.max_categories = max_categories
+        self.seed = seed
+        self.action = action
+        # 跨边、跨分析器共享的缓存（LRU），按 (列名, 内容指纹) 寻址；筛选器保存在会话中，需要限制大小
+        self._column_cache = RelationCache(column_cache_size)
+        self._sample_cache = RelationCache(column_cache_size)
+        self._pair_cache = RelationCache(pair_cache_size)
+
+    def config_key(self):
+        """影响筛选结果的参数，用于DAGRelations的缓存键"""
+        return (self.threshold, self.sample_size, self.n_bins, self.max_categories, self.seed, self.action)
+
+    def clear(self):
+        self._column_cache.clear()
+        self._sample_cache.clear()
+        self._pair_cache.clear()
+
+    @staticmethod
+    def _is_numeric(series):
+        # 与DAGRelations的类型判断保持一致：布尔列视为分类变量
+        return pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+
+    def _column(self, data, col, fingerprint):
+        """列的离散编码（缺失为-1）及数值（分类列为None）"""
+        key = (col, fingerprint)
+        entry = self._column_cache.get(key)
+        if entry is None:
+            series = data[col]
+            if self._is_numeric(series):
+                values = series.to_numpy(dtype=float, na_value=np.nan)
+                ranks = series.rank(method='first').to_numpy()
+                valid = ~np.isnan(ranks)
+                n_valid = max(int(valid.sum()), 1)
+                codes = np.full(len(series), -1, dtype=np.int64)
+                codes[valid] = np.minimum(((ranks[valid] - 1) * self.n_bins / n_valid).astype(np.int64),
+                                          self.n_bins - 1)
+            else:
+                values = None
+                codes, uniques = pd.factorize(series)
+                codes = codes.astype(np.int64)
+                if len(uniques) > self.max_categories:
+                    # 只保留最常见的类别，其余合并
+                    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+                    keep = np.argsort(-counts, kind='stable')[:self.max_categories - 1]
+                    remap = np.full(len(uniques), self.max_categories - 1, dtype=np.int64)
+                    remap[keep] = np.arange(len(keep))
+                    codes = np.where(codes >= 0, remap[np.maximum(codes, 0)], -1)
+            entry = (codes, values)
+            self._column_cache.put(key, entry)
+        return entry
+
+    def _sample(self, tgt, tgt_codes, fingerprint):
+        """按目标变量（数值变量按分位数分箱）分层抽样，返回行位置"""
+        key = (tgt, fingerprint)
+        positions = self._sample_cache.get(key)
+        if positions is None:
+            valid = np.flatnonzero(tgt_codes >= 0)
+            if len(valid) <= self.sample_size:
+                positions = valid
+            else:
+                seed = int.from_bytes(hashlib.blake2b(repr(key).encode(), digest_size=4).digest(), 'little')
+                rng = np.random.default_rng([self.seed, seed])
+                shuffled = rng.permutation(valid)
+                strata = tgt_codes[shuffled]
+                counts = np.bincount(strata)
+                # 按比例分配，每层至少保留少量样本以免稀有类别丢失
+                quota = np.maximum(np.floor(counts * self.sample_size / len(valid)), np.minimum(counts, 5))
+                order = np.argsort(strata, kind='stable')
+                starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+                rank = np.empty(len(shuffled), dtype=np.int64)
+                rank[order] = np.arange(len(shuffled)) - np.repeat(starts, counts)
+                positions = np.sort(shuffled[rank < quota[strata]])
+            self._sample_cache.put(key, positions)
+        return positions
+
+    @staticmethod
+    def _information_coefficient(a, b):
+        """离散编码的互信息（Miller-Madow偏差校正），换算为信息相关系数 sqrt(1-exp(-2MI))"""
+        n = len(a)
+        if n == 0:
+            return 0.0
+        ka, kb = int(a.max()) + 1, int(b.max()) + 1
+        table = np.bincount(a * kb + b, minlength=ka * kb).reshape(ka, kb).astype(float)
+        table = table[table.sum(axis=1) > 0][:, table.sum(axis=0) > 0]
+        if table.shape[0] < 2 or table.shape[1] < 2:
+            return 0.0
+        p = table / n
+        expected = p.sum(axis=1, keepdims=True) * p.sum(axis=0, keepdims=True)
+        nonzero = p > 0
+        mi = float(np.sum(p[nonzero] * np.log(p[nonzero] / expected[nonzero])))
+        mi = max(mi - (table.shape[0] - 1) * (table.shape[1] - 1) / (2 * n), 0.0)
+        return float(np.sqrt(1 - np.exp(-2 * mi)))
+
+    @staticmethod
+    def _correlation(x, y):
+        if np.std(x) == 0 or np.std(y) == 0:
+            return 0.0
+        return float(abs(np.corrcoef(x, y)[0, 1]))
+
+    @staticmethod
+    def _eta(groups, values):
+        """相关比eta（组间平方和/总平方和的平方根）"""
+        total = np.sum((values - values.mean()) ** 2)
+        if total == 0:
+            return 0.0
+        counts = np.bincount(groups)
+        sums = np.bincount(groups, weights=values)
+        present = counts > 0
+        between = np.sum(sums[present] ** 2 / counts[present]) - values.sum() ** 2 / len(values)
+        return float(np.sqrt(max(between, 0.0) / total))
+
+    @staticmethod
+    def _cramers_v(a, b):
+        ka, kb = int(a.max()) + 1, int(b.max()) + 1
+        table = np.bincount(a * kb + b, minlength=ka * kb).reshape(ka, kb).astype(float)
+        table = table[table.sum(axis=1) > 0][:, table.sum(axis=0) > 0]
+        if min(table.shape) < 2:
+            return 0.0
+        expected = table.sum(axis=1, keepdims=True) * table.sum(axis=0, keepdims=True) / table.sum()
+        chi2 = np.sum((table - expected) ** 2 / expected)
+        return float(np.sqrt(chi2 / (table.sum() * (min(table.shape) - 1))))
+
+    def _pair(self, data, src, tgt, fingerprint):
+        """单个源变量与目标变量在分层样本上的关联强度"""
+        key = ((src, fingerprint(src)), (tgt, fingerprint(tgt)))
+        result = self._pair_cache.get(key)
+        if result is not None:
+            return result
+
+        src_codes, src_values = self._column(data, src, key[0][1])
+        tgt_codes, tgt_values = self._column(data, tgt, key[1][1])
+        positions = self._sample(tgt, tgt_codes, key[1][1])
+        positions = positions[src_codes[positions] >= 0]
+        a, b = src_codes[positions], tgt_codes[positions]
+
+        if len(positions) < 3:
+            effect, measure = 0.0, 'none'
+        elif src_values is not None and tgt_values is not None:
+            effect, measure = self._correlation(src_values[positions], tgt_values[positions]), 'correlation'
+        elif src_values is None and tgt_values is not None:
+            effect, measure = self._eta(a, tgt_values[positions]), 'eta'
+        elif src_values is not None and tgt_values is None:
+            effect, measure = self._eta(b, src_values[positions]), 'eta'
+        else:
+            effect, measure = self._cramers_v(a, b), 'cramers_v'
+        information = self._information_coefficient(a, b) if len(positions) >= 3 else 0.0
+
+        result = {
+            'measure': measure,
+            'effect_size': effect,
+            'information_coefficient': information,
+            'sample_size': int(len(positions))
+        }
+        self._pair_cache.put(key, result)
+        return result
+
+    def screen(self, data, src_cols, tgt, fingerprint=None):
+        """
+        计算边的关联强度
+
+        Parameters:
+        data (pandas.DataFrame): 数据
+        src_cols (list): 源变量列表
+        tgt (str): 目标变量
+        fingerprint (callable): 列名 -> 内容指纹，默认对列内容计算哈希
+
+        返回:
+        dict: 各源变量的关联强度、边的最大关联强度和是否为弱关联
+        """
+        if fingerprint is None:
+            fingerprint = lambda col: column_fingerprint(data[col])
+        sources = {src: self._pair(data, src, tgt, fingerprint) for src in src_cols}
+        # 多对一关系中只有所有源变量都是弱关联时才视为弱关联
+        strength = max(max(r['effect_size'], r['information_coefficient']) for r in sources.values())
+        return {
+            'strength': strength,
+            'threshold': self.threshold,
+            'weak': strength < self.threshold,
+            'sources': sources
+        }
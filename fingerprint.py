@@ -0,0 +1,51 @@
+#fingerprint.py
+import hashlib
+import pandas as pd
+
+
+def column_fingerprint(series):
+    """
+    计算单列数据的内容指纹（与列名和索引无关）
+
+    参数:
+    series (pandas.Series): 需要计算指纹的列
+
+    返回:
+    str: 十六进制的哈希字符串，内容或dtype不变时保持不变
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(series.dtype).encode())
+    digest.update(str(len(series)).encode())
+    try:
+        hashed = pd.util.hash_pandas_object(series, index=False)
+    except TypeError:
+        # 不可哈希的元素（如list、dict）退化为字符串表示
+        hashed = pd.util.hash_pandas_object(series.astype(str), index=False)
+    digest.update(hashed.to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def combine_fingerprints(parts):
+    """将多个指纹/参数组合成一个稳定的哈希"""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(repr(part).encode())
+        digest.update(b'\x1f')
+    return digest.hexdigest()
+
+
+def frame_fingerprint(df, columns=None):
+    """
+    计算DataFrame（或其中若干列）的内容指纹
+
+    参数:
+    df (pandas.DataFrame): 数据
+    columns (list): 参与计算的列，默认全部列
+
+    返回:
+    str: 组合后的指纹
+    """
+    columns = list(df.columns) if columns is None else list(columns)
+    return combine_fingerprints(
+        [(str(col), column_fingerprint(df[col])) for col in columns]
+    )
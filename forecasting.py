@@ -0,0 +1,463 @@
+#forecasting.py
+import os
+import signal
+import threading
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeout
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from datetimeanalysis import infer_frequency
+from modelstore import deserialize_model, model_key, serialize_model
+
+# MCMC拟合时cmdstan默认并行运行4条链
+MCMC_CHAINS = 4
+
+
+class GroupTimeout(Exception):
+    """单个分组的拟合超过时间限制"""
+
+
+def _alarm_handler(signum, frame):
+    raise GroupTimeout()
+
+
+def _can_use_alarm():
+    # SIGALRM只在Unix上可用，且只能在主线程中设置（Streamlit的脚本线程不是主线程，工作进程中是）
+    return hasattr(signal, 'SIGALRM') and threading.current_thread() is threading.main_thread()
+
+
+@contextmanager
+def time_limit(timeout):
+    """超过timeout秒时抛出GroupTimeout（依赖SIGALRM，不可用时不限制）"""
+    use_alarm = timeout is not None and _can_use_alarm()
+    if use_alarm:
+        previous = signal.signal(signal.SIGALRM, _alarm_handler)
+        signal.setitimer(signal.ITIMER_REAL, max(timeout, 1e-3))
+    try:
+        yield
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+
+
+def fit_prophet(history, interval_width=0.6, use_advanced_model=False, covariate_columns=None, init=None):
+    """
+    拟合Prophet模型
+
+    参数:
+    history (pandas.DataFrame): 训练数据，包含ds、y和协变量列
+    interval_width (float): 预测区间宽度
+    use_advanced_model (bool): 使用MCMC采样
+    covariate_columns (list): 协变量列
+    init (dict): 热启动的初始参数（见warm_start_params），None表示从默认值开始优化
+
+    返回:
+    prophet.Prophet: 拟合后的模型
+    """
+    from prophet import Prophet
+
+    covariate_columns = covariate_columns or []
+    if use_advanced_model:
+        model = Prophet(interval_width=interval_width, uncertainty_samples=1000, mcmc_samples=300)
+    else:
+        model = Prophet(interval_width=interval_width)
+    for col in covariate_columns:
+        model.add_regressor(col)
+    if init is not None:
+        model.fit(history[['ds', 'y'] + covariate_columns], init=init)
+    else:
+        model.fit(history[['ds', 'y'] + covariate_columns])
+    return model
+
+
+def warm_start_params(model):
+    """已拟合模型的参数，作为下一次拟合（如相邻截断点的回测）的初始值"""
+    params = {}
+    for name in ['k', 'm', 'sigma_obs']:
+        params[name] = model.params[name][0][0]
+    for name in ['delta', 'beta']:
+        params[name] = model.params[name][0]
+    return params
+
+
+def fit_group(history, future, interval_width=0.6, use_advanced_model=False, covariate_columns=None, timeout=None,
+              model=None, return_model=False):
+    """
+    拟合单个分组的Prophet模型并预测（工作进程中执行，参数和返回值都可序列化）
+
+    参数:
+    history (pandas.DataFrame): 训练数据，包含ds、y和协变量列
+    future (pandas.DataFrame): 预测日期ds和对应的协变量值
+    interval_width (float): 预测区间宽度
+    use_advanced_model (bool): 使用MCMC采样（更高精度但更慢）
+    covariate_columns (list): 协变量列
+    timeout (float): 超时秒数，None表示不限制
+    model (prophet.Prophet): 已在同样的训练数据上拟合的模型（来自ModelStore），有时跳过拟合直接预测
+    return_model (bool): 同时返回模型
+
+    返回:
+    pandas.DataFrame: ds, yhat, yhat_lower, yhat_upper；return_model为True时为 (预测结果, 模型)
+    """
+    with time_limit(timeout):
+        if model is None:
+            model = fit_prophet(history, interval_width, use_advanced_model, covariate_columns)
+        else:
+            # 预测区间宽度只在预测时使用，已拟合的模型可以直接改用新的宽度
+            model.interval_width = interval_width
+        forecast = model.predict(future)[['ds', 'yhat', 'yhat_lower', 'yhat_upper']]
+    return (forecast, model) if return_model else forecast
+
+
+def _fit_in_worker(group, history, future, options, cached=None, store_model=False):
+    """
+    工作进程入口：异常在进程内捕获，返回 (分组, 预测结果或None, 错误信息或None, 耗时, 新拟合的序列化模型或None)。
+    cached为ModelStore中的序列化模型，有时直接预测；store_model为True时返回新拟合的模型以便保存。
+    """
+    warnings.filterwarnings("ignore")
+    start = time.perf_counter()
+    model = None
+    if cached is not None:
+        try:
+            model = deserialize_model(cached)
+        except Exception as e:
+            print(f"Refitting group {group}: cached model could not be loaded ({str(e)})")
+    try:
+        forecast, fitted = fit_group(history, future, model=model, return_model=True, **options)
+        entry = serialize_model(fitted) if store_model and model is None else None
+        return group, forecast, None, time.perf_counter() - start, entry
+    except GroupTimeout:
+        return group, None, f"timed out after {options.get('timeout')}s", time.perf_counter() - start, None
+    except Exception as e:
+        return group, None, str(e), time.perf_counter() - start, None
+
+
+def parse_dates(values, date_format=None):
+    """按指定格式解析日期列，格式不匹配时由pandas推断格式"""
+    try:
+        return pd.to_datetime(values.astype(str), format=date_format)
+    except (ValueError, TypeError):
+        return pd.to_datetime(values.astype(str))
+
+
+def forecast_frequency(values, date_format=None):
+    """
+    预测频率：从日期列推断（如周数据、工作日数据、月末日期），无法推断时按日期格式判断（含日为'D'，否则为'MS'）
+
+    参数:
+    values (pandas.Series): 原始日期列
+    date_format (str): 日期格式
+    """
+    day_formats = ['%d', '%Y%m%d', '%Y-%m-%d', '%d-%m-%Y', '%m/%d/%Y']
+    format_freq = 'D' if date_format and any(x in date_format for x in day_formats) else 'MS'
+    try:
+        parsed_dates = pd.to_datetime(values.astype(str), format=date_format, errors='coerce')
+        if parsed_dates.isna().all():
+            parsed_dates = pd.to_datetime(values.astype(str), errors='coerce')
+        return infer_frequency(parsed_dates, default=format_freq)
+    except Exception:
+        return format_freq
+
+
+def group_keys(data, grouping_columns=None):
+    """分组键：各分组列的值用'_'连接，没有分组列时所有行为同一分组'all_data'"""
+    if not grouping_columns:
+        return pd.Series('all_data', index=data.index)
+    keys = data[grouping_columns[0]].astype(str)
+    for col in grouping_columns[1:]:
+        keys = keys + '_' + data[col].astype(str)
+    return keys
+
+
+def prepare_panel(data, dates, groups, target_column, covariate_columns=None, grouping_columns=None):
+    """
+    构造完整的(date, group)面板并填补缺失值：
+    日期和分组的笛卡尔积用MultiIndex一次生成，原始行按位置放入面板；目标列缺失填0，
+    协变量用一次groupby得到的分组均值填补（分组全部缺失时用全局均值，仍缺失时用0），
+    分组列取该组已有的值（组成分组键的列在组内不变，等同于组内先向前再向后填充）。
+
+    参数:
+    data (pandas.DataFrame): 包含date和group列的原始数据
+    dates (pandas.DatetimeIndex): 面板的日期
+    groups (array-like): 面板的分组（不重复）
+    target_column (str): 目标列
+    covariate_columns (list): 协变量列
+    grouping_columns (list): 组成分组键的列
+
+    返回:
+    tuple: (panel, covariate_means)，covariate_means为 (分组, 协变量) -> 填补用的均值
+    """
+    covariate_columns = covariate_columns or []
+    grouping_columns = grouping_columns or []
+    grid = pd.MultiIndex.from_product([dates, groups], names=['date', 'group'])
+    positions = grid.get_indexer(pd.MultiIndex.from_arrays([data['date'], data['group']]))
+    on_grid = positions >= 0
+    if np.bincount(positions[on_grid], minlength=1).max(initial=0) <= 1:
+        # 每个(date, group)最多一行：按位置放入面板，不在面板日期上的行被丢弃（与左连接相同）
+        values = data.loc[on_grid, [col for col in data.columns if col not in ('date', 'group')]]
+        rows = np.full(len(grid), -1, dtype=np.int64)
+        rows[positions[on_grid]] = np.arange(len(values))
+        # 面板中没有原始行的位置为-1，reindex后为缺失值
+        panel = values.reset_index(drop=True).reindex(rows)
+        panel.index = pd.RangeIndex(len(grid))
+        panel.insert(0, 'date', grid.get_level_values('date'))
+        panel.insert(1, 'group', grid.get_level_values('group'))
+        codes = grid.codes[1]
+    else:
+        # 同一(date, group)有多行时保留所有行（左连接）
+        panel = grid.to_frame(index=False).merge(data, on=['date', 'group'], how='left')
+        codes = pd.factorize(panel['group'])[0]
+
+    panel[target_column] = panel[target_column].fillna(0)
+
+    covariate_means = {}
+    if covariate_columns:
+        global_means = panel[covariate_columns].mean().fillna(0)
+        means = panel[covariate_columns].groupby(codes).mean().fillna(global_means)
+        panel[covariate_columns] = panel[covariate_columns].fillna(
+            pd.DataFrame(means.to_numpy()[codes], index=panel.index, columns=covariate_columns))
+        # 面板中每个日期都包含全部分组，分组编号与groups的顺序一致
+        means.index = np.asarray(groups, dtype=object)[means.index]
+        covariate_means = means.stack().to_dict()
+
+    if grouping_columns:
+        # 组成分组键的列在组内不变：取每组第一行的值广播到该组的所有日期
+        first = data.drop_duplicates('group').set_index('group')[grouping_columns].reindex(groups)
+        for col in grouping_columns:
+            panel[col] = first[col].to_numpy()[codes]
+    return panel, covariate_means
+
+
+def build_forecast_tasks(panel, groups, start_date, training_end_date, end_date, freq, target_column,
+                         covariate_columns=None, covariate_means=None):
+    """
+    为每个分组准备训练数据和预测日期（含协变量），一次groupby切分面板数据，不再逐组做全表筛选
+
+    参数:
+    panel (pandas.DataFrame): 完整的(date, group)面板，包含目标列和协变量
+    groups (list): 分组
+    start_date, training_end_date, end_date (str): 训练开始、训练结束和预测结束日期
+    freq (str): 预测频率
+    target_column (str): 目标列
+    covariate_columns (list): 协变量列
+    covariate_means (dict): (分组, 协变量) -> 均值，用于超出已有数据的预测日期
+
+    返回:
+    tuple: (tasks, errors)，tasks为 分组 -> (history, future)，errors为 分组 -> 错误信息
+    """
+    covariate_columns = covariate_columns or []
+    covariate_means = covariate_means or {}
+    tasks, errors = {}, {}
+    by_group = dict(tuple(panel.groupby('group', sort=False)))
+    end = pd.to_datetime(end_date)
+    for group in groups:
+        if group not in by_group:
+            errors[group] = "no rows for this group"
+            continue
+        try:
+            group_panel = by_group[group]
+            in_training = (group_panel['date'] >= start_date) & (group_panel['date'] <= training_end_date)
+            history = group_panel.loc[in_training, ['date', target_column] + covariate_columns]
+            history = history.rename(columns={'date': 'ds', target_column: 'y'})
+            if history.empty:
+                raise ValueError("no training data between the training start and end dates")
+            # 从训练数据开始到预测结束日期的完整日期范围
+            future = pd.DataFrame({'ds': pd.date_range(start=history['ds'].min(), end=end, freq=freq)})
+            if covariate_columns:
+                known = group_panel[['date'] + covariate_columns].rename(columns={'date': 'ds'})
+                future = future.merge(known, on='ds', how='left')
+                # 超出已有数据的日期使用该组的均值
+                for col in covariate_columns:
+                    future[col] = future[col].fillna(covariate_means.get((group, col), 0))
+            tasks[group] = (history.reset_index(drop=True), future)
+        except Exception as e:
+            errors[group] = str(e)
+    return tasks, errors
+
+
+# 截止时间前未完成的分组的错误信息
+TIME_BUDGET_EXHAUSTED = "time budget exhausted"
+
+
+class ForecastEngine:
+    def __init__(self, interval_width=0.6, use_advanced_model=False, covariate_columns=None,
+                 n_jobs=None, timeout=None, store=None):
+        """
+        分组Prophet预测引擎：把各分组的拟合分发到进程池，单个分组失败或超时不影响其他分组。
+        提供store时，训练数据和超参数都未变化的分组直接复用已保存的模型，只重新预测（可改变预测期和区间宽度）。
+
+        参数:
+        interval_width (float): 预测区间宽度
+        use_advanced_model (bool): 使用MCMC采样
+        covariate_columns (list): 协变量列
+        n_jobs (int): 工作进程数，None表示按CPU核数（MCMC时除以链数，避免过度占用），1表示在当前进程中串行
+        timeout (float): 单个分组的超时秒数（依赖SIGALRM，仅Unix），None表示不限制
+        store (ModelStore): 已拟合模型的持久化存储，None表示每次都重新拟合
+        """
+        self.interval_width = interval_width
+        self.use_advanced_model = use_advanced_model
+        self.covariate_columns = covariate_columns or []
+        if n_jobs is None:
+            n_jobs = os.cpu_count() or 1
+            if use_advanced_model:
+                n_jobs = max(1, n_jobs // MCMC_CHAINS)
+        self.n_jobs = n_jobs
+        self.timeout = timeout
+        self.store = store
+        # 分组 -> 拟合耗时（秒）；复用已保存模型的分组
+        self.timings = {}
+        self.reused = set()
+
+    def _options(self):
+        return {
+            "interval_width": self.interval_width,
+            "use_advanced_model": self.use_advanced_model,
+            "covariate_columns": self.covariate_columns,
+            "timeout": self.timeout
+        }
+
+    def run(self, tasks, progress_callback=None, callback=None, deadline=None):
+        """
+        拟合所有分组。提供deadline时单个分组的超时不超过剩余时间，截止时仍未完成的分组记为TIME_BUDGET_EXHAUSTED
+
+        参数:
+        tasks (dict): 分组 -> (history, future)，见build_forecast_tasks
+        progress_callback (callable): 每完成一个分组调用 progress_callback(已完成数, 总数, 分组)
+        callback (callable): 每个分组预测成功时调用 callback(分组, 预测结果)；提供时预测结果不保留在返回的forecasts中，
+            用于逐组写出结果，避免同时在内存中保留所有分组
+        deadline (float): 截止时间（time.time()），None表示不限制
+
+        返回:
+        tuple: (forecasts, errors)，forecasts为 分组 -> 预测结果，errors为 分组 -> 错误信息
+        """
+        forecasts, errors = {}, {}
+        total = len(tasks)
+        options = self._options()
+
+        def remaining():
+            return deadline - time.time() if deadline is not None else None
+
+        def limited(options):
+            """单个分组的超时不超过剩余时间（至少1秒，SIGALRM以整秒计时）"""
+            if deadline is None:
+                return options
+            limit = max(1.0, remaining())
+            return dict(options, timeout=min(options['timeout'], limit) if options['timeout'] else limit)
+
+        keys, cached = {}, {}
+        if self.store is not None:
+            for group, (history, _) in tasks.items():
+                keys[group] = model_key('prophet', history, use_advanced_model=self.use_advanced_model)
+                entry = self.store.get(keys[group])
+                if entry is not None:
+                    cached[group] = entry
+        store_model = self.store is not None
+        finished = set()
+
+        def record(result, done):
+            group, forecast, error, seconds, entry = result
+            finished.add(group)
+            self.timings[group] = seconds
+            if error is None:
+                if callback is not None:
+                    callback(group, forecast)
+                else:
+                    forecasts[group] = forecast
+                if group in cached:
+                    self.reused.add(group)
+            else:
+                errors[group] = error
+            if entry is not None:
+                self.store.put(keys[group], entry)
+            if progress_callback is not None:
+                progress_callback(done, total, group)
+
+        if self.n_jobs <= 1 or total <= 1:
+            for done, (group, (history, future)) in enumerate(tasks.items(), 1):
+                if deadline is not None and remaining() <= 0:
+                    result = (group, None, TIME_BUDGET_EXHAUSTED, 0.0, None)
+                else:
+                    result = _fit_in_worker(group, history, future, limited(options), cached.get(group), store_model)
+                record(result, done)
+            return forecasts, errors
+
+        workers = min(self.n_jobs, total)
+        print(f"Fitting {total} groups with {workers} worker processes...")
+        pool = ProcessPoolExecutor(max_workers=workers)
+        futures = {}
+        try:
+            # 需要拟合的分组先提交，其中数据量大（通常耗时更长）的在前
+            order = sorted(tasks, key=lambda group: (group in cached, -len(tasks[group][0])))
+            # 所有分组在开始时提交，各分组的超时不超过此时的剩余时间，关闭进程池时不会等待超过截止时间
+            options = limited(options)
+            futures = {pool.submit(_fit_in_worker, group, *tasks[group], options, cached.get(group), store_model): group
+                       for group in order}
+            done = 0
+            try:
+                for future in as_completed(futures, timeout=remaining()):
+                    done += 1
+                    try:
+                        result = future.result()
+                    except BrokenProcessPool as e:
+                        # 工作进程崩溃（如内存不足）时，该进程上的分组记为失败
+                        result = (futures[future], None, f"worker process failed: {str(e)}", 0.0, None)
+                    record(result, done)
+            except FuturesTimeout:
+                for future, group in futures.items():
+                    if group not in finished:
+                        done += 1
+                        record((group, None, TIME_BUDGET_EXHAUSTED, 0.0, None), done)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+        return forecasts, errors
+
+
+FORECAST_COLUMNS = ['forecast', 'forecast_lower', 'forecast_upper']
+
+
+def combine_forecasts(forecasts):
+    """
+    把各分组的预测结果按列拼接为一张表
+
+    参数:
+    forecasts (dict): 分组 -> 包含ds, yhat, yhat_lower, yhat_upper的预测结果
+
+    返回:
+    pandas.DataFrame: group, date, forecast, forecast_lower, forecast_upper
+    """
+    frames = list(forecasts.values())
+    if not frames:
+        return pd.DataFrame(columns=['group', 'date'] + FORECAST_COLUMNS)
+    groups = np.empty(len(frames), dtype=object)
+    groups[:] = list(forecasts)
+    # 先整体拼接再选列，避免对每个分组的小表分别做列选择
+    combined = pd.concat(frames, ignore_index=True)[['ds', 'yhat', 'yhat_lower', 'yhat_upper']]
+    combined.columns = ['date'] + FORECAST_COLUMNS
+    combined.insert(0, 'group', np.repeat(groups, [len(forecast) for forecast in frames]))
+    return combined
+
+
+def write_forecasts(panel, forecasts):
+    """
+    按(group, date)把预测值写回面板数据：一次索引对齐代替逐行的全表筛选，耗时与行数成线性关系。
+    没有对应预测的行为NaN。
+
+    参数:
+    panel (pandas.DataFrame): 包含group和date列的面板数据（原地添加forecast、forecast_lower、forecast_upper列）
+    forecasts (dict): 分组 -> 预测结果
+
+    返回:
+    pandas.DataFrame: panel
+    """
+    combined = combine_forecasts(forecasts).drop_duplicates(['group', 'date'], keep='last')
+    keys = pd.MultiIndex.from_arrays([panel['group'], panel['date']])
+    aligned = combined.set_index(['group', 'date'])[FORECAST_COLUMNS].reindex(keys)
+    for col in FORECAST_COLUMNS:
+        panel[col] = aligned[col].to_numpy()
+    return panel
@@ -0,0 +1,353 @@
+#forecastjob.py
+# 无界面的销售预测：与预测页面相同的处理流程（日期解析、完整面板、分组拟合、层级调和、准确度），
+# 各分组的结果在完成时逐组写入Parquet/CSV文件，不在内存中同时保留所有分组的预测。
+# Python中调用run_forecast_job，或在命令行中运行（如定时任务）:
+# python forecastjob.py sales.xlsx forecast.parquet --date-column month --date-format %Y%m --target sales \
+#     --group region --group product --start 2022-01-01 --training-end 2024-12-31 --end 2026-12-31
+import argparse
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Optional
+
+import pandas as pd
+
+from backtesting import Backtester, forecast_selected
+from baselines import BASELINE_MODELS, forecast_baseline
+from forecasting import (FORECAST_COLUMNS, ForecastEngine, build_forecast_tasks, forecast_frequency, group_keys,
+                         parse_dates, prepare_panel, write_forecasts)
+from forecastmetrics import OVERALL, forecast_metrics
+from hierarchy import RECONCILIATION_METHODS, Hierarchy, reconcile_forecasts
+from ingestion import IngestionCache, load_table
+from modelstore import ModelStore
+
+FORECAST_MODELS = ['prophet'] + list(BASELINE_MODELS.values()) + ['auto']
+
+
+@dataclass
+class ForecastJob:
+    """预测任务的设置，与预测页面上的选项一一对应"""
+    date_column: str
+    target_column: str
+    start_date: str
+    training_end_date: str
+    end_date: str
+    grouping_columns: List[str] = field(default_factory=list)
+    covariate_columns: List[str] = field(default_factory=list)
+    date_format: Optional[str] = None
+    # None表示从日期列推断
+    freq: Optional[str] = None
+    # FORECAST_MODELS之一，'auto'表示按回测为每个分组选择模型
+    model: str = 'prophet'
+    interval_width: float = 0.6
+    use_advanced_model: bool = False
+    # RECONCILIATION_METHODS之一，None表示不做层级预测
+    reconciliation: Optional[str] = None
+    n_jobs: Optional[int] = None
+    timeout: Optional[float] = 600
+    # 'auto'模型的回测时间预算（秒）
+    time_budget: Optional[float] = None
+    # 已拟合模型的存储目录，None表示不保存
+    store_dir: Optional[str] = None
+
+    @property
+    def columns(self):
+        """任务需要从输入文件读取的列"""
+        columns = [self.date_column, self.target_column] + self.grouping_columns + self.covariate_columns
+        return list(dict.fromkeys(columns))
+
+
+def read_input(path, sheet_name=0, columns=None, cache=None):
+    """
+    读取Excel/CSV/Parquet输入，只读取需要的列
+
+    参数:
+    path (str): 文件路径，按扩展名选择读取方式
+    sheet_name (str/int): Excel工作表
+    columns (list): 需要的列，None表示全部
+    cache (IngestionCache): Excel的解析结果缓存，None表示不缓存
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.parquet', '.pq'):
+        return pd.read_parquet(path, columns=columns)
+    if extension == '.csv':
+        return pd.read_csv(path, usecols=columns)
+    if extension in ('.xlsx', '.xlsm', '.xls'):
+        return load_table(path, sheet_name=sheet_name, cache=cache, usecols=columns)
+    raise ValueError(f"Unsupported input file type: {extension}")
+
+
+class ResultWriter:
+    def __init__(self, path):
+        """
+        逐批追加写出结果：Parquet文件的每一批为一个row group，CSV只在第一批写表头
+
+        参数:
+        path (str): 输出路径，扩展名为.parquet/.pq或.csv
+        """
+        self.path = path
+        extension = os.path.splitext(path)[1].lower()
+        if extension in ('.parquet', '.pq'):
+            self.format = 'parquet'
+        elif extension == '.csv':
+            self.format = 'csv'
+        else:
+            raise ValueError(f"Unsupported output file type: {extension}")
+        self.rows = 0
+        self._writer = None
+        self._schema = None
+
+    def write(self, frame):
+        if self.format == 'parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(frame, schema=self._schema, preserve_index=False)
+            if self._writer is None:
+                self._schema = table.schema
+                self._writer = pq.ParquetWriter(self.path, self._schema)
+            self._writer.write_table(table)
+        else:
+            frame.to_csv(self.path, mode='w' if self.rows == 0 else 'a', header=self.rows == 0, index=False)
+        self.rows += len(frame)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _periods(frame, job, current_date):
+    # 与页面相同：训练期为训练开始日期到训练结束日期，验证期为训练结束日期之后到当前日期
+    return {
+        'training': (frame['date'] >= job.start_date) & (frame['date'] <= job.training_end_date),
+        'validation': (frame['date'] > job.training_end_date) & (frame['date'] <= current_date)
+    }
+
+
+def run_forecast_job(job, data, output_path=None, progress_callback=None):
+    """
+    运行预测任务
+
+    参数:
+    job (ForecastJob): 任务设置
+    data (pandas.DataFrame): 原始数据
+    output_path (str): 结果文件（.parquet或.csv），逐组写出；准确度指标写入同目录的 <文件名>_metrics.csv，
+        层级预测的汇总节点写入 <文件名>_hierarchy.<扩展名>，model='auto'时回测误差写入 <文件名>_backtest.csv
+        （与页面导出的回测表相同）和 <文件名>_backtest_cutoffs.csv（每个截止点的误差）。None表示在内存中返回结果
+    progress_callback (callable): 每完成一个分组调用 progress_callback(已完成数, 总数, 分组)
+
+    返回:
+    dict: groups（分组数）、errors（分组 -> 错误信息）、metrics（准确度指标）、freq、seconds、
+        backtest和backtest_cutoffs（model='auto'时的回测误差，否则为None），
+        未指定output_path时还包括forecast（与页面导出相同的预测结果）和hierarchy（汇总节点的预测）
+    """
+    start = time.perf_counter()
+    current_date = datetime.now().strftime("%Y-%m-%d")
+    data = data[job.columns].copy()
+    freq = job.freq or forecast_frequency(data[job.date_column], job.date_format)
+    data['date'] = parse_dates(data[job.date_column], job.date_format)
+    data['group'] = group_keys(data, job.grouping_columns)
+    all_dates = pd.date_range(start=data['date'].min(), end=job.end_date, freq=freq)
+    all_groups = data['group'].unique()
+    panel, covariate_means = prepare_panel(data, all_dates, all_groups, job.target_column,
+                                           job.covariate_columns, job.grouping_columns)
+    del data
+    panel = panel.sort_values(['group', 'date'], ignore_index=True)
+    rows = panel.groupby('group', sort=False).indices
+    print(f"Forecasting {len(all_groups)} groups over {len(all_dates)} dates (freq={freq}, model={job.model})")
+
+    hierarchy = None
+    base_panel, base_groups = panel, list(all_groups)
+    if job.reconciliation and job.grouping_columns:
+        hierarchy = Hierarchy.from_panel(panel, job.grouping_columns)
+        aggregate_panel = hierarchy.aggregate_panel(panel, job.target_column, job.covariate_columns)
+        base_panel = pd.concat([panel[aggregate_panel.columns], aggregate_panel], ignore_index=True)
+        base_groups = base_groups + hierarchy.aggregate_nodes
+
+    stem, extension = os.path.splitext(output_path) if output_path else (None, None)
+    writer = ResultWriter(output_path) if output_path else None
+    results, metric_parts, written = [], [], set()
+    # 整体序列（所有分组按日期求和）逐组累加，最后计算一次准确度
+    totals = pd.DataFrame(0.0, index=all_dates, columns=[job.target_column] + FORECAST_COLUMNS)
+
+    def emit(group, forecast):
+        """一个分组的结果：写回该组的面板行、累加整体序列、计算准确度并写出"""
+        frame = write_forecasts(panel.iloc[rows[group]].copy(), {group: forecast})
+        if job.model == 'auto':
+            frame['model'] = selection.get(group)
+        if job.date_format:
+            frame[job.date_column] = frame['date'].dt.strftime(job.date_format)
+        metric_parts.append(forecast_metrics(frame, job.target_column, _periods(frame, job, current_date),
+                                             overall=False))
+        columns = [job.target_column] + FORECAST_COLUMNS
+        totals.loc[frame['date'], columns] += frame[columns].fillna(0).to_numpy()
+        if writer is not None:
+            writer.write(frame)
+        else:
+            results.append(frame)
+        written.add(group)
+
+    def failed_forecast():
+        return pd.DataFrame({'ds': all_dates, 'yhat': 0.0, 'yhat_lower': 0.0, 'yhat_upper': 0.0})
+
+    # 层级调和需要所有节点的基础预测，此时先收集再逐组写出
+    callback = emit if hierarchy is None else None
+    store = ModelStore(job.store_dir) if job.store_dir else None
+    selection = {}
+    backtest, cutoff_scores = None, None
+    try:
+        if job.model == 'prophet':
+            tasks, errors = build_forecast_tasks(base_panel, base_groups, job.start_date, job.training_end_date,
+                                                 job.end_date, freq, job.target_column, job.covariate_columns,
+                                                 covariate_means)
+            engine = ForecastEngine(interval_width=job.interval_width, use_advanced_model=job.use_advanced_model,
+                                    covariate_columns=job.covariate_columns, n_jobs=job.n_jobs,
+                                    timeout=job.timeout, store=store)
+            forecasts, fit_errors = engine.run(tasks, progress_callback=progress_callback, callback=callback)
+            errors.update(fit_errors)
+        elif job.model == 'auto':
+            backtester = Backtester(freq, time_budget=job.time_budget, interval_width=job.interval_width,
+                                    covariate_columns=job.covariate_columns,
+                                    use_advanced_model=job.use_advanced_model, n_jobs=job.n_jobs)
+            scores = backtester.run(base_panel, base_groups, job.start_date, job.training_end_date,
+                                    job.target_column)
+            for model, reason in backtester.skipped.items():
+                print(f"Backtest of {model}: {reason}")
+            selection = backtester.select(scores)
+            forecasts, errors = forecast_selected(
+                base_panel, base_groups, selection, job.start_date, job.training_end_date, job.end_date,
+                freq, job.target_column, job.covariate_columns, covariate_means, job.interval_width,
+                job.use_advanced_model, job.timeout, progress_callback, store=store, callback=callback,
+                deadline=backtester.deadline, fallback=backtester.fastest_model())
+            # 与页面导出的回测表相同：各候选模型的验证误差和每个分组最终使用的模型（超出时间预算的分组已改用回退模型）
+            backtest = scores.add_suffix(f"_{backtester.metric}")
+            backtest.insert(0, 'model', pd.Series(selection))
+            backtest = backtest.reset_index()
+            cutoff_scores = backtester.cutoff_scores
+        elif job.model in BASELINE_MODELS.values():
+            forecasts, errors = forecast_baseline(base_panel, base_groups, job.start_date, job.training_end_date,
+                                                  job.end_date, freq, job.target_column, job.model,
+                                                  job.covariate_columns, job.interval_width)
+            if callback is not None:
+                for done, group in enumerate(list(forecasts), 1):
+                    callback(group, forecasts.pop(group))
+                    if progress_callback is not None:
+                        progress_callback(done, len(base_groups), group)
+        else:
+            raise ValueError(f"Unknown forecast model: {job.model}")
+
+        hierarchy_frame = None
+        if hierarchy is not None:
+            node_history = base_panel.pivot_table(index='group', columns='date', values=job.target_column,
+                                                  aggfunc='sum')
+            training_dates = all_dates[(all_dates >= job.start_date) & (all_dates <= job.training_end_date)]
+            # 与页面相同：失败的分组以0作为基础预测参与调和
+            for group in all_groups:
+                if group in errors:
+                    forecasts[group] = failed_forecast()
+            forecasts = reconcile_forecasts(hierarchy, forecasts, node_history, training_dates, job.reconciliation)
+            hierarchy_frame = write_forecasts(aggregate_panel,
+                                              {node: forecasts.pop(node) for node in hierarchy.aggregate_nodes})
+            hierarchy_frame.insert(1, 'level', hierarchy_frame['group'].map(hierarchy.nodes.set_index('node')['level']))
+            for group in list(forecasts):
+                emit(group, forecasts.pop(group))
+
+        # 与页面相同：失败的分组使用0作为预测值（调和时已经写出的分组不再重复写出）
+        for group in all_groups:
+            if group in errors:
+                print(f"Could not forecast for group {group}: {errors[group]}")
+                if group not in written:
+                    emit(group, failed_forecast())
+    finally:
+        if writer is not None:
+            writer.close()
+
+    overall = totals.rename_axis('date').reset_index()
+    overall['group'] = OVERALL
+    metric_parts.append(forecast_metrics(overall, job.target_column, _periods(overall, job, current_date),
+                                         overall=False))
+    metrics = pd.concat(metric_parts).sort_index(level='period', sort_remaining=False)
+
+    summary = {
+        'groups': len(all_groups),
+        'errors': {group: error for group, error in errors.items() if group in rows},
+        'metrics': metrics,
+        'freq': freq,
+        'backtest': backtest,
+        'backtest_cutoffs': cutoff_scores,
+    }
+    if output_path:
+        metrics.to_csv(f"{stem}_metrics.csv")
+        if backtest is not None:
+            backtest.to_csv(f"{stem}_backtest.csv", index=False)
+            cutoff_scores.to_csv(f"{stem}_backtest_cutoffs.csv", index=False)
+        if hierarchy_frame is not None:
+            with ResultWriter(f"{stem}_hierarchy{extension}") as hierarchy_writer:
+                hierarchy_writer.write(hierarchy_frame)
+    else:
+        summary['forecast'] = pd.concat(results, ignore_index=True) if results else panel.iloc[:0]
+        summary['hierarchy'] = hierarchy_frame
+    summary['seconds'] = time.perf_counter() - start
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a sales forecast without the Streamlit page")
+    parser.add_argument("input", help="Excel, CSV or Parquet input file")
+    parser.add_argument("output", help="Output file (.parquet or .csv); groups are written as they complete")
+    parser.add_argument("--sheet", default=0, help="Excel sheet name or index")
+    parser.add_argument("--date-column", required=True)
+    parser.add_argument("--date-format", default=None, help="e.g. %%Y%%m; inferred by pandas if omitted")
+    parser.add_argument("--target", required=True, help="Target column to forecast")
+    parser.add_argument("--group", action="append", default=[], help="Grouping column (repeat for several)")
+    parser.add_argument("--covariate", action="append", default=[], help="Covariate column (repeat for several)")
+    parser.add_argument("--start", required=True, help="Training start date")
+    parser.add_argument("--training-end", required=True, help="Training end date")
+    parser.add_argument("--end", required=True, help="Forecast end date")
+    parser.add_argument("--freq", default=None, help="Forecast frequency; inferred from the dates if omitted")
+    parser.add_argument("--model", default="prophet", choices=FORECAST_MODELS)
+    parser.add_argument("--interval-width", type=float, default=0.6)
+    parser.add_argument("--advanced", action="store_true", help="Use MCMC sampling for Prophet")
+    parser.add_argument("--reconcile", default=None, choices=RECONCILIATION_METHODS,
+                        help="Forecast every level of the grouping hierarchy and reconcile")
+    parser.add_argument("--jobs", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--timeout", type=float, default=600, help="Per-group timeout in seconds")
+    parser.add_argument("--time-budget", type=float, default=None,
+                        help="Time budget in seconds for backtesting and the final fits with --model auto")
+    parser.add_argument("--store-dir", default=None, help="Directory for reusing fitted models between runs")
+    parser.add_argument("--ingestion-cache-dir", default=None,
+                        help="Directory for caching parsed Excel input as Parquet between runs")
+    args = parser.parse_args(argv)
+
+    job = ForecastJob(
+        date_column=args.date_column, target_column=args.target, start_date=args.start,
+        training_end_date=args.training_end, end_date=args.end, grouping_columns=args.group,
+        covariate_columns=args.covariate, date_format=args.date_format, freq=args.freq, model=args.model,
+        interval_width=args.interval_width, use_advanced_model=args.advanced, reconciliation=args.reconcile,
+        n_jobs=args.jobs, timeout=args.timeout, time_budget=args.time_budget, store_dir=args.store_dir)
+    sheet = int(args.sheet) if str(args.sheet).isdigit() else args.sheet
+    cache = IngestionCache(args.ingestion_cache_dir) if args.ingestion_cache_dir else None
+    data = read_input(args.input, sheet_name=sheet, columns=job.columns, cache=cache)
+    print(f"Loaded {len(data)} rows from {args.input}")
+
+    def report(done, total, group):
+        if done == total or done % max(1, total // 20) == 0:
+            print(f"{done}/{total} groups done")
+
+    summary = run_forecast_job(job, data, args.output, progress_callback=report)
+    print(f"Wrote {args.output} ({summary['groups']} groups, {len(summary['errors'])} failed) "
+          f"in {summary['seconds']:.1f}s")
+    print(summary['metrics'].xs(OVERALL, level='group').round(3).to_string())
+    return 0 if not summary['errors'] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,152 @@
+#forecastmetrics.py
+import numpy as np
+import pandas as pd
+
+# 所有分组按日期求和后的整体序列在结果中的分组名
+OVERALL = 'Overall'
+METRICS = ['count', 'mpe', 'mape', 'smape', 'wape', 'bias', 'mase', 'coverage']
+
+# 每行的误差项，按(period, group)求和后得到各指标
+_TERMS = ['count', 'positive', 'actual', 'abs_actual', 'error', 'abs_error', 'pct_error', 'abs_pct_error',
+          'smape_term', 'interval_count', 'covered']
+
+
+def _row_terms(actual, forecast, lower=None, upper=None):
+    """逐行的误差项（向量化），实际值或预测值缺失的行不参与计算"""
+    valid = ~(np.isnan(actual) | np.isnan(forecast))
+    error = np.where(valid, forecast - actual, 0.0)
+    actual = np.where(valid, actual, 0.0)
+    positive = valid & (actual > 0)
+    pct_error = np.where(positive, error / np.where(positive, actual, 1.0), 0.0)
+    denominator = np.abs(actual) + np.abs(np.where(valid, forecast, 0.0))
+    smape_term = np.where(denominator > 0, 2 * np.abs(error) / np.where(denominator > 0, denominator, 1.0), 0.0)
+    terms = {
+        'count': valid.astype(np.float64),
+        'positive': positive.astype(np.float64),
+        'actual': actual,
+        'abs_actual': np.abs(actual),
+        'error': error,
+        'abs_error': np.abs(error),
+        'pct_error': pct_error,
+        'abs_pct_error': np.abs(pct_error),
+        'smape_term': smape_term
+    }
+    if lower is not None and upper is not None:
+        has_interval = valid & ~(np.isnan(lower) | np.isnan(upper))
+        terms['interval_count'] = has_interval.astype(np.float64)
+        terms['covered'] = (has_interval & (actual >= np.nan_to_num(lower)) &
+                            (actual <= np.nan_to_num(upper))).astype(np.float64)
+    else:
+        terms['interval_count'] = np.zeros(len(actual))
+        terms['covered'] = np.zeros(len(actual))
+    return terms
+
+
+def _naive_scale(frame, group_column, value_column, season_length):
+    """MASE的分母：每组训练期内季节性朴素预测（滞后season_length期）的平均绝对误差"""
+    lagged = frame.groupby(group_column, sort=False)[value_column].shift(season_length)
+    naive_error = (frame[value_column] - lagged).abs()
+    return naive_error.groupby(frame[group_column], sort=False).mean()
+
+
+def forecast_metrics(panel, target_column, periods, forecast_column='forecast', lower_column='forecast_lower',
+                     upper_column='forecast_upper', group_column='group', date_column='date',
+                     season_length=1, scale_period=None, overall=True):
+    """
+    一次groupby计算所有分组（以及按日期求和的整体序列）在各时间段的预测准确度指标
+
+    参数:
+    panel (pandas.DataFrame): 包含分组、日期、实际值、预测值和预测区间的面板数据
+    target_column (str): 实际值列
+    periods (dict): 时间段名称 -> 与panel对齐的布尔掩码（如训练期、验证期）
+    forecast_column, lower_column, upper_column (str): 预测值和预测区间的列，区间列不存在时覆盖率为NaN
+    group_column, date_column (str): 分组列和日期列
+    season_length (int): MASE中季节性朴素预测的滞后期数
+    scale_period (str): 计算MASE分母的时间段，默认第一个时间段（训练期）
+    overall (bool): 是否同时计算整体序列（分组名为OVERALL）
+
+    返回:
+    pandas.DataFrame: 以(period, group)为索引，列为METRICS：
+        count（参与计算的行数）、mpe（平均百分比误差，%，即页面原来显示的准确度）、mape、smape、wape（%）、
+        bias（平均误差）、mase、coverage（实际值落在预测区间内的比例，%）
+    """
+    has_interval = lower_column in panel.columns and upper_column in panel.columns
+    columns = [group_column, date_column, target_column, forecast_column]
+    if has_interval:
+        columns += [lower_column, upper_column]
+    data = panel[columns]
+    if overall:
+        # 与页面的整体图表相同：按日期直接求和
+        totals = data.groupby(date_column, sort=True)[columns[2:]].sum().reset_index()
+        totals[group_column] = OVERALL
+
+    parts, scale_frames = [], []
+    scale_period = scale_period if scale_period is not None else next(iter(periods), None)
+    for name, mask in periods.items():
+        mask = np.asarray(mask, dtype=bool)
+        frames = [data.loc[mask]]
+        if overall:
+            dates = data.loc[mask, date_column].unique()
+            frames.append(totals.loc[totals[date_column].isin(dates), columns])
+        selected = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        terms = _row_terms(
+            selected[target_column].to_numpy(dtype=np.float64, na_value=np.nan),
+            selected[forecast_column].to_numpy(dtype=np.float64, na_value=np.nan),
+            selected[lower_column].to_numpy(dtype=np.float64, na_value=np.nan) if has_interval else None,
+            selected[upper_column].to_numpy(dtype=np.float64, na_value=np.nan) if has_interval else None)
+        part = pd.DataFrame(terms)
+        part['period'] = name
+        part['group'] = selected[group_column].to_numpy()
+        parts.append(part)
+        if name == scale_period:
+            scale_frames.append(selected[[group_column, date_column, target_column]])
+
+    if not parts:
+        return pd.DataFrame(columns=METRICS)
+    sums = pd.concat(parts, ignore_index=True).groupby(['period', 'group'], sort=False)[_TERMS].sum()
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        count = sums['count']
+        positive = sums['positive'].where(sums['positive'] > 0)
+        metrics = pd.DataFrame({
+            'count': count.astype(np.int64),
+            # 与原来的页面相同：实际值合计不大于0的分组不计算百分比误差
+            'mpe': (sums['pct_error'] / positive * 100).where(sums['actual'] > 0),
+            'mape': (sums['abs_pct_error'] / positive * 100).where(sums['actual'] > 0),
+            'smape': sums['smape_term'] / count.where(count > 0) * 100,
+            'wape': sums['abs_error'] / sums['abs_actual'].where(sums['abs_actual'] > 0) * 100,
+            'bias': sums['error'] / count.where(count > 0),
+            'coverage': sums['covered'] / sums['interval_count'].where(sums['interval_count'] > 0) * 100
+        }, index=sums.index)
+
+    metrics['mase'] = np.nan
+    if scale_frames:
+        scale_data = scale_frames[0].sort_values([group_column, date_column], kind='stable')
+        scale = _naive_scale(scale_data, group_column, target_column, season_length)
+        scale = scale.where(scale > 0)
+        mae = sums['abs_error'] / sums['count'].where(sums['count'] > 0)
+        groups = sums.index.get_level_values('group')
+        metrics['mase'] = mae.to_numpy() / scale.reindex(groups).to_numpy()
+    return metrics[METRICS]
+
+
+def metric_by_group(metrics, period, metric):
+    """
+    取某时间段某指标的 分组 -> 值 字典（不含整体序列）
+
+    参数:
+    metrics (pandas.DataFrame): forecast_metrics的结果
+    period (str): 时间段名称
+    metric (str): 指标名
+    """
+    if period not in metrics.index.get_level_values('period'):
+        return {}
+    values = metrics.xs(period, level='period')[metric]
+    return {group: value for group, value in values.items() if group != OVERALL}
+
+
+def overall_metric(metrics, period, metric):
+    """取整体序列在某时间段的某指标，没有时为NaN"""
+    if metrics is None or (period, OVERALL) not in metrics.index:
+        return np.nan
+    return metrics.loc[(period, OVERALL), metric]
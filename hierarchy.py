@@ -0,0 +1,199 @@
+#hierarchy.py
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse.linalg import splu
+
+from forecasting import FORECAST_COLUMNS, combine_forecasts
+
+TOTAL = 'Total'
+RECONCILIATION_METHODS = ['bottom_up', 'top_down', 'ols', 'wls', 'mint']
+
+
+class Hierarchy:
+    def __init__(self, leaves, grouping_columns):
+        """
+        由分组列确定的层级结构：总计 -> 第一列 -> 前两列 -> ... -> 全部分组列（叶节点，即面板中的group）。
+        节点名与页面生成分组键的方式相同（各列的值用'_'连接），总计节点为TOTAL。
+
+        参数:
+        leaves (pandas.DataFrame): 每个叶节点一行，包含group和grouping_columns列
+        grouping_columns (list): 分组列，顺序即层级顺序
+        """
+        self.grouping_columns = list(grouping_columns)
+        leaves = leaves.drop_duplicates('group').reset_index(drop=True)
+        self.leaves = leaves['group'].tolist()
+        n_leaves = len(leaves)
+
+        names, levels, rows, columns = [TOTAL], ['total'], [np.zeros(n_leaves, dtype=np.int64)], [np.arange(n_leaves)]
+        keys = pd.Series('', index=leaves.index)
+        for depth, col in enumerate(self.grouping_columns[:-1]):
+            keys = leaves[col].astype(str) if depth == 0 else keys + '_' + leaves[col].astype(str)
+            codes, uniques = pd.factorize(keys)
+            rows.append(codes + len(names))
+            columns.append(np.arange(n_leaves))
+            names += list(uniques)
+            levels += [col] * len(uniques)
+        # 叶节点
+        rows.append(np.arange(n_leaves) + len(names))
+        columns.append(np.arange(n_leaves))
+        names += self.leaves
+        levels += ['group'] * n_leaves
+
+        names = pd.Series(names, dtype=object)
+        levels = pd.Series(levels, dtype=object)
+        # 不同层级的节点名相同时，在汇总节点名后加上层级
+        clash = names.duplicated(keep=False) & (levels != 'group')
+        names[clash] = names[clash] + ' (' + levels[clash] + ')'
+        self.nodes = pd.DataFrame({'node': names, 'level': levels})
+        self.n_aggregate = len(names) - n_leaves
+        # 求和矩阵S：节点 = S @ 叶节点
+        self.summing = sparse.csr_matrix(
+            (np.ones(sum(len(r) for r in rows)), (np.concatenate(rows), np.concatenate(columns))),
+            shape=(len(names), n_leaves))
+
+    @classmethod
+    def from_panel(cls, panel, grouping_columns):
+        return cls(panel[['group'] + list(grouping_columns)].drop_duplicates('group'), grouping_columns)
+
+    @property
+    def aggregate_nodes(self):
+        return self.nodes['node'].iloc[:self.n_aggregate].tolist()
+
+    def aggregate(self, values):
+        """
+        叶节点的数据汇总到所有节点
+
+        参数:
+        values (numpy.ndarray): (叶节点数, 期数)，行顺序与self.leaves相同
+
+        返回:
+        numpy.ndarray: (节点数, 期数)
+        """
+        return np.asarray(self.summing @ values)
+
+    def aggregate_panel(self, panel, target_column, covariate_columns=None):
+        """
+        汇总节点的面板数据：目标列按日期求和，协变量取叶节点的均值
+
+        参数:
+        panel (pandas.DataFrame): 叶节点的完整(date, group)面板
+
+        返回:
+        pandas.DataFrame: 汇总节点的date, group, 目标列, 协变量列（group为节点名）
+        """
+        covariate_columns = covariate_columns or []
+        aggregate = self.summing[:self.n_aggregate]
+        counts = np.asarray(aggregate.sum(axis=1)).ravel()
+        frames = []
+        for col in [target_column] + covariate_columns:
+            wide = panel.pivot_table(index='group', columns='date', values=col, aggfunc='sum', dropna=False)
+            wide = wide.reindex(self.leaves)
+            totals = np.asarray(aggregate @ wide.to_numpy(dtype=np.float64, na_value=0.0))
+            if col != target_column:
+                totals = totals / counts[:, None]
+            frames.append(totals.ravel())
+        dates = wide.columns
+        result = pd.DataFrame({
+            'date': np.tile(dates, self.n_aggregate),
+            'group': np.repeat(np.array(self.aggregate_nodes, dtype=object), len(dates))
+        })
+        for col, values in zip([target_column] + covariate_columns, frames):
+            result[col] = values
+        return result
+
+    def _constraint(self):
+        """零约束矩阵 C = [I, -S_agg]：一致的预测满足 C @ y = 0"""
+        aggregate = self.summing[:self.n_aggregate]
+        return sparse.hstack([sparse.identity(self.n_aggregate, format='csr'), -aggregate], format='csc')
+
+    def reconcile(self, base, method='mint', residual_variance=None, history=None):
+        """
+        一次线性代数运算调和所有节点、所有日期的预测，使每个汇总节点等于其叶节点之和
+
+        参数:
+        base (numpy.ndarray): (节点数, 期数) 的基础预测，行顺序与self.nodes相同
+        method (str):
+            'bottom_up': 只使用叶节点的预测
+            'top_down': 按历史比例把总计节点的预测分配到叶节点
+            'ols': 最小迹投影，W为单位矩阵
+            'wls': 最小迹投影，W为各节点包含的叶节点数（结构缩放）
+            'mint': 最小迹投影，W为各节点样本内残差的方差（对角MinT）
+        residual_variance (numpy.ndarray): 各节点的残差方差，'mint'时必需
+        history (numpy.ndarray): (节点数, 期数) 的历史数据，'top_down'时必需
+
+        返回:
+        numpy.ndarray: (节点数, 期数) 的一致预测
+        """
+        base = np.asarray(base, dtype=np.float64)
+        n_leaves = len(self.leaves)
+        if method == 'bottom_up':
+            return self.aggregate(base[self.n_aggregate:])
+        if method == 'top_down':
+            leaf_history = np.asarray(history, dtype=np.float64)[self.n_aggregate:]
+            total = leaf_history.sum()
+            proportions = leaf_history.sum(axis=1) / total if total != 0 else np.full(n_leaves, 1 / n_leaves)
+            return self.aggregate(proportions[:, None] * base[0][None, :])
+        if method == 'ols':
+            weights = np.ones(len(base))
+        elif method == 'wls':
+            weights = np.asarray(self.summing.sum(axis=1), dtype=np.float64).ravel()
+        elif method == 'mint':
+            if residual_variance is None:
+                raise ValueError("MinT reconciliation needs the residual variance of every node")
+            weights = np.asarray(residual_variance, dtype=np.float64)
+            positive = weights[weights > 0]
+            # 残差方差为0（如完全拟合）的节点给一个很小的方差，避免矩阵奇异
+            weights = np.where(weights > 0, weights, positive.min() * 1e-3 if len(positive) else 1.0)
+        else:
+            raise ValueError(f"Unknown reconciliation method: {method}")
+        # y~ = y^ - W C' (C W C')^-1 C y^，只需求解 (汇总节点数 x 汇总节点数) 的稀疏方程组
+        constraint = self._constraint()
+        weighted = constraint @ sparse.diags(weights)
+        system = (weighted @ constraint.T).tocsc()
+        correction = splu(system).solve(np.asarray(constraint @ base))
+        return base - np.asarray(weighted.T @ correction)
+
+
+def reconcile_forecasts(hierarchy, forecasts, history, training_dates, method='mint'):
+    """
+    调和各节点的预测结果（ds, yhat, yhat_lower, yhat_upper）。
+    预测区间随预测值平移（保持原来的宽度）；汇总节点没有预测时用其叶节点预测之和作为基础预测。
+
+    参数:
+    hierarchy (Hierarchy): 层级结构
+    forecasts (dict): 节点 -> 预测结果，所有节点的ds相同；缺少的叶节点按0处理
+    history (pandas.DataFrame): 以节点为行、日期为列的实际值（至少包含训练期），用于残差方差和历史比例
+    training_dates (pandas.DatetimeIndex): 训练期的日期
+    method (str): 见Hierarchy.reconcile
+
+    返回:
+    dict: 节点 -> 调和后的预测结果
+    """
+    nodes = hierarchy.nodes['node'].tolist()
+    combined = combine_forecasts(forecasts).drop_duplicates(['group', 'date'], keep='last')
+    index = pd.DatetimeIndex(combined['date'].unique()).sort_values()
+    columns = {}
+    for col, forecast_col in zip(['yhat', 'yhat_lower', 'yhat_upper'], FORECAST_COLUMNS):
+        values = combined.pivot(index='group', columns='date', values=forecast_col)
+        values = values.reindex(index=nodes, columns=index).to_numpy(dtype=np.float64)
+        leaves = np.nan_to_num(values[hierarchy.n_aggregate:])
+        values[hierarchy.n_aggregate:] = leaves
+        # 没有基础预测的汇总节点用叶节点之和
+        values = np.where(np.isnan(values), hierarchy.aggregate(leaves), values)
+        columns[col] = values
+
+    actual = history.reindex(index=nodes, columns=index).to_numpy(dtype=np.float64)
+    in_training = index.isin(training_dates)
+    residuals = actual[:, in_training] - columns['yhat'][:, in_training]
+    counts = (~np.isnan(residuals)).sum(axis=1)
+    residual_variance = (np.nansum(residuals ** 2, axis=1) / np.maximum(counts, 1)) if in_training.any() else None
+
+    reconciled = hierarchy.reconcile(columns['yhat'], method, residual_variance=residual_variance,
+                                     history=np.nan_to_num(actual[:, in_training]))
+    shift = reconciled - columns['yhat']
+    return {
+        node: pd.DataFrame({'ds': index, 'yhat': reconciled[i], 'yhat_lower': columns['yhat_lower'][i] + shift[i],
+                            'yhat_upper': columns['yhat_upper'][i] + shift[i]})
+        for i, node in enumerate(nodes)
+    }
@@ -0,0 +1,387 @@
+#ingestion.py
+import hashlib
+import io
+import os
+import pickle
+import re
+import zipfile
+from datetime import datetime, timedelta
+from xml.etree import ElementTree
+
+import pandas as pd
+from pandas.errors import EmptyDataError
+from pandas.io.parsers import TextParser
+
+from fingerprint import combine_fingerprints
+from profilecache import ProfileCache
+
+# 解析结果的格式发生变化时递增，使旧缓存失效
+INGESTION_CACHE_VERSION = 2
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'ingestion')
+
+_REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+_PACKAGE_REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+# Excel内置的日期/时间数字格式编号
+_BUILTIN_DATE_FORMATS = set(range(14, 23)) | {45, 46, 47}
+# 去掉引号中的文字、方括号中的颜色/条件和转义字符后，含有日期时间占位符的自定义格式视为日期
+_FORMAT_LITERALS = re.compile(r'"[^"]*"|\[[^\]]*\]|\\.')
+_DATE_TOKENS = re.compile(r'[dmyhs]', re.IGNORECASE)
+# pandas默认视为缺失值的字符串（与read_csv/read_excel的默认na_values相同）
+NA_VALUES = frozenset(['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+                       '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'])
+# 列字母 -> 列号
+_COLUMN_INDEX = {}
+
+
+def _local(tag):
+    return tag.rpartition('}')[2]
+
+
+def _column_index(reference):
+    """单元格引用（如"AB12"）的列号，从0开始"""
+    letters = reference.rstrip('0123456789')
+    index = _COLUMN_INDEX.get(letters)
+    if index is None:
+        index = 0
+        for char in letters:
+            index = index * 26 + ord(char.upper()) - 64
+        index -= 1
+        _COLUMN_INDEX[letters] = index
+    return index
+
+
+def _from_excel(value, epoch):
+    """Excel的日期序列值转换为datetime，与openpyxl相同：精确到毫秒，小于1的值为time"""
+    day, fraction = divmod(value, 1)
+    diff = timedelta(milliseconds=round(fraction * 86400000))
+    if 0 <= value < 1 and diff.days == 0:
+        return (datetime.min + diff).time()
+    # 1900日期系统中1900-03-01之前的序列值（Excel把1900年当作闰年）
+    if 0 < value < 60 and epoch.year == 1899:
+        day += 1
+    return epoch + timedelta(days=day) + diff
+
+
+class XlsxReader:
+    def __init__(self, source):
+        """
+        只读的xlsx流式解析器：直接解析压缩包中的工作表XML，逐行产生单元格的值，不构建工作簿对象。
+        与pandas.read_excel（openpyxl）的结果一致：共享字符串、内联字符串、布尔值、
+        日期格式的数字转换为datetime，错误值和默认的缺失值字符串（如"NA"、"#N/A"）为None。
+
+        参数:
+        source: 文件路径、bytes或文件对象
+        """
+        if isinstance(source, (bytes, bytearray)):
+            source = io.BytesIO(source)
+        self.archive = zipfile.ZipFile(source)
+        self._shared_strings = None
+        self._date_styles = None
+
+        workbook = ElementTree.fromstring(self.archive.read('xl/workbook.xml'))
+        self.date1904 = False
+        sheets = []
+        for element in workbook.iter():
+            name = _local(element.tag)
+            if name == 'workbookPr':
+                self.date1904 = element.get('date1904', '0') in ('1', 'true')
+            elif name == 'sheet':
+                sheets.append((element.get('name'), element.get(f'{{{_REL_NS}}}id')))
+        relations = ElementTree.fromstring(self.archive.read('xl/_rels/workbook.xml.rels'))
+        targets = {rel.get('Id'): rel.get('Target') for rel in relations.iter(f'{{{_PACKAGE_REL_NS}}}Relationship')}
+        self.sheets = {}
+        for name, rel_id in sheets:
+            target = targets[rel_id]
+            self.sheets[name] = target.lstrip('/') if target.startswith('/') else 'xl/' + target
+        self.epoch = datetime(1904, 1, 1) if self.date1904 else datetime(1899, 12, 30)
+
+    @property
+    def sheet_names(self):
+        return list(self.sheets)
+
+    def _read_shared_strings(self):
+        strings = []
+        if 'xl/sharedStrings.xml' not in self.archive.namelist():
+            return strings
+        with self.archive.open('xl/sharedStrings.xml') as f:
+            for event, element in ElementTree.iterparse(f):
+                if _local(element.tag) == 'si':
+                    # 富文本由多个run组成；注音（rPh）不属于单元格文字
+                    parts = [node.text or '' for node in element.iter() if _local(node.tag) == 't']
+                    phonetic = [node for node in element if _local(node.tag) == 'rPh']
+                    if phonetic:
+                        parts = [node.text or '' for child in element if _local(child.tag) != 'rPh'
+                                 for node in child.iter() if _local(node.tag) == 't']
+                    strings.append(''.join(parts))
+                    element.clear()
+        return strings
+
+    def _read_date_styles(self):
+        """cellXfs中数字格式为日期/时间的样式序号"""
+        if 'xl/styles.xml' not in self.archive.namelist():
+            return set()
+        styles = ElementTree.fromstring(self.archive.read('xl/styles.xml'))
+        date_formats = set(_BUILTIN_DATE_FORMATS)
+        for element in styles.iter():
+            if _local(element.tag) == 'numFmt':
+                code = _FORMAT_LITERALS.sub('', element.get('formatCode', ''))
+                if _DATE_TOKENS.search(code):
+                    date_formats.add(int(element.get('numFmtId')))
+        date_styles = set()
+        for element in styles:
+            if _local(element.tag) == 'cellXfs':
+                for index, xf in enumerate(element):
+                    if int(xf.get('numFmtId', 0)) in date_formats:
+                        date_styles.add(str(index))
+        return date_styles
+
+    def iter_rows(self, sheet_name=None, columns=None, missing=None, na_values=NA_VALUES):
+        """
+        从第一行开始逐行产生单元格的值（list，长度为该行最后一个有值的列号+1），
+        与pandas.read_excel相同，中间的空行产生空list，最后一个有值的行之后的空行不产生。
+        只解析部分列时，按整行是否有值判断空行，与先读取整行再选择列的结果相同
+
+        参数:
+        sheet_name (str/int): 工作表名称或序号，默认第一个
+        columns (set): 只解析这些列号（从0开始）的单元格，None表示全部
+        missing: 缺失值
+        na_values (set): 视为缺失值的字符串，默认与pandas相同；空字符串总是视为空单元格
+        """
+        if self._shared_strings is None:
+            self._shared_strings = self._read_shared_strings()
+            self._date_styles = self._read_date_styles()
+        if sheet_name is None or isinstance(sheet_name, int):
+            sheet_name = self.sheet_names[sheet_name or 0]
+        path = self.sheets[sheet_name]
+        shared, date_styles, epoch = self._shared_strings, self._date_styles, self.epoch
+
+        with self.archive.open(path) as f:
+            # 已产生的行数和当前行的行号（从1开始）
+            produced, number = 0, 0
+            # 只处理结束事件，每行结束时解析该行的所有单元格，然后清空该行释放内存
+            for event, element in ElementTree.iterparse(f):
+                if not element.tag.endswith('}row'):
+                    continue
+                reference = element.get('r')
+                number = int(reference) if reference else number + 1
+                row, position, filled = [], 0, False
+                for cell in element:
+                    reference = cell.get('r')
+                    index = _column_index(reference) if reference else position
+                    position = index + 1
+                    if columns is not None and index not in columns:
+                        # 只有公式没有缓存值的单元格是空的
+                        filled = filled or any(child.tag.endswith('}is') or child.tag.endswith('}v') and child.text
+                                               for child in cell)
+                        continue
+                    kind = cell.get('t')
+                    value = None
+                    if kind == 'inlineStr':
+                        value = ''.join(node.text or '' for node in cell.iter() if node.tag.endswith('}t'))
+                    else:
+                        for child in cell:
+                            if child.tag.endswith('}v'):
+                                value = child.text
+                                break
+                        if value is not None:
+                            if kind == 's':
+                                value = shared[int(value)]
+                            elif kind is None or kind == 'n':
+                                value = float(value)
+                                if cell.get('s') in date_styles:
+                                    value = _from_excel(value, epoch)
+                                elif value.is_integer():
+                                    # 与pandas.read_excel相同，整数值为int
+                                    value = int(value)
+                            elif kind == 'b':
+                                value = value == '1'
+                            elif kind == 'e':
+                                filled, value = True, None
+                            elif kind == 'd':
+                                value = pd.Timestamp(value).to_pydatetime()
+                    if value is None or value == '':
+                        continue
+                    filled = True
+                    if isinstance(value, str) and value in na_values:
+                        value = missing
+                    if index >= len(row):
+                        row.extend([missing] * (index + 1 - len(row)))
+                    row[index] = value
+                element.clear()
+                if filled:
+                    while produced < number - 1:
+                        yield []
+                        produced += 1
+                    yield row
+                    produced += 1
+
+    def read(self, sheet_name=None, usecols=None):
+        """
+        解析工作表为DataFrame。单元格的值与pandas.read_excel（openpyxl）读到的相同，
+        再交给read_excel使用的TextParser处理列名、缺失值字符串和类型推断，结果（包括dtype）与read_excel一致
+
+        参数:
+        sheet_name (str/int): 工作表名称或序号，默认第一个
+        usecols (list): 只读取这些列名，None表示全部
+        """
+        # 缺失值字符串保持原样，由TextParser按pandas的规则转换
+        rows = self.iter_rows(sheet_name, missing='', na_values=())
+        header = next(rows, None)
+        if header is None:
+            return pd.DataFrame()
+        if usecols is not None and all(col in header for col in usecols):
+            # 只解析需要的列，其他列为空；表头仍保留完整的一行，重复列名等由TextParser处理
+            keep = {i for i, value in enumerate(header) if value in usecols}
+            rows = self.iter_rows(sheet_name, columns=keep, missing='', na_values=())
+            next(rows, None)
+        data = [header] + list(rows)
+        width = max(len(row) for row in data)
+        data = [row + [''] * (width - len(row)) if len(row) < width else row for row in data]
+        try:
+            return TextParser(data, header=0, skip_blank_lines=False, usecols=usecols).read()
+        except EmptyDataError:
+            return pd.DataFrame()
+
+
+def _restore_missing(frame):
+    """Parquet读回的object列中缺失值为None，统一为NaN，与直接解析的结果一致"""
+    for col in frame.columns:
+        series = frame[col]
+        if series.dtype == object and series.isna().any():
+            frame[col] = series.where(series.notna(), float('nan'))
+    return frame
+
+
+class IngestionCache(ProfileCache):
+    """
+    磁盘上的上传文件解析结果缓存（LRU），键为文件内容的哈希、工作表和读取的列。
+    条目优先保存为Parquet（列式存储，读取只需毫秒级），含有Parquet不支持的数据
+    （如混合类型的列、非字符串列名）时退化为pickle。
+    """
+
+    SUFFIXES = ('.parquet', '.pkl')
+    NAME = 'ingestion cache'
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_entries=50):
+        super().__init__(directory, max_entries)
+
+    def _dump(self, frame, f):
+        try:
+            frame.to_parquet(f, index=False)
+            return '.parquet'
+        except (ValueError, TypeError, NotImplementedError):
+            # pyarrow的转换错误是这些异常的子类；丢弃可能已写入的部分后改用pickle
+            f.seek(0)
+            f.truncate()
+            pickle.dump(frame, f, protocol=pickle.HIGHEST_PROTOCOL)
+            return '.pkl'
+
+    def _load(self, f, suffix):
+        return _restore_missing(pd.read_parquet(f) if suffix == '.parquet' else pd.read_pickle(f))
+
+
+# 文件标识 -> 内容哈希，同一个上传文件在页面重新运行时不必重新计算
+_DIGESTS = {}
+
+
+def _file_name(source, name=None):
+    if name is not None:
+        return name
+    if isinstance(source, (str, os.PathLike)):
+        return os.fspath(source)
+    return getattr(source, 'name', '') or ''
+
+
+def _read_bytes(source):
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            return f.read()
+    if hasattr(source, 'getvalue'):
+        return source.getvalue()
+    source.seek(0)
+    data = source.read()
+    source.seek(0)
+    return data
+
+
+def file_digest(source):
+    """
+    文件内容的哈希。路径按(路径, 大小, 修改时间)、Streamlit的上传文件按file_id记住结果
+
+    参数:
+    source: 文件路径、bytes或文件对象（如Streamlit的UploadedFile）
+    """
+    if isinstance(source, (bytes, bytearray)):
+        return hashlib.blake2b(source, digest_size=16).hexdigest()
+    if isinstance(source, (str, os.PathLike)):
+        stat = os.stat(source)
+        identity = ('path', os.fspath(source), stat.st_size, stat.st_mtime_ns)
+    else:
+        file_id = getattr(source, 'file_id', None)
+        identity = ('upload', file_id, getattr(source, 'name', None), getattr(source, 'size', None)) if file_id else None
+    digest = _DIGESTS.get(identity) if identity is not None else None
+    if digest is None:
+        digest = hashlib.blake2b(_read_bytes(source), digest_size=16).hexdigest()
+        if identity is not None:
+            _DIGESTS[identity] = digest
+    return digest
+
+
+def sheet_names(source, name=None):
+    """
+    工作簿中的工作表名称。xlsx只读取workbook.xml，不解析工作表
+
+    参数:
+    source: 文件路径、bytes或文件对象
+    name (str): 文件名（用于判断格式），默认取自source
+    """
+    if _file_name(source, name).lower().endswith('.xls'):
+        return pd.ExcelFile(source).sheet_names
+    if not isinstance(source, (str, os.PathLike, bytes, bytearray)):
+        source.seek(0)
+    return XlsxReader(source).sheet_names
+
+
+def load_table(source, sheet_name=None, cache=None, usecols=None, name=None):
+    """
+    读取上传的csv/xlsx/xls文件为DataFrame。
+    xlsx用XlsxReader流式解析；解析结果按(文件内容哈希, 工作表, 列)缓存为Parquet，
+    同一个文件再次读取（如页面重新运行）时直接从缓存加载。
+
+    参数:
+    source: 文件路径、bytes或文件对象（如Streamlit的UploadedFile）
+    sheet_name (str/int): 工作表名称或序号，默认第一个；csv忽略
+    cache (IngestionCache): 解析结果缓存，None表示不缓存
+    usecols (list): 只读取这些列，None表示全部
+    name (str): 文件名（用于判断格式），默认取自source
+
+    返回:
+    pandas.DataFrame: 与pandas.read_csv/read_excel的结果相同
+    """
+    file_name = _file_name(source, name).lower()
+    key = None
+    if cache is not None:
+        key = combine_fingerprints([INGESTION_CACHE_VERSION, file_digest(source), os.path.splitext(file_name)[1],
+                                    sheet_name, None if usecols is None else list(usecols)])
+        frame = cache.get(key)
+        if frame is not None:
+            return frame
+
+    if not isinstance(source, (str, os.PathLike, bytes, bytearray)):
+        source.seek(0)
+    if file_name.endswith('.csv'):
+        frame = pd.read_csv(io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source,
+                            usecols=usecols)
+    elif file_name.endswith('.xls'):
+        frame = pd.read_excel(io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source,
+                              sheet_name=sheet_name or 0, usecols=usecols)
+    else:
+        frame = XlsxReader(source).read(sheet_name, usecols=usecols)
+
+    if cache is not None:
+        try:
+            cache.put(key, frame)
+        except Exception as e:
+            print(f"Failed to cache parsed file {file_name}: {str(e)}")
+    return frame
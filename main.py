@@ -21,10 +21,22 @@ from docx.shared import Inches, Pt
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from io import BytesIO
 from dagrelation import DAGRelations
+from dagdiscovery import StructureDiscovery, column_types_from_description
+from resampling import ResamplingEngine
+from edgescreening import EdgeScreener
 from datadescription import DataDescription
+from profilecache import ProfileCache
+from ingestion import IngestionCache, load_table, sheet_names
+from modelstore import ModelStore
+from typeinference import TypeInference
+from forecasting import (ForecastEngine, build_forecast_tasks, forecast_frequency, group_keys, parse_dates,
+                         prepare_panel, write_forecasts)
+from baselines import BASELINE_MODELS, forecast_baseline
+from backtesting import Backtester, forecast_selected
+from hierarchy import RECONCILIATION_METHODS, Hierarchy, reconcile_forecasts
+from forecastmetrics import forecast_metrics, metric_by_group, overall_metric
 import numpy as np
 from datetime import datetime
-from prophet import Prophet
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import base64
@@ -740,6 +752,17 @@ def extract_dag_edges(text_content):
     
     return None
 
+# 商业报告提示词中DAG分析报告的token上限
+DAG_REPORT_TOKEN_BUDGET = 6000
+# 商业报告提示词中数据描述的token上限（按与DAG的相关度保留列和统计量）
+DATA_DESCRIPTION_TOKEN_BUDGET = 4000
+# 超过该行数时数据描述改为在分层抽样行上计算（耗时与行数基本无关，样本量和误差界写入JSON）
+APPROX_DESCRIPTION_ROWS = 200_000
+# 销售预测中单个分组的Prophet拟合超时（秒），超时的分组记为失败
+FORECAST_GROUP_TIMEOUT = 600
+# 按回测为每个分组自动选择模型时的选项名
+AUTO_MODEL = "Auto (backtest)"
+
 def setup_spreadsheet_analysis():
     # st.markdown(
     #     """
@@ -767,6 +790,8 @@ def setup_spreadsheet_analysis():
         st.session_state.dag_reasoning = ""
     if "df" not in st.session_state:
         st.session_state.df = None
+    if "column_types" not in st.session_state:
+        st.session_state.column_types = {}
 
      # --- 新增和修正的初始化 ---
     if "dag_analyzer" not in st.session_state:
@@ -784,15 +809,19 @@ def setup_spreadsheet_analysis():
         
         if uploaded_file is not None:
             try:
-                # 根据文件类型读取数据
-                if uploaded_file.name.endswith('.csv'):
-                    df = pd.read_csv(uploaded_file)
-                else:
-                    df = pd.read_excel(uploaded_file)
+                # 根据文件类型读取数据；解析结果按文件内容缓存，页面重新运行时直接加载
+                if "ingestion_cache" not in st.session_state:
+                    st.session_state.ingestion_cache = IngestionCache()
+                df = load_table(uploaded_file, cache=st.session_state.ingestion_cache)
                     
                 # 处理列名，将空格和特殊符号替换为下划线
                 df.columns = [re.sub(r'[^\w]', '_', col) for col in df.columns]
                 
+                # 加载时推断列类型并一次性转换为高效的dtype，后续分析共用推断结果
+                inference = TypeInference(df, string_threshold=10).infer()
+                df = inference.data
+                st.session_state.column_types = inference.column_types
+                
                 # 保存DataFrame到session state
                 st.session_state.df = df
                 
@@ -834,6 +863,10 @@ def setup_spreadsheet_analysis():
                         st.error(f"无法解析JSON数据: {str(e)}")
                         return
                 
+                inference = TypeInference(df, string_threshold=10).infer()
+                df = inference.data
+                st.session_state.column_types = inference.column_types
+                
                 # 保存DataFrame到session state
                 st.session_state.df = df
                 
@@ -859,6 +892,10 @@ def setup_spreadsheet_analysis():
             # 根据是否已经进行过DAG分析来显示不同的按钮文本
             button_text = "再次生成" if "business_report" in st.session_state and st.session_state.business_report else "生成"
             generate_button = st.button(button_text)
+            discover_button = st.button("⚡ 本地DAG发现",
+                                        help="使用PC算法在本地从数据中学习候选DAG，无需调用模型")
+            use_discovery_prior = st.checkbox("结构学习结果作为先验", value=False,
+                                              help="生成时将本地结构学习得到的候选关系提供给模型参考")
         
         with col2:
             with stylable_container(
@@ -870,13 +907,32 @@ def setup_spreadsheet_analysis():
                     }""",
             ):
                 dag_analysis_button = st.button("📊 DAG分析")
+            use_resampling = st.checkbox("重抽样显著性检验", value=False,
+                                         help="为每条边额外计算置换检验p值和自助法置信区间，适用于偏态数据，但会增加分析时间")
+            use_screening = st.checkbox("弱关联边预筛选", value=False,
+                                        help="先在分层样本上计算关联强度，关联很弱的边只输出简要摘要，跳过完整分析")
         
         # 确保有DataFrame可用于分析
         df = st.session_state.df
+        # 结构学习使用加载时推断的列类型（布尔列按分类处理），没有推断结果时由StructureDiscovery根据dtype推断
+        discovery_column_types = column_types_from_description(st.session_state.column_types) or None
+        
+        # 处理本地DAG发现按钮点击：直接生成可供DAG分析使用的边定义
+        if discover_button:
+            with st.spinner("正在进行本地结构学习..."):
+                discovery = StructureDiscovery(df, column_types=discovery_column_types, n_jobs=os.cpu_count()).discover()
+                st.session_state.dag_edges = discovery.to_dag_definition()
+                st.session_state.analysis_response = f"{discovery.to_prompt()}\n\n```python\n{st.session_state.dag_edges}\n```"
+                st.session_state.analysis_reasoning = ""
         
         # 处理生成按钮点击
         if generate_button and user_question:
             with st.spinner("正在分析..."):
+                discovery_prior = ""
+                discovery = None
+                if use_discovery_prior:
+                    discovery = StructureDiscovery(df, column_types=discovery_column_types, n_jobs=os.cpu_count()).discover()
+                    discovery_prior = f"\n\n本地结构学习先验（仅供参考，需结合业务含义判断方向）：\n{discovery.to_prompt()}"
                 # 根据是否已经有business_report来决定使用哪个提示
                 if "business_report" in st.session_state and st.session_state.business_report:
                     # 使用已有的business_report作为输入，重新思考DAG结构
@@ -917,7 +973,7 @@ def setup_spreadsheet_analysis():
                             },
                             {
                                 "role": "user",
-                                "content": f"Sample数据：\n{st.session_state.sample_data}\n\n用户需求：{user_question}\n\n已有分析报告：\n{st.session_state.business_report}"
+                                "content": f"Sample数据：\n{st.session_state.sample_data}\n\n用户需求：{user_question}\n\n已有分析报告：\n{st.session_state.business_report}{discovery_prior}"
                             }
                         ],
                         temperature=0.7,
@@ -963,7 +1019,7 @@ def setup_spreadsheet_analysis():
                             },
                             {
                                 "role": "user", 
-                                "content": f"Sample数据：\n{st.session_state.sample_data}\n\n用户需求：{user_question}"
+                                "content": f"Sample数据：\n{st.session_state.sample_data}\n\n用户需求：{user_question}{discovery_prior}"
                             }
                         ],
                         temperature=0.7,
@@ -1003,6 +1059,9 @@ def setup_spreadsheet_analysis():
                         dag_end += 1
                     
                     dag_definition = full_response[dag_start:dag_end]
+                elif discovery is not None:
+                    # 模型未给出有效的DAG定义时回退到本地结构学习结果
+                    dag_definition = discovery.to_dag_definition()
                 
                 # 保存到session state
                 st.session_state.analysis_response = full_response
@@ -1027,16 +1086,44 @@ def setup_spreadsheet_analysis():
                     dag_progress = st.empty()
                     
                     if dag_edges:
-                        # 执行DAG分析
-                        analyzer = DAGRelations(df, dag_edges)
-                        dag_report = analyzer.analyze_relations().print_report()
+                        # 执行DAG分析：已有分析结果时只重新计算新增或变化的边
+                        resampling = ResamplingEngine(n_jobs=os.cpu_count()) if use_resampling else None
+                        # 筛选器在会话中复用，其样本和关联强度缓存按列内容寻址
+                        if "edge_screener" not in st.session_state:
+                            st.session_state.edge_screener = EdgeScreener()
+                        screening = st.session_state.edge_screener if use_screening else None
+                        if st.session_state.dag_analyzer is not None:
+                            analyzer = st.session_state.dag_analyzer
+                            analyzer.resampling = resampling
+                            analyzer.screening = screening
+                            analyzer = analyzer.update_dag(dag_edges, data=df)
+                        else:
+                            analyzer = DAGRelations(df, dag_edges, resampling=resampling,
+                                                    screening=screening).analyze_relations()
+                        dag_report = analyzer.print_report()
                         st.session_state.dag_report = dag_report
+                        # 提示词使用紧凑格式并控制token数量，导出报告使用Markdown格式
+                        structured_report = analyzer.build_report()
+                        dag_report_prompt = structured_report.to_prompt(token_budget=DAG_REPORT_TOKEN_BUDGET)
+                        dag_report_markdown = structured_report.to_markdown()
 
                         # 添加数据描述分析
-                        data_analyzer = DataDescription(df, include_histogram=False, string_threshold=10)
+                        # 列描述缓存在磁盘上，文件未变化时重复点击直接复用，修改或新增的列才重新分析
+                        if "profile_cache" not in st.session_state:
+                            st.session_state.profile_cache = ProfileCache()
+                        data_analyzer = DataDescription(df, include_histogram=False, include_density=True,
+                                                        string_threshold=10, n_jobs=os.cpu_count(),
+                                                        sample_rows='auto' if len(df) > APPROX_DESCRIPTION_ROWS else None,
+                                                        cache=st.session_state.profile_cache,
+                                                        column_types=st.session_state.column_types)
                         data_analyzer.analyze_data()
                         json_output = data_analyzer.to_json()
                         st.session_state.data_description = json_output
+                        # 提示词使用按DAG相关度排序的紧凑表格，导出报告仍附完整JSON
+                        data_description_prompt = data_analyzer.to_prompt(dag_edges, token_budget=DATA_DESCRIPTION_TOKEN_BUDGET)
+                        prompt_stats = data_analyzer.prompt_stats
+                        st.caption(f"数据描述提示词约 {prompt_stats['prompt_tokens']} tokens"
+                                   f"（完整JSON约 {prompt_stats['json_tokens']} tokens，减少 {prompt_stats['token_savings_percentage']:.1f}%）")
 
                         # --- 新增：调用可视化函数 ---
                         # 3. 调用可视化函数，传入刚刚创建的本地变量
@@ -1044,7 +1131,8 @@ def setup_spreadsheet_analysis():
                         visualizations = create_visualizations(
                             analyzer,          # <-- 使用本地变量 analyzer
                             data_analyzer,     # <-- 使用本地变量 data_analyzer
-                            df
+                            df,
+                            column_types=st.session_state.column_types
                         )
                         st.session_state.visualizations = visualizations
                         st.session_state.dag_analyzer = analyzer  # 保存分析器对象
@@ -1135,8 +1223,8 @@ def setup_spreadsheet_analysis():
                                     "role": "user",
                                     "content": f"""
                                     初始分析结果：{st.session_state.analysis_response}
-                                    DAG分析报告：{dag_report}
-                                    数据描述信息：{json_output}
+                                    DAG分析报告：{dag_report_prompt}
+                                    数据描述信息：{data_description_prompt}
                                     
                                     请基于以上信息生成一份专业的数据分析报告。报告应严格遵循系统提示中的结构和格式要求，特别注意：
                                     1. 充分利用DAG分析报告中的统计结果，包括F值、p值和类别统计
@@ -1176,7 +1264,7 @@ def setup_spreadsheet_analysis():
                         if cleaned_report.endswith("```"):
                             cleaned_report = cleaned_report[:-3].strip()
                             
-                        st.session_state.business_report = cleaned_report + "\n\n# 分析raw results\n" + dag_report + "\n\n# descriptive analysis\n" + json_output
+                        st.session_state.business_report = cleaned_report + "\n\n# 分析raw results\n" + dag_report_markdown + "\n\n# descriptive analysis\n" + json_output
                         st.session_state.dag_reasoning = reasoning_content
                         
                         # 清空进度容器
@@ -1297,6 +1385,14 @@ def setup_sales_forecasting():
         st.session_state.training_accuracy = {}
     if 'validation_accuracy' not in st.session_state:
         st.session_state.validation_accuracy = {}
+    if 'forecast_accuracy' not in st.session_state:
+        st.session_state.forecast_accuracy = None
+    if 'backtest_scores' not in st.session_state:
+        st.session_state.backtest_scores = None
+    if 'hierarchy_df' not in st.session_state:
+        st.session_state.hierarchy_df = None
+    if 'hierarchy_accuracy' not in st.session_state:
+        st.session_state.hierarchy_accuracy = None
     if 'start_date_str' not in st.session_state:
         st.session_state.start_date_str = None
     if 'training_end_date_str' not in st.session_state:
@@ -1318,11 +1414,12 @@ def setup_sales_forecasting():
             st.session_state.original_filename = uploaded_file.name.split('.')[0]
             
         # Load the file and display sheet selection
-        excel_file = pd.ExcelFile(uploaded_file)
-        sheet_name = st.selectbox("Select Sheet", excel_file.sheet_names)
+        sheet_name = st.selectbox("Select Sheet", sheet_names(uploaded_file))
         
-        # Read the selected sheet
-        df = pd.read_excel(uploaded_file, sheet_name=sheet_name)
+        # Read the selected sheet; parsed sheets are cached by file content so reruns load them directly
+        if "ingestion_cache" not in st.session_state:
+            st.session_state.ingestion_cache = IngestionCache()
+        df = load_table(uploaded_file, sheet_name=sheet_name, cache=st.session_state.ingestion_cache)
         
         # Display data preview
         st.subheader("Data Preview")
@@ -1353,8 +1450,9 @@ def setup_sales_forecasting():
             ]
             date_format = st.selectbox("Select Date Format", date_format_options)
             
-            # 确定预测频率 - 根据日期格式自动调整
-            forecast_freq = 'D' if any(x in date_format for x in ['%d', '%Y%m%d', '%Y-%m-%d', '%d-%m-%Y', '%m/%d/%Y']) else 'MS'
+            # 确定预测频率 - 从日期列推断（如周数据、工作日数据、月末日期），无法推断时根据日期格式判断
+            forecast_freq = forecast_frequency(df[date_column], date_format)
+            st.caption(f"Forecast frequency: {forecast_freq}")
             
             # Target column (to be predicted)
             numeric_columns = df.select_dtypes(include=['number']).columns.tolist()
@@ -1376,13 +1474,30 @@ def setup_sales_forecasting():
                                                help="Additional numeric variables to improve forecast accuracy")
             st.session_state.covariate_columns = covariate_columns
             
-            # 添加模型选择
-            use_advanced_model = st.checkbox("使用高级模型 (更高精度但更慢)", value=False)   
+            # 添加模型选择：Prophet逐组拟合，基线模型一次拟合所有分组（速度快得多）
+            forecast_model = st.selectbox("Forecast Model", ["Prophet"] + list(BASELINE_MODELS) + [AUTO_MODEL],
+                                          help="Baseline models fit all groups at once and are much faster than Prophet; "
+                                               "Auto backtests every model and picks the best one per group")
+            if forecast_model == AUTO_MODEL:
+                backtest_budget = st.number_input("Time Budget (seconds)", min_value=10, max_value=3600,
+                                                  value=300, step=10,
+                                                  help="Covers backtesting and the final fits: models not evaluated "
+                                                       "within the budget are not selected, and Prophet groups not "
+                                                       "fitted by then use the fastest baseline model")
+            use_advanced_model = st.checkbox("使用高级模型 (更高精度但更慢)", value=False,
+                                             disabled=forecast_model not in ("Prophet", AUTO_MODEL))   
         
         with col2:
             # Grouping columns (multi-select)
             all_columns = df.columns.tolist()
             grouping_columns = st.multiselect("Select Columns for Grouping (Optional)", all_columns)
+            # 按分组列的顺序构成层级（总计 -> 第一列 -> ... -> 分组），各层级分别预测后调和
+            reconciliation_method = st.selectbox("Hierarchical Reconciliation", ["None"] + RECONCILIATION_METHODS,
+                                                 disabled=not grouping_columns,
+                                                 help="Forecast every level of the grouping hierarchy and reconcile "
+                                                      "them so that totals equal the sum of their groups")
+            if reconciliation_method == "None" or not grouping_columns:
+                reconciliation_method = None
     
             # Forecast horizon
             forecast_years = st.number_input("Forecast Horizon (Years)", min_value=1, max_value=10, value=3)
@@ -1415,25 +1530,17 @@ def setup_sales_forecasting():
                     
                     # Process date column
                     st.info("Processing date column...")
-                    try:
-                        df_copy['date'] = pd.to_datetime(df_copy[date_column].astype(str), format=date_format)
-                    except:
-                        df_copy['date'] = pd.to_datetime(df_copy[date_column].astype(str))
+                    df_copy['date'] = parse_dates(df_copy[date_column], date_format)
                         
                     # Store the original date format from the column
                     original_date_values = df_copy[date_column].copy()
                         
                     progress_bar.progress(10)
                     
-                    # Create grouping key if group columns are selected
+                    # Create grouping key if group columns are selected (a single group 'all_data' otherwise)
                     if grouping_columns:
                         st.info("Creating group combinations...")
-                        df_copy['group'] = df_copy[grouping_columns[0]].astype(str)
-                        for col in grouping_columns[1:]:
-                            df_copy['group'] += '_' + df_copy[col].astype(str)
-                    else:
-                        # If no grouping is selected, create a single group
-                        df_copy['group'] = 'all_data'
+                    df_copy['group'] = group_keys(df_copy, grouping_columns)
                         
                     progress_bar.progress(20)
                     
@@ -1455,40 +1562,10 @@ def setup_sales_forecasting():
                     all_groups = df_copy['group'].unique()
                     st.session_state.all_groups = all_groups.tolist()
                     
-                    complete_df = pd.DataFrame([(date, group) for date in all_dates for group in all_groups],
-                                              columns=['date', 'group'])
-                    
-                    # Merge with original data
-                    df_copy = pd.merge(complete_df, df_copy, on=['date', 'group'], how='left')
-                    
-                    # Fill missing values for target column with 0
-                    df_copy[target_column] = df_copy[target_column].fillna(0)
-                    
-                    # Handle covariates - calculate means for each covariate within its group
-                    covariate_means = {}
-                    if covariate_columns:
-                        for col in covariate_columns:
-                            # Calculate mean for each group
-                            for group in all_groups:
-                                group_data = df_copy[(df_copy['group'] == group) & df_copy[col].notna()]
-                                if not group_data.empty:
-                                    # Use the mean of non-NA values for this group
-                                    covariate_means[(group, col)] = group_data[col].mean()
-                                else:
-                                    # If all values are NA for this group, use global mean
-                                    global_mean = df_copy[df_copy[col].notna()][col].mean()
-                                    covariate_means[(group, col)] = global_mean if not np.isnan(global_mean) else 0
-                            
-                            # Fill NAs with group-specific means
-                            for group in all_groups:
-                                mask = (df_copy['group'] == group) & df_copy[col].isna()
-                                df_copy.loc[mask, col] = covariate_means.get((group, col), 0)
+                    # 一次生成完整面板并填补目标列、协变量（分组均值，全局均值兜底）和分组列
+                    df_copy, covariate_means = prepare_panel(df_copy, all_dates, all_groups, target_column,
+                                                             covariate_columns, grouping_columns)
                     
-                    # Forward fill other columns within groups
-                    if grouping_columns:
-                        for col in grouping_columns:
-                            df_copy[col] = df_copy.groupby('group')[col].ffill().bfill()
-                            
                     progress_bar.progress(40)
                     
                     # Sort data
@@ -1497,80 +1574,81 @@ def setup_sales_forecasting():
                     # Convert dates to string format
                     current_date_str = current_date.strftime("%Y-%m-%d")
                     
-                    # Run Prophet forecast for each group
-                    st.info("Running forecasts for each group...")
-                    forecasts = {}
-                    training_accuracy = {}
-                    validation_accuracy = {}
-                    total_groups = len(all_groups)
-                    
-                    for i, group in enumerate(all_groups):
-                        # Update progress based on group progress
-                        progress_value = 40 + (i / total_groups * 50)
-                        progress_bar.progress(int(progress_value))
+                    st.session_state.backtest_scores = None
+                    st.session_state.hierarchy_df = None
+                    st.session_state.hierarchy_accuracy = None
+                    if reconciliation_method is not None:
+                        # 汇总节点（总计和各中间层级）的面板与分组面板一起作为基础预测的输入
+                        st.info("Building the grouping hierarchy...")
+                        hierarchy = Hierarchy.from_panel(df_copy, grouping_columns)
+                        aggregate_panel = hierarchy.aggregate_panel(df_copy, target_column, covariate_columns)
+                        base_panel = pd.concat([df_copy[aggregate_panel.columns], aggregate_panel], ignore_index=True)
+                        base_groups = list(all_groups) + hierarchy.aggregate_nodes
+                    else:
+                        hierarchy = None
+                        base_panel, base_groups = df_copy, list(all_groups)
+                    # 已拟合的Prophet模型按训练数据指纹保存，数据未变化的分组不再重新拟合
+                    if "model_store" not in st.session_state:
+                        st.session_state.model_store = ModelStore()
+                    if forecast_model == "Prophet":
+                        # Run Prophet forecast for each group
+                        # 各分组的拟合分发到进程池，单个分组失败或超时时使用0作为预测值
+                        st.info("Running forecasts for each group...")
+                        tasks, forecast_errors = build_forecast_tasks(
+                            base_panel, base_groups, start_date_str, training_end_date_str, end_date_str, forecast_freq,
+                            target_column, covariate_columns, covariate_means)
+                        engine = ForecastEngine(interval_width=interval_width, use_advanced_model=use_advanced_model,
+                                                covariate_columns=covariate_columns, timeout=FORECAST_GROUP_TIMEOUT,
+                                                store=st.session_state.model_store)
                         
-                        # Filter data for this group - using the start_date parameter
-                        group_data = df_copy[(df_copy['group'] == group) & 
-                                           (df_copy['date'] >= start_date_str) & 
-                                           (df_copy['date'] <= training_end_date_str)].copy()
+                        def update_progress(done, total, group):
+                            progress_bar.progress(int(40 + done / total * 50))
                         
-                        group_data = group_data.rename(columns={'date': 'ds', target_column: 'y'})
+                        forecasts, fit_errors = engine.run(tasks, progress_callback=update_progress)
+                        forecast_errors.update(fit_errors)
+                        if engine.reused:
+                            st.caption(f"Reused saved models for {len(engine.reused)} of {len(tasks)} groups "
+                                       f"whose training data did not change")
+                    elif forecast_model == AUTO_MODEL:
+                        # 在训练期内滚动回测所有候选模型，按验证误差为每个分组选择模型
+                        st.info("Backtesting candidate models for each group...")
+                        backtester = Backtester(forecast_freq, time_budget=backtest_budget,
+                                                interval_width=interval_width, covariate_columns=covariate_columns,
+                                                use_advanced_model=use_advanced_model)
                         
-                        # Add covariates to Prophet model if selected
-                        if use_advanced_model:
-                            model = Prophet(interval_width=interval_width, uncertainty_samples=1000, mcmc_samples=300)
-                        else:
-                            model = Prophet(interval_width=interval_width)
-                            
-                        # Add covariates to model
-                        if covariate_columns:
-                            for col in covariate_columns:
-                                model.add_regressor(col)
-    
-                        try:
-                            model.fit(group_data[['ds', 'y'] + covariate_columns])
-                            
-                            # 修改: 直接使用预测结束日期来创建future dataframe
-                            future_end_date = pd.to_datetime(end_date_str)
-                            # 创建从训练数据开始到预测结束日期的完整日期范围，使用动态频率
-                            future_dates = pd.date_range(start=group_data['ds'].min(), end=future_end_date, freq=forecast_freq)
-                            future = pd.DataFrame({'ds': future_dates})
-                            
-                            # Add covariate values to future dataframe for prediction
-                            if covariate_columns:
-                                for col in covariate_columns:
-                                    # Get all values for this group and covariate
-                                    historical_values = df_copy[(df_copy['group'] == group) & 
-                                                              (df_copy['date'].isin(future_dates))][col].values
-                                    
-                                    # Create DataFrame with future dates and corresponding covariate values
-                                    covariate_df = pd.DataFrame({
-                                        'ds': future_dates[:len(historical_values)],
-                                        col: historical_values
-                                    })
-                                    
-                                    # For dates beyond historical data, use the group mean
-                                    if len(future_dates) > len(historical_values):
-                                        remaining_dates = future_dates[len(historical_values):]
-                                        remaining_values = np.full(len(remaining_dates), 
-                                                                  covariate_means.get((group, col), 0))
-                                        
-                                        remaining_df = pd.DataFrame({
-                                            'ds': remaining_dates,
-                                            col: remaining_values
-                                        })
-                                        
-                                        covariate_df = pd.concat([covariate_df, remaining_df])
-                                    
-                                    # Merge with future DataFrame
-                                    future = pd.merge(future, covariate_df, on='ds', how='left')
-                            
-                            # Make forecast
-                            forecast = model.predict(future)
-                            
-                            forecasts[group] = forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']]
-                        except Exception as e:
-                            st.warning(f"Could not forecast for group {group}: {str(e)}")
+                        def update_backtest_progress(done, total, group):
+                            progress_bar.progress(int(40 + done / total * 25))
+                        
+                        backtest_scores = backtester.run(base_panel, base_groups, start_date_str,
+                                                         training_end_date_str, target_column,
+                                                         progress_callback=update_backtest_progress)
+                        for model, reason in backtester.skipped.items():
+                            st.warning(f"Backtest of {model}: {reason}")
+                        model_selection = backtester.select(backtest_scores)
+                        backtest_scores = backtest_scores.add_suffix(f"_{backtester.metric}")
+                        backtest_scores.insert(0, 'model', model_selection)
+                        st.session_state.backtest_scores = backtest_scores.reset_index()
+                        
+                        def update_progress(done, total, group):
+                            progress_bar.progress(int(65 + done / total * 25))
+                        
+                        st.info("Running forecasts with the selected model for each group...")
+                        forecasts, forecast_errors = forecast_selected(
+                            base_panel, base_groups, model_selection, start_date_str, training_end_date_str,
+                            end_date_str, forecast_freq, target_column, covariate_columns, covariate_means,
+                            interval_width, use_advanced_model, FORECAST_GROUP_TIMEOUT, update_progress,
+                            store=st.session_state.model_store, deadline=backtester.deadline,
+                            fallback=backtester.fastest_model())
+                    else:
+                        # 基线模型以矩阵运算一次拟合所有分组
+                        st.info(f"Running {forecast_model} forecasts for all groups...")
+                        forecasts, forecast_errors = forecast_baseline(
+                            base_panel, base_groups, start_date_str, training_end_date_str, end_date_str,
+                            forecast_freq, target_column, BASELINE_MODELS[forecast_model], covariate_columns,
+                            interval_width)
+                    for group in all_groups:
+                        if group in forecast_errors:
+                            st.warning(f"Could not forecast for group {group}: {forecast_errors[group]}")
                             # Create empty forecast data for this group
                             forecasts[group] = pd.DataFrame({
                                 'ds': all_dates,
@@ -1581,56 +1659,51 @@ def setup_sales_forecasting():
                     
                     progress_bar.progress(90)
                     
-                    # Write forecasts back to the dataframe using direct array assignment
+                    if hierarchy is not None:
+                        # 一次线性代数运算调和所有层级的预测，汇总节点等于其分组之和
+                        st.info(f"Reconciling forecasts across the hierarchy ({reconciliation_method})...")
+                        node_history = base_panel.pivot_table(index='group', columns='date', values=target_column,
+                                                              aggfunc='sum')
+                        training_dates = all_dates[(all_dates >= start_date_str) & (all_dates <= training_end_date_str)]
+                        forecasts = reconcile_forecasts(hierarchy, forecasts, node_history, training_dates,
+                                                        reconciliation_method)
+                        hierarchy_df = write_forecasts(
+                            aggregate_panel, {node: forecasts[node] for node in hierarchy.aggregate_nodes})
+                        hierarchy_df.insert(1, 'level', hierarchy_df['group'].map(
+                            hierarchy.nodes.set_index('node')['level']))
+                        forecasts = {group: forecasts[group] for group in all_groups}
+                    
+                    # Write forecasts back to the dataframe by (group, date)
                     st.info("Combining results...")
-                    for group, forecast in forecasts.items():
-                        # Use date matching approach instead of direct array assignment
-                        for i, row in forecast.iterrows():
-                            forecast_date = row['ds']
-                            # Match both group and date
-                            mask = (df_copy['group'] == group) & (df_copy['date'] == forecast_date)
-                            # Assign forecast values
-                            df_copy.loc[mask, 'forecast'] = row['yhat']
-                            df_copy.loc[mask, 'forecast_lower'] = row['yhat_lower']
-                            df_copy.loc[mask, 'forecast_upper'] = row['yhat_upper']
+                    df_copy = write_forecasts(df_copy, forecasts)
+                    if forecast_model == AUTO_MODEL:
+                        # 每个分组选择的模型与预测结果一起导出
+                        df_copy['model'] = df_copy['group'].map(model_selection)
                     
                     # Format dates in the original date column according to the selected format
                     # This preserves the original date format while extending to future dates
                     df_copy[date_column] = df_copy['date'].dt.strftime(date_format)
                     
-                    # Calculate prediction accuracy percentages for each group
-                    for group in all_groups:
-                        # Training period accuracy (Training Start Date to Training End Date)
-                        training_data = df_copy[(df_copy['group'] == group) & 
-                                              (df_copy['date'] >= start_date_str) & 
-                                              (df_copy['date'] <= training_end_date_str)]
-                        
-                        if not training_data.empty and training_data[target_column].sum() > 0:
-                            actual = training_data[target_column].values
-                            pred = training_data['forecast'].values
-                            # Calculate percentage error: (pred - actual) / actual
-                            pct_errors = np.where(actual > 0, (pred - actual) / actual, np.nan)
-                            # Calculate MAPE (Mean Absolute Percentage Error)
-                            mean_pct_error = np.nanmean(pct_errors) * 100
-                            training_accuracy[group] = mean_pct_error
-                        else:
-                            training_accuracy[group] = np.nan
-                        
-                        # Validation period accuracy (Training End Date to current date)
-                        validation_data = df_copy[(df_copy['group'] == group) & 
-                                                (df_copy['date'] > training_end_date_str) & 
-                                                (df_copy['date'] <= current_date_str)]
-                        
-                        if not validation_data.empty and validation_data[target_column].sum() > 0:
-                            actual = validation_data[target_column].values
-                            pred = validation_data['forecast'].values
-                            # Calculate percentage error: (pred - actual) / actual
-                            pct_errors = np.where(actual > 0, (pred - actual) / actual, np.nan)
-                            # Calculate MAPE
-                            mean_pct_error = np.nanmean(pct_errors) * 100
-                            validation_accuracy[group] = mean_pct_error
-                        else:
-                            validation_accuracy[group] = np.nan
+                    # Calculate prediction accuracy for all groups and the overall series in one pass
+                    # 训练期：训练开始日期到训练结束日期；验证期：训练结束日期之后到当前日期
+                    accuracy_periods = {
+                        'training': (df_copy['date'] >= start_date_str) & (df_copy['date'] <= training_end_date_str),
+                        'validation': (df_copy['date'] > training_end_date_str) & (df_copy['date'] <= current_date_str)
+                    }
+                    forecast_accuracy = forecast_metrics(df_copy, target_column, accuracy_periods)
+                    # 页面显示的准确度与原来相同，为平均百分比误差
+                    training_accuracy = metric_by_group(forecast_accuracy, 'training', 'mpe')
+                    validation_accuracy = metric_by_group(forecast_accuracy, 'validation', 'mpe')
+                    st.session_state.forecast_accuracy = forecast_accuracy
+                    if hierarchy is not None:
+                        # 汇总层级（总计和中间层级）的预测及其准确度
+                        hierarchy_periods = {
+                            'training': (hierarchy_df['date'] >= start_date_str) & (hierarchy_df['date'] <= training_end_date_str),
+                            'validation': (hierarchy_df['date'] > training_end_date_str) & (hierarchy_df['date'] <= current_date_str)
+                        }
+                        st.session_state.hierarchy_accuracy = forecast_metrics(hierarchy_df, target_column,
+                                                                               hierarchy_periods, overall=False)
+                        st.session_state.hierarchy_df = hierarchy_df
                     
                     # Store accuracy metrics in session state
                     st.session_state.training_accuracy = training_accuracy
@@ -1668,13 +1741,40 @@ def setup_sales_forecasting():
                 
                 # Excel download with custom filename
                 buffer = io.BytesIO()
-                st.session_state.forecast_df.to_excel(buffer, index=False)
+                if st.session_state.backtest_scores is not None:
+                    # 自动选择模型时，回测分数作为第二个工作表
+                    with pd.ExcelWriter(buffer) as writer:
+                        st.session_state.forecast_df.to_excel(writer, sheet_name='Sheet1', index=False)
+                        st.session_state.backtest_scores.to_excel(writer, sheet_name='Backtest', index=False)
+                else:
+                    st.session_state.forecast_df.to_excel(buffer, index=False)
                 buffer.seek(0)
                 b64_excel = base64.b64encode(buffer.read()).decode()
                 excel_filename = f"{filename_base}_forecast.xlsx"
                 href_excel = f'<a href="data:application/vnd.openxmlformats-officedocument.spreadsheetml.sheet;base64,{b64_excel}" download="{excel_filename}">Download Excel File</a>'
                 st.markdown(href_excel, unsafe_allow_html=True)
                 
+                if st.session_state.backtest_scores is not None:
+                    with st.expander("Backtest Scores and Selected Model per Group"):
+                        st.dataframe(st.session_state.backtest_scores.round(3))
+                    backtest_csv = st.session_state.backtest_scores.to_csv(index=False)
+                    b64_backtest = base64.b64encode(backtest_csv.encode()).decode()
+                    backtest_filename = f"{filename_base}_backtest.csv"
+                    href_backtest = f'<a href="data:file/csv;base64,{b64_backtest}" download="{backtest_filename}">Download Backtest Scores</a>'
+                    st.markdown(href_backtest, unsafe_allow_html=True)
+                
+                if st.session_state.hierarchy_df is not None:
+                    with st.expander("Hierarchy Forecasts (Total and Intermediate Levels)"):
+                        st.caption("Reconciled forecasts: every level equals the sum of the groups below it")
+                        st.dataframe(st.session_state.hierarchy_df)
+                        if st.session_state.hierarchy_accuracy is not None:
+                            st.dataframe(st.session_state.hierarchy_accuracy.round(3))
+                    hierarchy_csv = st.session_state.hierarchy_df.to_csv(index=False)
+                    b64_hierarchy = base64.b64encode(hierarchy_csv.encode()).decode()
+                    hierarchy_filename = f"{filename_base}_hierarchy_forecast.csv"
+                    href_hierarchy = f'<a href="data:file/csv;base64,{b64_hierarchy}" download="{hierarchy_filename}">Download Hierarchy Forecasts</a>'
+                    st.markdown(href_hierarchy, unsafe_allow_html=True)
+                
                 # Visualization section
                 st.subheader("Forecast Visualizations")
                 
@@ -1756,6 +1856,13 @@ def setup_sales_forecasting():
                 
                 st.plotly_chart(fig, use_container_width=True)
                 
+                # 所有分组和整体序列的准确度指标
+                if st.session_state.forecast_accuracy is not None:
+                    with st.expander("Forecast Accuracy Metrics (all groups)"):
+                        st.caption("MPE/MAPE/sMAPE/WAPE/coverage in %, bias in target units, "
+                                   "MASE relative to a naive forecast over the training period")
+                        st.dataframe(st.session_state.forecast_accuracy.round(3))
+                
                 # Add option to view overall forecast (sum of all groups)
                 if st.checkbox("View Overall Forecast (Sum of All Groups)"):
                     # Group by date and sum the values
@@ -1769,46 +1876,9 @@ def setup_sales_forecasting():
                     # 修改: 确保使用排序后的数据来创建图表，避免confidence interval的显示问题
                     overall_data = overall_data.sort_values('date')
                     
-                    # Calculate overall accuracy metrics
-                    # Convert dates to datetime for comparison
-                    overall_data['date_dt'] = pd.to_datetime(overall_data['date'])
-                    
-                    # Use stored date strings from session state
-                    start_date_str = st.session_state.start_date_str
-                    training_end_date_str = st.session_state.training_end_date_str
-                    
-                    # Convert to datetime objects for comparison
-                    start_date_dt = pd.to_datetime(start_date_str)
-                    training_end_date_dt = pd.to_datetime(training_end_date_str)
-                    current_date_dt = pd.to_datetime(current_date.strftime("%Y-%m-%d"))
-                    
-                    # Training period accuracy (Training Start Date to Training End Date)
-                    training_overall = overall_data[(overall_data['date_dt'] >= start_date_dt) & 
-                                                  (overall_data['date_dt'] <= training_end_date_dt)]
-                    
-                    if not training_overall.empty and training_overall[st.session_state.target_column].sum() > 0:
-                        actual = training_overall[st.session_state.target_column].values
-                        pred = training_overall['forecast'].values
-                        # Calculate percentage error: (pred - actual) / actual
-                        pct_errors = np.where(actual > 0, (pred - actual) / actual, np.nan)
-                        # Calculate MAPE
-                        overall_training_acc = np.nanmean(pct_errors) * 100
-                    else:
-                        overall_training_acc = np.nan
-                    
-                    # Validation period accuracy (Training End Date to current date)
-                    validation_overall = overall_data[(overall_data['date_dt'] > training_end_date_dt) & 
-                                                    (overall_data['date_dt'] <= current_date_dt)]
-                    
-                    if not validation_overall.empty and validation_overall[st.session_state.target_column].sum() > 0:
-                        actual = validation_overall[st.session_state.target_column].values
-                        pred = validation_overall['forecast'].values
-                        # Calculate percentage error: (pred - actual) / actual
-                        pct_errors = np.where(actual > 0, (pred - actual) / actual, np.nan)
-                        # Calculate MAPE
-                        overall_validation_acc = np.nanmean(pct_errors) * 100
-                    else:
-                        overall_validation_acc = np.nan
+                    # Overall accuracy metrics were computed together with the groups
+                    overall_training_acc = overall_metric(st.session_state.forecast_accuracy, 'training', 'mpe')
+                    overall_validation_acc = overall_metric(st.session_state.forecast_accuracy, 'validation', 'mpe')
                     
                     # Format overall accuracy metrics for display
                     overall_training_acc_text = f"Training Accuracy: {overall_training_acc:.2f}%" if not np.isnan(overall_training_acc) else "Training Accuracy: N/A"
@@ -1886,6 +1956,10 @@ def setup_sales_forecasting():
                 st.session_state.original_filename = None
                 st.session_state.training_accuracy = {}
                 st.session_state.validation_accuracy = {}
+                st.session_state.forecast_accuracy = None
+                st.session_state.backtest_scores = None
+                st.session_state.hierarchy_df = None
+                st.session_state.hierarchy_accuracy = None
                 st.session_state.start_date_str = None
                 st.session_state.training_end_date_str = None
                 # Use Streamlit's rerun function instead of experimental_rerun
@@ -1977,10 +2051,9 @@ def setup_clustering_analysis():
     if uploaded_file is not None:
         # 读取数据
         try:
-            if uploaded_file.name.endswith('.csv'):
-                df = pd.read_csv(uploaded_file)
-            else:
-                df = pd.read_excel(uploaded_file)
+            if "ingestion_cache" not in st.session_state:
+                st.session_state.ingestion_cache = IngestionCache()
+            df = load_table(uploaded_file, cache=st.session_state.ingestion_cache)
             
             st.success("文件上传成功!")
             
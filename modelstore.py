@@ -0,0 +1,59 @@
+#modelstore.py
+import os
+
+from fingerprint import combine_fingerprints, frame_fingerprint
+from profilecache import ProfileCache
+
+# 序列化格式或模型设置发生变化时递增，使旧模型失效
+MODEL_STORE_VERSION = 1
+
+DEFAULT_STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'models')
+
+
+def model_key(model_name, history, **hyperparameters):
+    """
+    模型的缓存键：模型名称、训练数据（列名和内容）和影响拟合结果的超参数。
+    预测期和预测区间宽度只在预测时使用，不参与计算，改变它们时可以直接复用已拟合的模型。
+
+    参数:
+    model_name (str): 模型名称，如'prophet'
+    history (pandas.DataFrame): 分组的训练数据
+    hyperparameters: 影响拟合的参数
+    """
+    return combine_fingerprints([MODEL_STORE_VERSION, model_name, frame_fingerprint(history),
+                                 sorted(hyperparameters.items())])
+
+
+def serialize_model(model):
+    """Prophet模型用官方的JSON序列化（不依赖对象的内部结构），其他模型直接pickle"""
+    if type(model).__name__ == 'Prophet':
+        from prophet.serialize import model_to_json
+        return {'format': 'prophet-json', 'payload': model_to_json(model)}
+    return {'format': 'pickle', 'payload': model}
+
+
+def deserialize_model(entry):
+    if entry['format'] == 'prophet-json':
+        from prophet.serialize import model_from_json
+        return model_from_json(entry['payload'])
+    return entry['payload']
+
+
+class ModelStore(ProfileCache):
+    """
+    磁盘上的已拟合模型存储（LRU），键见model_key。
+    条目是serialize_model的结果，可以直接在进程之间传递，由工作进程反序列化。
+    """
+
+    NAME = 'model store'
+
+    def __init__(self, directory=DEFAULT_STORE_DIR, max_entries=20000, max_bytes=2 * 1024 ** 3, evict_every=100):
+        """
+        参数:
+        directory (str): 存储目录
+        max_entries (int): 最多保留的模型个数
+        max_bytes (int): 占用磁盘空间的上限（字节）。Prophet的JSON包含训练数据（使用MCMC时还有后验样本），
+                         只限制个数时占用的空间没有上界
+        evict_every (int): 每写入多少个模型重新扫描一次目录，见ProfileCache
+        """
+        super().__init__(directory, max_entries, max_bytes=max_bytes, evict_every=evict_every)
@@ -0,0 +1,159 @@
+#profilecache.py
+import os
+import pickle
+import tempfile
+
+# 列描述的格式发生变化时递增，使旧缓存失效
+PROFILE_CACHE_VERSION = 2
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'profiles')
+
+
+class ProfileCache:
+    """
+    磁盘上按内容寻址的列描述缓存（LRU）。
+    每个条目是一个文件，最近使用时间记录在文件的修改时间中，超过max_entries（或max_bytes）时删除最久未使用的条目。
+    写入时按文件大小累计用量，只在超过上限或每evict_every次写入时扫描目录，一次删除到上限的EVICT_TO。
+    """
+
+    # 条目文件的扩展名，子类可以使用其他序列化格式
+    SUFFIXES = ('.pkl',)
+    # 日志中的名称
+    NAME = 'profile cache'
+    # 超过上限时删除到上限的该比例，之后的多次写入都不必再清理
+    EVICT_TO = 0.9
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_entries=5000, max_bytes=None, evict_every=100):
+        """
+        参数:
+        directory (str): 缓存目录
+        max_entries (int): 最多保留的条目数
+        max_bytes (int): 占用磁盘空间的上限（字节），None表示不限制
+        evict_every (int): 每写入多少个条目重新扫描一次目录（同步其他进程的写入和删除）；
+                           两次扫描之间按写入的文件大小累计用量，超过上限时立即清理
+        """
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.evict_every = evict_every
+        # (条目数, 字节数)：最近一次扫描的结果加上之后写入的文件，None表示尚未扫描
+        self._usage = None
+        self._writes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key, suffix='.pkl'):
+        return os.path.join(self.directory, f"{key}{suffix}")
+
+    def _dump(self, entry, f):
+        """把条目写入打开的文件f，返回使用的扩展名（SUFFIXES之一）；子类覆盖以使用其他序列化格式"""
+        pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return '.pkl'
+
+    def _load(self, f, suffix):
+        """从扩展名为suffix的条目文件f读取条目"""
+        return pickle.load(f)
+
+    def get(self, key):
+        for suffix in self.SUFFIXES:
+            path = self._path(key, suffix)
+            try:
+                with open(path, 'rb') as f:
+                    entry = self._load(f, suffix)
+            except FileNotFoundError:
+                continue
+            except Exception as e:
+                # 损坏或不兼容的条目视为未命中
+                print(f"Discarding unreadable {self.NAME} entry {key}: {str(e)}")
+                self.discard(key)
+                return None
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            return entry
+        return None
+
+    def put(self, key, entry):
+        self._added(self._write(key, entry))
+
+    def _write(self, key, entry):
+        """写入条目文件并返回其路径"""
+        # 先写临时文件再替换，避免并发读取到写了一半的条目
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                suffix = self._dump(entry, f)
+            path = self._path(key, suffix)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return path
+
+    def discard(self, key):
+        for suffix in self.SUFFIXES:
+            try:
+                os.remove(self._path(key, suffix))
+            except FileNotFoundError:
+                pass
+
+    def _added(self, path):
+        """记录新写入的条目，用量超过上限或到了定期扫描的时候清理"""
+        self._writes += 1
+        if self._usage is not None:
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                size = 0
+            self._usage = (self._usage[0] + 1, self._usage[1] + size)
+        if self._usage is None or self._writes >= self.evict_every or self._over(*self._usage):
+            self._evict()
+
+    def _over(self, count, size):
+        return count > self.max_entries or (self.max_bytes is not None and size > self.max_bytes)
+
+    def _entries(self):
+        """(修改时间, 路径, 字节数)"""
+        entries = []
+        with os.scandir(self.directory) as it:
+            for item in it:
+                if item.name.endswith(self.SUFFIXES):
+                    try:
+                        stat = item.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, item.path, stat.st_size))
+        return entries
+
+    def _evict(self):
+        """扫描目录，条目数或字节数超过上限时按最久未使用的顺序删除到上限的EVICT_TO"""
+        entries = self._entries()
+        count, size = len(entries), sum(entry[2] for entry in entries)
+        if self._over(count, size):
+            max_count = int(self.max_entries * self.EVICT_TO)
+            max_size = int(self.max_bytes * self.EVICT_TO) if self.max_bytes is not None else None
+            entries.sort()
+            for _, path, nbytes in entries:
+                if count <= max_count and (max_size is None or size <= max_size):
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                count -= 1
+                size -= nbytes
+        self._usage = (count, size)
+        self._writes = 0
+
+    def clear(self):
+        for _, path, _ in self._entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self._usage = (0, 0)
+        self._writes = 0
+
+    def __len__(self):
+        return len(self._entries())
@@ -0,0 +1,121 @@
+#profiler.py
+import numpy as np
+import pandas as pd
+
+
+def _float_block(data, columns):
+    """将若干列转换为 (列数, 行数) 的float64数组（每列在内存中连续），缺失值为NaN"""
+    block = np.empty((len(columns), len(data)), dtype=np.float64)
+    for j, col in enumerate(columns):
+        # 可空整数等扩展类型需要显式指定缺失值
+        block[j] = data[col].to_numpy(dtype=np.float64, na_value=np.nan)
+    return block
+
+
+def _quantile(sorted_block, counts, q):
+    """对排序后（NaN在末尾）的各列按pandas的线性插值计算分位数"""
+    pos = (counts - 1) * q
+    low = np.floor(pos).astype(np.int64)
+    high = np.ceil(pos).astype(np.int64)
+    rows = np.arange(sorted_block.shape[0])
+    low_values = sorted_block[rows, low]
+    high_values = sorted_block[rows, high]
+    return low_values + (high_values - low_values) * (pos - low)
+
+
+def _profile_block(block):
+    """
+    对一个二维数组（每行一列数据）一次性计算描述统计：
+    一次排序得到最值和分位数，中心矩按列批量计算，离群值边界由四分位数得出
+    """
+    counts = np.sum(~np.isnan(block), axis=1)
+    block.sort(axis=1)
+    sorted_block = block
+
+    q1 = _quantile(sorted_block, counts, 0.25)
+    median = _quantile(sorted_block, counts, 0.5)
+    q3 = _quantile(sorted_block, counts, 0.75)
+    rows = np.arange(sorted_block.shape[0])
+    minimum = sorted_block[:, 0].copy()
+    maximum = sorted_block[rows, counts - 1]
+
+    iqr = q3 - q1
+    lower_bound = q1 - 1.5 * iqr
+    upper_bound = q3 + 1.5 * iqr
+    # 排序后的列中离群值位于两端，二分查找即可计数
+    outlier_counts = np.array([
+        np.searchsorted(sorted_block[j, :counts[j]], lower_bound[j], side='left')
+        + counts[j] - np.searchsorted(sorted_block[j, :counts[j]], upper_bound[j], side='right')
+        for j in range(len(counts))
+    ], dtype=np.int64)
+
+    # 排序后缺失值位于每行末尾，原地中心化并将缺失位置置零，避免nansum的额外拷贝
+    missing = None
+    if (counts < sorted_block.shape[1]).any():
+        missing = np.arange(sorted_block.shape[1]) >= counts[:, None]
+    if missing is not None:
+        sorted_block[missing] = 0.0
+    mean = sorted_block.sum(axis=1) / counts
+    centered = sorted_block
+    centered -= mean[:, None]
+    if missing is not None:
+        centered[missing] = 0.0
+    squared = centered * centered
+    m2 = squared.sum(axis=1)
+    m3 = np.einsum('ij,ij->i', squared, centered)
+    m4 = np.einsum('ij,ij->i', squared, squared)
+    del squared
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variance = np.where(counts > 1, m2 / (counts - 1), np.nan)
+        # 与scipy.stats.skew/kurtosis的默认参数（有偏估计、Fisher峰度）一致
+        skewness = np.where(m2 > 0, (m3 / counts) / (m2 / counts) ** 1.5, np.nan)
+        kurtosis = np.where(m2 > 0, (m4 / counts) / (m2 / counts) ** 2 - 3, np.nan)
+
+    return {
+        'count': counts, 'min': minimum, 'max': maximum, 'mean': mean, 'median': median,
+        'std': np.sqrt(variance), 'variance': variance, 'q1': q1, 'q3': q3, 'iqr': iqr,
+        'skewness': skewness, 'kurtosis': kurtosis, 'lower_bound': lower_bound,
+        'upper_bound': upper_bound, 'outlier_count': outlier_counts
+    }
+
+
+def profile_continuous(data, columns=None, max_block_elements=20_000_000):
+    """
+    批量计算连续变量的描述统计。相同dtype的列组成二维数组，按列块整体计算，
+    每个列块只做一次排序和一组向量化的矩计算。
+
+    参数:
+    data (pandas.DataFrame): 数据
+    columns (list): 需要分析的数值列，默认所有数值列
+    max_block_elements (int): 每个列块的最大元素数，用于限制内存占用
+
+    返回:
+    dict: 列名 -> 统计量字典（count, min, max, mean, median, std, variance, q1, q3, iqr,
+          skewness, kurtosis, lower_bound, upper_bound, outlier_count）；全部缺失的列不返回
+    """
+    if columns is None:
+        columns = [col for col in data.columns
+                   if pd.api.types.is_numeric_dtype(data[col]) and not pd.api.types.is_bool_dtype(data[col])]
+
+    groups = {}
+    for col in columns:
+        groups.setdefault(str(data[col].dtype), []).append(col)
+
+    n_rows = max(len(data), 1)
+    block_width = max(1, max_block_elements // n_rows)
+    profiles = {}
+    for group in groups.values():
+        for start in range(0, len(group), block_width):
+            block_columns = group[start:start + block_width]
+            block = _float_block(data, block_columns)
+            present = np.sum(~np.isnan(block), axis=1) > 0
+            if not present.all():
+                block = block[present]
+                block_columns = [col for col, keep in zip(block_columns, present) if keep]
+            if not block_columns:
+                continue
+            result = _profile_block(block)
+            for j, col in enumerate(block_columns):
+                profiles[col] = {name: values[j].item() for name, values in result.items()}
+    return profiles
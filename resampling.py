@@ -0,0 +1,335 @@
+#resampling.py
+import hashlib
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+# Wilson区间的z值（99%），用于提前停止的判断
+_EARLY_STOP_Z = 2.576
+
+
+class ResamplingEngine:
+    def __init__(self, n_permutations=2000, n_bootstrap=1000, batch_size=100,
+                 alpha=0.05, confidence_level=0.95, seed=42, n_jobs=1,
+                 early_stopping=True, max_batch_elements=20_000_000):
+        """
+        基于置换检验和自助法的显著性引擎。
+
+        Parameters:
+        n_permutations (int): 每条边最多的置换次数
+        n_bootstrap (int): 每条边最多的自助抽样次数
+        batch_size (int): 每批同时计算的重抽样次数（按数据量自动缩小）
+        alpha (float): 显著性水平，用于提前停止的判断
+        confidence_level (float): 自助法置信区间的置信水平
+        seed (int): 随机种子，同一条边在相同种子下结果可复现
+        n_jobs (int): 并行处理边的进程数
+        early_stopping (bool): 结论已明确时提前停止重抽样
+        max_batch_elements (int): 单批索引矩阵允许的最大元素数，用于控制内存
+        """
+        self.n_permutations = n_permutations
+        self.n_bootstrap = n_bootstrap
+        self.batch_size = batch_size
+        self.alpha = alpha
+        self.confidence_level = confidence_level
+        self.seed = seed
+        self.n_jobs = n_jobs
+        self.early_stopping = early_stopping
+        self.max_batch_elements = max_batch_elements
+
+    def config_key(self):
+        """影响结果的参数，作为分析缓存键的一部分"""
+        return ('resampling', self.n_permutations, self.n_bootstrap, self.batch_size,
+                self.alpha, self.confidence_level, self.seed, self.early_stopping)
+
+    def _settings(self):
+        return {
+            'n_permutations': self.n_permutations,
+            'n_bootstrap': self.n_bootstrap,
+            'batch_size': self.batch_size,
+            'alpha': self.alpha,
+            'confidence_level': self.confidence_level,
+            'early_stopping': self.early_stopping,
+            'max_batch_elements': self.max_batch_elements
+        }
+
+    def _seed_for(self, key):
+        # 种子由引擎种子和边本身决定，与边的顺序、并行方式无关
+        digest = hashlib.blake2b(repr(key).encode(), digest_size=8).digest()
+        return np.random.SeedSequence([self.seed, int.from_bytes(digest, 'little')])
+
+    def evaluate(self, tasks):
+        """
+        对一组重抽样任务进行计算。
+
+        Parameters:
+        tasks (list): (key, kind, arrays) 元组列表，kind为'linear'、'anova'或'chi2'
+
+        Returns:
+        dict: key -> 重抽样结果
+        """
+        settings = self._settings()
+        jobs = [(kind, arrays, self._seed_for(key), settings) for key, kind, arrays in tasks]
+        if self.n_jobs is not None and self.n_jobs > 1 and len(jobs) > 1:
+            with ProcessPoolExecutor(max_workers=self.n_jobs) as executor:
+                results = list(executor.map(_run_job, jobs))
+        else:
+            results = [_run_job(job) for job in jobs]
+        return {key: result for (key, _, _), result in zip(tasks, results)}
+
+
+def _run_job(job):
+    kind, arrays, seed_seq, settings = job
+    try:
+        return run_resampling(kind, arrays, seed_seq, **settings)
+    except Exception as e:
+        return {'error': f"Resampling failed: {str(e)}"}
+
+
+def run_resampling(kind, arrays, seed_seq, n_permutations=2000, n_bootstrap=1000,
+                   batch_size=100, alpha=0.05, confidence_level=0.95,
+                   early_stopping=True, max_batch_elements=20_000_000):
+    """对单条边进行批量化的置换检验和自助法计算"""
+    rng = np.random.default_rng(seed_seq)
+    if kind == 'linear':
+        statistic = _LinearStatistic(arrays['X'], arrays['T'], arrays.get('names'))
+    elif kind == 'anova':
+        statistic = _AnovaStatistic(arrays['groups'], arrays['y'])
+    elif kind == 'chi2':
+        statistic = _ChiSquareStatistic(arrays['a'], arrays['b'])
+    else:
+        raise ValueError(f"Unknown resampling kind: {kind}")
+
+    n = statistic.n
+    # 按数据量限制每批的重抽样次数，避免(批次 x 样本)索引矩阵过大
+    batch = max(1, min(batch_size, max_batch_elements // max(n * statistic.width, 1)))
+    observed = statistic.observed()
+    main_metric = statistic.main_metric
+    observed_value = observed[main_metric]
+
+    # 置换检验
+    exceed = 0
+    done = 0
+    perm_stopped_early = False
+    base = np.broadcast_to(np.arange(n), (batch, n))
+    while done < n_permutations:
+        size = min(batch, n_permutations - done)
+        perm = rng.permuted(base[:size], axis=1)
+        values = statistic.permuted(perm)
+        exceed += int(np.sum(values >= observed_value - 1e-12 * abs(observed_value)))
+        done += size
+        if early_stopping and done < n_permutations and _is_decided(exceed, done, alpha):
+            perm_stopped_early = True
+            break
+    p_value = (exceed + 1) / (done + 1)
+
+    # 自助法置信区间
+    tail = (1 - confidence_level) / 2 * 100
+    samples = {name: [] for name in observed}
+    boot_done = 0
+    boot_stopped_early = False
+    previous_ci = None
+    while boot_done < n_bootstrap:
+        size = min(batch, n_bootstrap - boot_done)
+        idx = rng.integers(0, n, size=(size, n))
+        for name, values in statistic.bootstrap(idx).items():
+            samples[name].append(values)
+        boot_done += size
+        main_samples = np.concatenate(samples[main_metric])
+        main_samples = main_samples[np.isfinite(main_samples)]
+        if early_stopping and boot_done >= 2 * batch and len(main_samples) > 0:
+            ci = np.percentile(main_samples, [tail, 100 - tail])
+            width = ci[1] - ci[0]
+            if previous_ci is not None and np.all(np.abs(ci - previous_ci) <= 0.02 * max(width, 1e-12)):
+                boot_stopped_early = boot_done < n_bootstrap
+                break
+            previous_ci = ci
+
+    bootstrap_ci = {}
+    for name, chunks in samples.items():
+        values = np.concatenate(chunks) if chunks else np.array([])
+        values = values[np.isfinite(values)]
+        if len(values) > 0:
+            low, high = np.percentile(values, [tail, 100 - tail])
+            bootstrap_ci[name] = (float(low), float(high))
+        else:
+            bootstrap_ci[name] = (None, None)
+
+    return {
+        'statistic': main_metric,
+        'observed': {name: float(value) for name, value in observed.items()},
+        'permutation_p_value': float(p_value),
+        'n_permutations': int(done),
+        'permutation_stopped_early': perm_stopped_early,
+        'bootstrap_ci': bootstrap_ci,
+        'n_bootstrap': int(boot_done),
+        'bootstrap_stopped_early': boot_stopped_early,
+        'confidence_level': confidence_level
+    }
+
+
+def _is_decided(exceed, done, alpha):
+    """p值的Wilson置信区间完全落在alpha一侧时认为结论已明确"""
+    p_hat = exceed / done
+    z2 = _EARLY_STOP_Z ** 2
+    center = (p_hat + z2 / (2 * done)) / (1 + z2 / done)
+    half = _EARLY_STOP_Z * np.sqrt(p_hat * (1 - p_hat) / done + z2 / (4 * done ** 2)) / (1 + z2 / done)
+    return center - half > alpha or center + half < alpha
+
+
+def _row_bincount(codes, n_bins, weights=None):
+    """对(批次 x 样本)的编码矩阵逐行计数，返回(批次 x n_bins)"""
+    rows = codes.shape[0]
+    offsets = (np.arange(rows) * n_bins)[:, None]
+    flat = (codes + offsets).ravel()
+    counts = np.bincount(flat, weights=None if weights is None else weights.ravel(),
+                         minlength=rows * n_bins)
+    return counts.reshape(rows, n_bins)
+
+
+class _LinearStatistic:
+    """线性模型（含多元/分类目标）的R²和系数"""
+    main_metric = 'r2'
+
+    def __init__(self, X, T, names=None):
+        X = np.asarray(X, dtype=float)
+        T = np.asarray(T, dtype=float)
+        if X.ndim == 1:
+            X = X[:, None]
+        if T.ndim == 1:
+            T = T[:, None]
+        self.X = X
+        self.T = T
+        self.n, self.p = X.shape
+        self.m = T.shape[1]
+        self.width = 1 + self.p + self.m
+        self.names = list(names) if names is not None else [f"x{i}" for i in range(self.p)]
+        self.Z = np.hstack([np.ones((self.n, 1)), X, T])
+        # 置换只改变X与T的交叉项，X的协方差及其逆可预先计算
+        self.Xc = X - X.mean(axis=0)
+        cxx = self.Xc.T @ self.Xc / self.n
+        self.cxx_inv = np.linalg.pinv(cxx)
+        tc = T - T.mean(axis=0)
+        self.total = float(np.sum(tc * tc) / self.n)
+
+    def _from_moments(self, M):
+        nw = M[:, 0, 0]
+        mean = M[:, 0, 1:] / nw[:, None]
+        C = M[:, 1:, 1:] / nw[:, None, None] - mean[:, :, None] * mean[:, None, :]
+        p = self.p
+        cxx = C[:, :p, :p]
+        cxt = C[:, :p, p:]
+        ctt = C[:, p:, p:]
+        beta = np.matmul(np.linalg.pinv(cxx), cxt)
+        explained = np.einsum('bpm,bpm->b', cxt, beta)
+        total = np.trace(ctt, axis1=1, axis2=2)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r2 = np.where(total > 0, explained / total, np.nan)
+        result = {'r2': r2}
+        if self.m == 1:
+            for i, name in enumerate(self.names):
+                result[f"coef[{name}]"] = beta[:, i, 0]
+        return result
+
+    def _moments(self, weights):
+        weighted = weights[:, :, None] * self.Z[None, :, :]
+        return np.matmul(weighted.transpose(0, 2, 1), self.Z)
+
+    def observed(self):
+        values = self._from_moments(self._moments(np.ones((1, self.n))))
+        return {name: v[0] for name, v in values.items()}
+
+    def permuted(self, perm):
+        explained = np.zeros(perm.shape[0])
+        for j in range(self.m):
+            cxt = self.T[:, j][perm] @ self.Xc / self.n
+            explained += np.einsum('bp,pq,bq->b', cxt, self.cxx_inv, cxt)
+        return explained / self.total if self.total > 0 else np.full(perm.shape[0], np.nan)
+
+    def bootstrap(self, idx):
+        weights = _row_bincount(idx, self.n).astype(float)
+        return self._from_moments(self._moments(weights))
+
+
+class _AnovaStatistic:
+    """单因素方差分析的F值和eta²"""
+    main_metric = 'f_value'
+
+    def __init__(self, groups, y):
+        self.groups = np.asarray(groups, dtype=np.int64)
+        self.y = np.asarray(y, dtype=float)
+        self.n = len(self.y)
+        self.k = int(self.groups.max()) + 1 if self.n > 0 else 0
+        self.width = 1
+        self.counts = np.bincount(self.groups, minlength=self.k).astype(float)
+        self.sum_y = self.y.sum()
+        self.sst = float(np.sum((self.y - self.y.mean()) ** 2))
+
+    def _f_and_eta(self, sums, counts, total_sum, sst, n):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ssb = np.sum(np.where(counts > 0, sums ** 2 / counts, 0.0), axis=1) - total_sum ** 2 / n
+            k = np.sum(counts > 0, axis=1)
+            ssw = sst - ssb
+            f = (ssb / (k - 1)) / (ssw / (n - k))
+            eta = np.where(sst > 0, ssb / sst, np.nan)
+        return f, eta
+
+    def observed(self):
+        sums = np.bincount(self.groups, weights=self.y, minlength=self.k)[None, :]
+        f, eta = self._f_and_eta(sums, self.counts[None, :], self.sum_y, self.sst, self.n)
+        return {'f_value': f[0], 'eta_squared': eta[0]}
+
+    def permuted(self, perm):
+        group_codes = np.broadcast_to(self.groups, perm.shape)
+        sums = _row_bincount(group_codes, self.k, weights=self.y[perm])
+        f, _ = self._f_and_eta(sums, self.counts[None, :], self.sum_y, self.sst, self.n)
+        return f
+
+    def bootstrap(self, idx):
+        g = self.groups[idx]
+        y = self.y[idx]
+        counts = _row_bincount(g, self.k).astype(float)
+        sums = _row_bincount(g, self.k, weights=y)
+        total_sum = y.sum(axis=1)
+        sst = np.sum(y ** 2, axis=1) - total_sum ** 2 / self.n
+        f, eta = self._f_and_eta(sums, counts, total_sum, sst, self.n)
+        return {'f_value': f, 'eta_squared': eta}
+
+
+class _ChiSquareStatistic:
+    """列联表卡方统计量和Cramer's V"""
+    main_metric = 'chi2'
+
+    def __init__(self, a, b):
+        self.a = np.asarray(a, dtype=np.int64)
+        self.b = np.asarray(b, dtype=np.int64)
+        self.n = len(self.a)
+        self.ka = int(self.a.max()) + 1 if self.n > 0 else 0
+        self.kb = int(self.b.max()) + 1 if self.n > 0 else 0
+        self.width = 1
+
+    def _tables(self, a, b):
+        return _row_bincount(a * self.kb + b, self.ka * self.kb).reshape(-1, self.ka, self.kb).astype(float)
+
+    def _chi2(self, tables):
+        rows = tables.sum(axis=2, keepdims=True)
+        cols = tables.sum(axis=1, keepdims=True)
+        total = tables.sum(axis=(1, 2), keepdims=True)
+        expected = rows * cols / total
+        with np.errstate(divide='ignore', invalid='ignore'):
+            contrib = np.where(expected > 0, (tables - expected) ** 2 / expected, 0.0)
+        chi2 = contrib.sum(axis=(1, 2))
+        dims = np.minimum((rows[:, :, 0] > 0).sum(axis=1), (cols[:, 0, :] > 0).sum(axis=1))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cramers_v = np.where(dims > 1, np.sqrt(chi2 / (self.n * (dims - 1))), np.nan)
+        return chi2, cramers_v
+
+    def observed(self):
+        chi2, v = self._chi2(self._tables(self.a[None, :], self.b[None, :]))
+        return {'chi2': chi2[0], 'cramers_v': v[0]}
+
+    def permuted(self, perm):
+        chi2, _ = self._chi2(self._tables(np.broadcast_to(self.a, perm.shape), self.b[perm]))
+        return chi2
+
+    def bootstrap(self, idx):
+        chi2, v = self._chi2(self._tables(self.a[idx], self.b[idx]))
+        return {'chi2': chi2, 'cramers_v': v}
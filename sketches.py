@@ -0,0 +1,276 @@
+#sketches.py
+import numpy as np
+import pandas as pd
+
+
+class KLLSketch:
+    """
+    KLL分位数草图：多层压缩器，第h层的每个元素代表2^h个原始值。
+    内存为O(k)，秩误差约为 2.296 / k^0.9723（99%置信度），可合并。
+    """
+
+    def __init__(self, k=200, seed=0):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.n = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self._rng = np.random.default_rng(seed)
+
+    @property
+    def rank_error(self):
+        """归一化秩误差上界"""
+        return 2.296 / self.k ** 0.9723
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(int(np.ceil(self.k * (2 / 3) ** depth)), 2)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        self.n += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _compress(self):
+        changed = True
+        while changed:
+            changed = False
+            for level in range(len(self.levels)):
+                items = self.levels[level]
+                if len(items) <= self._capacity(level):
+                    continue
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # 元素个数为奇数时留下一个，其余两两中随机保留一个提升到上一层
+                leftover = items[len(items) - len(items) % 2:]
+                promoted = items[self._rng.integers(2):len(items) - len(items) % 2:2]
+                self.levels[level] = leftover
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+                changed = True
+
+    def _weighted(self):
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items_), 2.0 ** level) for level, items_ in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        return items[order], np.cumsum(weights[order])
+
+    def quantile(self, q):
+        """近似分位数（q可以是标量或数组）"""
+        if self.n == 0:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+        items, cumulative = self._weighted()
+        target = np.asarray(q, dtype=float) * cumulative[-1]
+        idx = np.minimum(np.searchsorted(cumulative, target, side='left'), len(items) - 1)
+        result = items[idx]
+        # 最值是精确记录的
+        result = np.where(np.asarray(q) <= 0, self.min, np.where(np.asarray(q) >= 1, self.max, result))
+        return float(result) if np.ndim(q) == 0 else result
+
+    def rank(self, x, inclusive=True):
+        """小于（或小于等于）x的原始值个数的估计"""
+        if self.n == 0:
+            return 0.0
+        items, cumulative = self._weighted()
+        idx = np.searchsorted(items, x, side='right' if inclusive else 'left')
+        counts = np.where(idx > 0, cumulative[np.maximum(idx - 1, 0)], 0.0) * self.n / cumulative[-1]
+        return float(counts) if np.ndim(x) == 0 else counts
+
+
+def _bit_length(values):
+    """uint64数组中每个元素的二进制位数（0的位数为0）"""
+    high = (values >> np.uint64(32)).astype(np.float64)
+    low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    return np.where(high > 0, 32 + np.frexp(high)[1], np.frexp(low)[1])
+
+
+class HyperLogLog:
+    """HyperLogLog基数估计，2^p个寄存器，相对标准误差约为 1.04 / sqrt(2^p)，可合并"""
+
+    def __init__(self, p=14):
+        self.p = p
+        self.m = 1 << p
+        self.registers = np.zeros(self.m, dtype=np.uint8)
+
+    @property
+    def relative_error(self):
+        return 1.04 / np.sqrt(self.m)
+
+    def update(self, values):
+        """values为字符串数组（调用方负责统一为字符串，使不同分块中的相同值得到相同哈希）"""
+        values = np.asarray(values, dtype=object)
+        if len(values) == 0:
+            return self
+        hashed = pd.util.hash_array(values, categorize=True)
+        index = (hashed >> np.uint64(64 - self.p)).astype(np.int64)
+        # 剩余位左移对齐，并设置保护位避免全零
+        rest = (hashed << np.uint64(self.p)) | np.uint64(1 << (self.p - 1))
+        rank = (65 - _bit_length(rest)).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+        return self
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self):
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        raw = alpha * self.m ** 2 / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * self.m and zeros > 0:
+            return float(self.m * np.log(self.m / zeros))
+        return float(raw)
+
+
+class FrequentItems:
+    """
+    高频项草图（Misra-Gries，与Space-Saving等价的可合并形式），最多保留capacity个计数。
+    每个计数是真实频数的下界，低估量不超过offset（且offset <= n / (capacity + 1)）。
+    """
+
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype=np.int64)
+        self.n = 0
+        self.offset = 0
+
+    @property
+    def exact(self):
+        """尚未发生截断时所有计数都是精确值"""
+        return self.offset == 0
+
+    def update(self, values):
+        values = pd.Series(values)
+        self.n += len(values)
+        return self.add_counts(values.value_counts(sort=False))
+
+    def merge(self, other):
+        self.n += other.n
+        self.offset += other.offset
+        return self.add_counts(other.counts)
+
+    def add_counts(self, counts):
+        """
+        累加预先聚合好的频数（值 -> 计数的Series），超出capacity时按Misra-Gries规则截断。
+        不修改n，调用方需自行加上这些计数对应的总数。
+        """
+        combined = self.counts.add(counts, fill_value=0).astype(np.int64) if len(self.counts) else counts.astype(np.int64)
+        if len(combined) > self.capacity:
+            threshold = int(np.partition(combined.to_numpy(), len(combined) - self.capacity - 1)[
+                len(combined) - self.capacity - 1])
+            combined = combined - threshold
+            combined = combined[combined > 0]
+            self.offset += threshold
+        self.counts = combined
+        return self
+
+    def top(self, k=None):
+        """按估计频数降序排列的 (值, 计数) Series"""
+        ordered = self.counts.sort_values(ascending=False, kind='stable')
+        return ordered if k is None else ordered.head(k)
+
+
+class MomentSketch:
+    """可合并的计数、最值及一到四阶中心矩（Pébay合并公式）"""
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.m3 = 0.0
+        self.m4 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        other = MomentSketch()
+        other.n = len(values)
+        other.mean = float(values.mean())
+        centered = values - other.mean
+        squared = centered * centered
+        other.m2 = float(squared.sum())
+        other.m3 = float((squared * centered).sum())
+        other.m4 = float((squared * squared).sum())
+        other.min = float(values.min())
+        other.max = float(values.max())
+        return self.merge(other)
+
+    def merge(self, other):
+        if other.n == 0:
+            return self
+        if self.n == 0:
+            self.__dict__.update(other.__dict__)
+            return self
+        n_a, n_b = self.n, other.n
+        n = n_a + n_b
+        delta = other.mean - self.mean
+        delta_n = delta / n
+        m2 = self.m2 + other.m2 + delta * delta_n * n_a * n_b
+        m3 = (self.m3 + other.m3 + delta * delta_n ** 2 * n_a * n_b * (n_a - n_b)
+              + 3 * delta_n * (n_a * other.m2 - n_b * self.m2))
+        m4 = (self.m4 + other.m4 + delta * delta_n ** 3 * n_a * n_b * (n_a * n_a - n_a * n_b + n_b * n_b)
+              + 6 * delta_n ** 2 * (n_a * n_a * other.m2 + n_b * n_b * self.m2)
+              + 4 * delta_n * (n_a * other.m3 - n_b * self.m3))
+        self.n, self.mean, self.m2, self.m3, self.m4 = n, self.mean + delta_n * n_b, m2, m3, m4
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def variance(self):
+        return self.m2 / (self.n - 1) if self.n > 1 else np.nan
+
+    @property
+    def skewness(self):
+        return (self.m3 / self.n) / (self.m2 / self.n) ** 1.5 if self.m2 > 0 else np.nan
+
+    @property
+    def kurtosis(self):
+        return (self.m4 / self.n) / (self.m2 / self.n) ** 2 - 3 if self.m2 > 0 else np.nan
+
+
+class ReservoirSample:
+    """固定大小的均匀随机样本：保留随机键最小的size个值，可合并"""
+
+    def __init__(self, size=5000, seed=0):
+        self.size = size
+        self.values = np.empty(0)
+        self.keys = np.empty(0)
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        values = np.asarray(values)
+        keys = self._rng.random(len(values))
+        return self._keep(np.concatenate([self.values, values]), np.concatenate([self.keys, keys]))
+
+    def merge(self, other):
+        return self._keep(np.concatenate([self.values, other.values]), np.concatenate([self.keys, other.keys]))
+
+    def _keep(self, values, keys):
+        if len(values) > self.size:
+            idx = np.argpartition(keys, self.size - 1)[:self.size]
+            values, keys = values[idx], keys[idx]
+        self.values, self.keys = values, keys
+        return self
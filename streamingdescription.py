@@ -0,0 +1,467 @@
+#streamingdescription.py
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from datadescription import DataDescription
+from datetimeanalysis import DAY_NS, DatetimeAnalyzer
+from sketches import FrequentItems, HyperLogLog, KLLSketch, MomentSketch, ReservoirSample
+from textanalysis import TextAnalyzer
+
+def _as_strings(series):
+    """统一转换为字符串，整数值在不同分块中被读成浮点数时仍得到相同的键"""
+    if pd.api.types.is_float_dtype(series) and len(series) and (series % 1 == 0).all():
+        series = series.astype('Int64')
+    return series.astype(str)
+
+
+class _ContinuousState:
+    def __init__(self, quantile_k, sample_size, seed):
+        self.moments = MomentSketch()
+        self.quantiles = KLLSketch(quantile_k, seed)
+        self.sample = ReservoirSample(sample_size, seed)
+
+    def update(self, series):
+        values = pd.to_numeric(series, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        values = values[~np.isnan(values)]
+        self.moments.update(values)
+        self.quantiles.update(values)
+        self.sample.update(values)
+
+    def describe(self, missing_count, missing_percentage, include_histogram):
+        moments, quantiles = self.moments, self.quantiles
+        n = moments.n
+        q1, median, q3 = quantiles.quantile([0.25, 0.5, 0.75])
+        iqr = q3 - q1
+        lower_bound = q1 - 1.5 * iqr
+        upper_bound = q3 + 1.5 * iqr
+        outlier_count = int(round(quantiles.rank(lower_bound, inclusive=False)
+                                  + n - quantiles.rank(upper_bound, inclusive=True)))
+
+        stats_dict = {
+            "type": "continuous",
+            "count": int(n),
+            "missing_count": int(missing_count),
+            "missing_percentage": float(missing_percentage),
+            "min": float(moments.min),
+            "max": float(moments.max),
+            "mean": float(moments.mean),
+            "median": float(median),
+            "std": float(np.sqrt(moments.variance)),
+            "q1": float(q1),
+            "q3": float(q3),
+            "iqr": float(iqr),
+            "variance": float(moments.variance),
+            "skewness": float(moments.skewness),
+            "kurtosis": float(moments.kurtosis)
+        }
+
+        sample = self.sample.values
+        try:
+            if len(sample) >= 8:
+                shapiro_test = stats.shapiro(sample)
+                stats_dict["normality_test"] = {
+                    "test": "shapiro",
+                    "statistic": float(shapiro_test[0]),
+                    "p_value": float(shapiro_test[1]),
+                    "is_normal": shapiro_test[1] > 0.05
+                }
+        except:
+            pass
+
+        stats_dict["outliers"] = {
+            "count": outlier_count,
+            "percentage": float(outlier_count / n * 100) if n > 0 else 0,
+            "lower_bound": float(lower_bound),
+            "upper_bound": float(upper_bound)
+        }
+
+        if include_histogram and len(sample):
+            try:
+                # 分箱边界由随机样本确定，各箱计数由分位数草图的秩估计
+                edges = np.histogram_bin_edges(sample, bins='auto', range=(moments.min, moments.max))
+                cumulative = np.append(quantiles.rank(edges[1:-1], inclusive=False), n)
+                stats_dict["histogram"] = {
+                    "bin_edges": edges.tolist(),
+                    "counts": np.diff(np.round(cumulative), prepend=0).astype(int).tolist()
+                }
+            except:
+                pass
+
+        stats_dict["approximation"] = {
+            "method": "KLL quantile sketch, exact moments",
+            "quantile_rank_error": float(quantiles.rank_error),
+            "outlier_count_error": int(np.ceil(2 * quantiles.rank_error * n)),
+            "normality_sample_size": int(len(sample))
+        }
+        return stats_dict
+
+
+class _CategoricalState:
+    def __init__(self, capacity, hll_precision):
+        self.items = FrequentItems(capacity)
+        self.distinct = HyperLogLog(hll_precision)
+        self.count = 0
+
+    def update(self, series):
+        values = _as_strings(series.dropna())
+        self.count += len(values)
+        self.items.update(values)
+        self.distinct.update(values.to_numpy())
+
+    def describe(self, missing_count, missing_percentage, include_histogram):
+        n = self.count
+        exact = self.items.exact
+        value_counts = self.items.top()
+        value_percentages = (value_counts / n * 100).round(2) if n else value_counts.astype(float)
+        unique_values = len(value_counts) if exact else int(round(self.distinct.estimate()))
+
+        stats_dict = {
+            "type": "categorical",
+            "count": int(n),
+            "missing_count": int(missing_count),
+            "missing_percentage": float(missing_percentage),
+            "unique_values": int(unique_values)
+        }
+        if len(value_counts) > 0:
+            most_common = value_counts.index[0]
+            stats_dict["most_common"] = {
+                "value": str(most_common),
+                "count": int(value_counts[most_common]),
+                "percentage": float(value_percentages[most_common])
+            }
+            # 截断后无法确定最少见的类别和熵，只在计数精确时输出
+            if exact:
+                least_common = value_counts.index[-1]
+                stats_dict["least_common"] = {
+                    "value": str(least_common),
+                    "count": int(value_counts[least_common]),
+                    "percentage": float(value_percentages[least_common])
+                }
+                probs = value_percentages / 100
+                entropy = -(probs * np.log2(probs)).sum()
+                max_entropy = np.log2(len(value_counts))
+                stats_dict["entropy"] = {
+                    "value": float(entropy),
+                    "max_possible": float(max_entropy),
+                    "normalized": float(entropy / max_entropy) if max_entropy > 0 else 0
+                }
+
+        categories = {str(val): {"count": int(value_counts[val]), "percentage": float(value_percentages[val])}
+                      for val in value_counts.index[:20 if exact else 10]}
+        if unique_values > 20 or not exact:
+            stats_dict["categories"] = {
+                "top_10": dict(list(categories.items())[:10]),
+                "total_categories": int(unique_values)
+            }
+        else:
+            stats_dict["categories"] = categories
+
+        if not exact:
+            stats_dict["approximation"] = {
+                "method": "Misra-Gries frequent items, HyperLogLog distinct count",
+                "count_error": int(self.items.offset),
+                "distinct_count_relative_error": float(self.distinct.relative_error)
+            }
+        return stats_dict
+
+
+class _StringState:
+    def __init__(self, capacity, hll_precision):
+        self.distinct = HyperLogLog(hll_precision)
+        self.words = FrequentItems(capacity)
+        self.distinct_words = HyperLogLog(hll_precision)
+        self.count = 0
+        self.total_words = 0
+        self.chars = [np.inf, -np.inf, 0]
+        self.word_counts = [np.inf, -np.inf, 0]
+        self.patterns = {"contains_emails": False, "contains_urls": False,
+                         "contains_numbers": False, "contains_special_chars": False}
+        self.sample_values = []
+
+    def update(self, series):
+        col_data = series.dropna().astype(str)
+        if len(col_data) == 0:
+            return
+        analyzer = TextAnalyzer(col_data)
+        summary = analyzer.summary()
+        self.count += len(col_data)
+        self.distinct.update(col_data.to_numpy())
+        for state, prefix in ((self.chars, 'chars'), (self.word_counts, 'words')):
+            state[0] = min(state[0], summary[f'min_{prefix}'])
+            state[1] = max(state[1], summary[f'max_{prefix}'])
+            state[2] += int(round(summary[f'avg_{prefix}'] * summary['count']))
+        for key in self.patterns:
+            self.patterns[key] = self.patterns[key] or summary[key]
+
+        words = analyzer.token_counts()
+        self.total_words += int(words.sum())
+        self.words.n += int(words.sum())
+        self.words.add_counts(words)
+        self.distinct_words.update(words.index.to_numpy())
+        if len(self.sample_values) < 3:
+            self.sample_values.extend(col_data.head(3 - len(self.sample_values)).tolist())
+
+    def describe(self, missing_count, missing_percentage, include_histogram):
+        n = self.count
+        unique_values = int(round(self.distinct.estimate()))
+        stats_dict = {
+            "type": "string",
+            "count": int(n),
+            "missing_count": int(missing_count),
+            "missing_percentage": float(missing_percentage),
+            "unique_values": unique_values,
+            "uniqueness_ratio": float(min(unique_values / n, 1.0)) if n > 0 else 0,
+            "text_length": {
+                "min_chars": int(self.chars[0]) if n else 0,
+                "max_chars": int(self.chars[1]) if n else 0,
+                "avg_chars": float(self.chars[2] / n) if n else 0,
+                "min_words": int(self.word_counts[0]) if n else 0,
+                "max_words": int(self.word_counts[1]) if n else 0,
+                "avg_words": float(self.word_counts[2] / n) if n else 0
+            },
+            "patterns": dict(self.patterns)
+        }
+        if n and self.word_counts[1] > 1 and self.total_words:
+            unique_words = len(self.words.counts) if self.words.exact else int(round(self.distinct_words.estimate()))
+            stats_dict["word_frequency"] = {
+                "total_words": int(self.total_words),
+                "unique_words": unique_words,
+                "top_words": {word: int(count) for word, count in self.words.top(10).items()}
+            }
+        if self.sample_values:
+            stats_dict["sample_values"] = self.sample_values
+        stats_dict["approximation"] = {
+            "method": "HyperLogLog distinct counts, Misra-Gries word frequencies",
+            "distinct_count_relative_error": float(self.distinct.relative_error),
+            "word_count_error": int(self.words.offset)
+        }
+        return stats_dict
+
+
+class _BooleanState:
+    def __init__(self):
+        self.count = 0
+        self.true_count = 0
+
+    def update(self, series):
+        col_data = series.dropna()
+        self.count += len(col_data)
+        self.true_count += int(col_data.astype(bool).sum())
+
+    def describe(self, missing_count, missing_percentage, include_histogram):
+        false_count = self.count - self.true_count
+        return {
+            "type": "boolean",
+            "count": int(self.count),
+            "missing_count": int(missing_count),
+            "missing_percentage": float(missing_percentage),
+            "true_count": int(self.true_count),
+            "false_count": int(false_count),
+            "true_percentage": float(self.true_count / self.count * 100) if self.count > 0 else 0,
+            "false_percentage": float(false_count / self.count * 100) if self.count > 0 else 0
+        }
+
+
+class _DatetimeState:
+    # 不同时间戳超过capacity时依次向下取整到的时间单位
+    UNITS = [('s', 10 ** 9), ('min', 60 * 10 ** 9), ('h', 3_600 * 10 ** 9), ('D', DAY_NS)]
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        # 每个不同时间戳（当地时间的int64纳秒）的行数
+        self.counts = pd.Series(dtype=np.int64)
+        self.tz = None
+        self.unit = None
+        self.min = None
+        self.max = None
+
+    def update(self, series):
+        col_data = pd.to_datetime(series, errors='coerce').dropna()
+        if col_data.empty:
+            return
+        self.min = col_data.min() if self.min is None else min(self.min, col_data.min())
+        self.max = col_data.max() if self.max is None else max(self.max, col_data.max())
+        tz = getattr(col_data.dt, 'tz', None)
+        if tz is not None:
+            self.tz = tz
+            col_data = col_data.dt.tz_localize(None)
+        timestamps = col_data.to_numpy(dtype='datetime64[ns]').view(np.int64)
+        if self.unit is not None:
+            timestamps = timestamps // self.unit[1] * self.unit[1]
+        self.counts = self.counts.add(pd.Series(timestamps).value_counts(sort=False), fill_value=0).astype(np.int64)
+        while len(self.counts) > self.capacity and self.unit != self.UNITS[-1]:
+            # 保持内存有界：合并到更粗的时间单位，频率、缺口和重复时间戳随之按该单位计算
+            self.unit = self.UNITS[self.UNITS.index(self.unit) + 1] if self.unit else self.UNITS[0]
+            self.counts = self.counts.groupby(self.counts.index // self.unit[1] * self.unit[1]).sum()
+
+    def describe(self, missing_count, missing_percentage, include_histogram):
+        analyzer = DatetimeAnalyzer.from_counts(self.counts.index.to_numpy(), self.counts.to_numpy(), self.tz)
+        stats_dict = {
+            "type": "datetime",
+            "count": int(analyzer.count),
+            "missing_count": int(missing_count),
+            "missing_percentage": float(missing_percentage)
+        }
+        stats_dict.update(analyzer.summary())
+        if self.unit is not None:
+            # 最小值和最大值是精确的，其余统计量基于取整后的时间戳
+            stats_dict.update({
+                "min": self.min.isoformat(),
+                "max": self.max.isoformat(),
+                "range_days": int((self.max - self.min).days)
+            })
+            stats_dict["approximation"] = {
+                "method": "timestamp counts floored to a coarser unit",
+                "timestamp_unit": self.unit[0]
+            }
+        return stats_dict
+
+
+class StreamingDataDescription(DataDescription):
+    def __init__(self, source, chunksize=100_000, include_histogram=False, string_threshold=30,
+                 quantile_k=200, hll_precision=14, top_k_capacity=1000, sample_size=5000, seed=42,
+                 datetime_capacity=1_000_000, read_csv_kwargs=None):
+        """
+        基于可合并草图的近似数据描述，按块读取数据，内存占用与行数无关。
+        输出格式与DataDescription一致，近似得到的统计量在每列的"approximation"中给出误差界。
+        这是供脚本使用的库接口，用于无法整体载入内存的CSV；页面中的数据已在内存里，使用DataDescription的抽样模式。
+
+        Parameters:
+        source: CSV文件路径、DataFrame或DataFrame分块的可迭代对象
+        chunksize (int): 每次读取的行数
+        include_histogram (bool): 是否输出连续变量的直方图
+        string_threshold (int): 与DataDescription相同的文本列判定阈值
+        quantile_k (int): KLL分位数草图的大小参数（越大越精确）
+        hll_precision (int): HyperLogLog的精度参数p（2^p个寄存器）
+        top_k_capacity (int): 高频项草图保留的最大计数个数
+        sample_size (int): 用于正态性检验和直方图分箱的随机样本大小
+        seed (int): 随机种子
+        datetime_capacity (int): 日期列保留的不同时间戳个数上限，超过时时间戳依次取整到秒、分钟、小时、天
+        read_csv_kwargs (dict): 传给pandas.read_csv的其他参数
+        """
+        super().__init__(source if isinstance(source, pd.DataFrame) else pd.DataFrame(),
+                         include_histogram=include_histogram, string_threshold=string_threshold)
+        self.source = source
+        self.chunksize = chunksize
+        self.quantile_k = quantile_k
+        self.hll_precision = hll_precision
+        self.top_k_capacity = top_k_capacity
+        self.sample_size = sample_size
+        self.seed = seed
+        self.datetime_capacity = datetime_capacity
+        self.read_csv_kwargs = read_csv_kwargs or {}
+        self.rows = 0
+        self.chunks = 0
+        self._columns = []
+        self._missing = {}
+        self._states = {}
+
+    def _iter_chunks(self):
+        if isinstance(self.source, pd.DataFrame):
+            for start in range(0, len(self.source), self.chunksize):
+                yield self.source.iloc[start:start + self.chunksize]
+        elif isinstance(self.source, (str, os.PathLike)):
+            yield from pd.read_csv(self.source, chunksize=self.chunksize, **self.read_csv_kwargs)
+        else:
+            yield from self.source
+
+    def _new_state(self, kind):
+        if kind == 'continuous':
+            return _ContinuousState(self.quantile_k, self.sample_size, self.seed)
+        if kind == 'categorical':
+            return _CategoricalState(self.top_k_capacity, self.hll_precision)
+        if kind == 'string':
+            return _StringState(self.top_k_capacity, self.hll_precision)
+        if kind == 'boolean':
+            return _BooleanState()
+        return _DatetimeState(self.datetime_capacity)
+
+    def analyze_data(self):
+        """
+        按块扫描数据并更新每列的草图，列类型由该列第一个含非缺失值的分块确定。
+        Returns self for chaining.
+        """
+        warnings.filterwarnings("ignore", category=FutureWarning, module="pandas")
+
+        for chunk in self._iter_chunks():
+            if self.chunks == 0:
+                self._columns = list(chunk.columns)
+                self._missing = {column: 0 for column in self._columns}
+                if not isinstance(self.source, pd.DataFrame):
+                    self.data = chunk.iloc[0:0]
+            self.chunks += 1
+            self.rows += len(chunk)
+            chunk_describer = DataDescription(chunk, string_threshold=self.string_threshold)
+
+            for column in self._columns:
+                series = chunk[column]
+                self._missing[column] += int(series.isna().sum())
+                if column not in self._states:
+                    try:
+                        kind = chunk_describer._column_kind(column)
+                    except Exception as e:
+                        error_msg = f"Error analyzing {column}: {str(e)}"
+                        print(error_msg)
+                        self.errors.append(error_msg)
+                        self._states[column] = None
+                        continue
+                    if kind == 'unknown':
+                        continue
+                    self._states[column] = self._new_state(kind)
+                state = self._states[column]
+                if state is None:
+                    continue
+                try:
+                    state.update(series)
+                except Exception as e:
+                    error_msg = f"Error analyzing {column}: {str(e)}"
+                    print(error_msg)
+                    self.errors.append(error_msg)
+                    self._states[column] = None
+            print(f"Processed chunk {self.chunks} ({self.rows} rows)")
+
+        for column in self._columns:
+            missing_count = self._missing[column]
+            missing_percentage = (missing_count / self.rows) * 100 if self.rows else 0
+            if column not in self._states:
+                self.descriptions[column] = {
+                    "type": "unknown",
+                    "missing_count": self.rows,
+                    "missing_percentage": 100.0,
+                    "analysis": "Column contains all missing values"
+                }
+                continue
+            state = self._states[column]
+            if state is None:
+                continue
+            try:
+                self.descriptions[column] = state.describe(missing_count, missing_percentage,
+                                                           self.include_histogram)
+            except Exception as e:
+                error_msg = f"Error analyzing {column}: {str(e)}"
+                print(error_msg)
+                self.errors.append(error_msg)
+        return self
+
+    def _dataset_info(self):
+        columns = len(self._columns)
+        missing_cells = int(sum(self._missing.values()))
+        return {
+            "rows": int(self.rows),
+            "columns": int(columns),
+            "total_cells": int(self.rows * columns),
+            "missing_cells": missing_cells,
+            "missing_percentage": float((missing_cells / (self.rows * columns) * 100) if self.rows * columns > 0 else 0),
+            "approximation": {
+                "mode": "streaming sketches",
+                "chunks": int(self.chunks),
+                "chunksize": int(self.chunksize),
+                "quantile_rank_error": float(KLLSketch(self.quantile_k).rank_error),
+                "distinct_count_relative_error": float(HyperLogLog(self.hll_precision).relative_error),
+                "top_k_capacity": int(self.top_k_capacity)
+            }
+        }
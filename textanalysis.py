@@ -0,0 +1,322 @@
+#textanalysis.py
+import numpy as np
+import pandas as pd
+
+try:
+    import jieba
+except ImportError:
+    jieba = None
+
+# 拼接各行时使用的分隔符（既不是\w也不是\s，不会与相邻行组成单词或句子）
+_SEPARATOR = '\x00'
+# 多项式哈希的底数（奇数，在模2^64下可逆）
+_BASE = 0x100000001B3
+_BASE_INVERSE = pow(_BASE, -1, 1 << 64)
+_LENGTH_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+_EMAIL_PATTERN = r'[^@]+@[^@]+\.[^@]+'
+_URL_PATTERN = r'https?://\S+|www\.\S+'
+
+_tables = None
+
+
+def _bmp_tables():
+    """基本多文种平面字符的分类表：与re模块中\\s、\\w、\\d的定义一致"""
+    global _tables
+    if _tables is None:
+        chars = [chr(i) for i in range(0x10000)]
+        space = np.fromiter((c.isspace() for c in chars), dtype=bool, count=0x10000)
+        word = np.fromiter((c.isalnum() or c == '_' for c in chars), dtype=bool, count=0x10000)
+        digit = np.fromiter((c.isdecimal() for c in chars), dtype=bool, count=0x10000)
+        _tables = (space, word, digit)
+    return _tables
+
+
+def _classify(codepoints):
+    """返回每个码位的 (空白, 单词字符, 数字) 掩码"""
+    space_table, word_table, digit_table = _bmp_tables()
+    bmp = codepoints < 0x10000
+    index = np.where(bmp, codepoints, 0)
+    space, word, digit = space_table[index], word_table[index], digit_table[index]
+    if not bmp.all():
+        # 辅助平面字符很少，按唯一码位逐个判断
+        astral = np.flatnonzero(~bmp)
+        uniques, inverse = np.unique(codepoints[astral], return_inverse=True)
+        chars = [chr(int(c)) for c in uniques]
+        space[astral] = np.array([c.isspace() for c in chars])[inverse]
+        word[astral] = np.array([c.isalnum() or c == '_' for c in chars])[inverse]
+        digit[astral] = np.array([c.isdecimal() for c in chars])[inverse]
+    return space, word, digit
+
+
+def _is_cjk(codepoints):
+    return (((codepoints >= 0x4E00) & (codepoints <= 0x9FFF)) | ((codepoints >= 0x3400) & (codepoints <= 0x4DBF))
+            | ((codepoints >= 0xF900) & (codepoints <= 0xFAFF)) | ((codepoints >= 0x20000) & (codepoints <= 0x2FA1F)))
+
+
+def _encode(text):
+    return np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+
+
+def _powers(n):
+    """B^j 以及 B^-j，j < n（均为模2^64运算）"""
+    powers = np.empty(n, dtype=np.uint64)
+    inverse_powers = np.empty(n, dtype=np.uint64)
+    if n:
+        powers[0] = inverse_powers[0] = 1
+        powers[1:] = _BASE
+        inverse_powers[1:] = _BASE_INVERSE
+        np.multiply.accumulate(powers, out=powers)
+        np.multiply.accumulate(inverse_powers, out=inverse_powers)
+    return powers, inverse_powers
+
+
+def _prefix_hashes(codepoints, powers):
+    """前缀哈希 P[k] = sum_{j<k} cp[j] * B^j（模2^64运算）"""
+    prefix = np.zeros(len(codepoints) + 1, dtype=np.uint64)
+    np.cumsum(codepoints.astype(np.uint64) * powers, out=prefix[1:])
+    return prefix
+
+
+def _substring_hashes(prefix, inverse_powers, starts, ends):
+    """子串 [start, end) 的哈希，与起始位置无关，并混入长度"""
+    hashes = (prefix[ends] - prefix[starts]) * inverse_powers[starts]
+    return hashes ^ ((ends - starts).astype(np.uint64) * _LENGTH_MIX)
+
+
+def string_hash(text):
+    """与_substring_hashes相同定义的单个字符串哈希（用于分词器产生的词）"""
+    value = 0
+    power = 1
+    for char in text:
+        value = (value + ord(char) * power) & 0xFFFFFFFFFFFFFFFF
+        power = (power * _BASE) & 0xFFFFFFFFFFFFFFFF
+    return np.uint64(value) ^ (np.uint64(len(text)) * _LENGTH_MIX)
+
+
+def _runs(mask):
+    """布尔掩码中连续True区间的 (起点, 终点)"""
+    padded = np.concatenate([[False], mask, [False]])
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    return edges[0::2], edges[1::2]
+
+
+class TextAnalyzer:
+    def __init__(self, series, tokenizer='auto', block_chars=4_000_000):
+        """
+        文本列的单次扫描分析：各行按块拼接为一个码位数组，模式标记、长度/词数统计和
+        词频都由向量化运算得到，词频使用子串哈希计数。
+
+        Parameters:
+        series (pandas.Series): 文本列（缺失值会被忽略）
+        tokenizer (str): 中文分词方式：'bigram'为相邻汉字二元组，'jieba'使用jieba分词，
+                         'auto'在安装了jieba时使用jieba，否则使用二元组
+        block_chars (int): 每块的最大字符数，用于限制内存占用
+        """
+        if tokenizer not in ('auto', 'bigram', 'jieba'):
+            raise ValueError("tokenizer must be 'auto', 'bigram' or 'jieba'")
+        if tokenizer == 'jieba' and jieba is None:
+            raise ImportError("jieba is required for tokenizer='jieba'")
+        self.series = series.dropna().astype(str)
+        self.tokenizer = 'jieba' if tokenizer == 'auto' and jieba is not None else (
+            'bigram' if tokenizer == 'auto' else tokenizer)
+        self.block_chars = block_chars
+        self._result = None
+
+    def _blocks(self, lengths):
+        """按字符数划分行块，返回 (起始行, 结束行) 列表"""
+        cumulative = np.cumsum(lengths + 1)
+        blocks, start = [], 0
+        while start < len(lengths):
+            offset = cumulative[start - 1] if start else 0
+            end = int(np.searchsorted(cumulative, offset + self.block_chars, side='right'))
+            end = max(end, start + 1)
+            blocks.append((start, end))
+            start = end
+        return blocks
+
+    def analyze(self):
+        """执行分析（结果缓存），返回summary()和word_frequency()使用的内部结果"""
+        if self._result is not None:
+            return self._result
+
+        values = self.series.to_numpy(dtype=object)
+        lengths = self.series.str.len().to_numpy(dtype=np.int64)
+        n_rows = len(values)
+        word_counts = np.zeros(n_rows, dtype=np.int64)
+        row_hashes = []
+        token_hashes, token_counts, token_refs = [], [], []
+        token_texts = {}
+        buffers = []
+        flags = {'numbers': False, 'special_chars': False, 'sentences': False}
+        candidate_rows = {'emails': [], 'urls': []}
+
+        for block_id, (start, end) in enumerate(self._blocks(lengths)):
+            joined = _SEPARATOR.join(values[start:end]) + _SEPARATOR
+            codepoints = _encode(joined)
+            row_lengths = lengths[start:end]
+            row_starts = np.cumsum(row_lengths + 1) - (row_lengths + 1)
+            row_ends = row_starts + row_lengths
+            separator = np.zeros(len(codepoints), dtype=bool)
+            separator[row_ends] = True
+
+            space, word, digit = _classify(codepoints)
+            word &= ~separator
+
+            # 模式标记
+            flags['numbers'] |= bool(digit.any())
+            flags['special_chars'] |= bool((~word & ~space & ~separator).any())
+            if not flags['sentences']:
+                # [.!?]\s+[A-Z]：大写字母前是空白，且空白之前最近的非空白字符是句末标点
+                positions = np.arange(len(codepoints))
+                last_non_space = np.maximum.accumulate(np.where(space, -1, positions))
+                upper = (codepoints >= 65) & (codepoints <= 90)
+                candidates = np.flatnonzero(upper[1:] & space[:-1]) + 1
+                before = last_non_space[candidates - 1]
+                valid = before >= 0
+                punct = codepoints[before[valid]]
+                flags['sentences'] = bool(np.isin(punct, [46, 33, 63]).any())
+            row_of = lambda pos: np.searchsorted(row_starts, pos, side='right') - 1 + start
+            at_sign = np.flatnonzero(codepoints == 64)
+            if len(at_sign):
+                candidate_rows['emails'].append(np.unique(row_of(at_sign)))
+            url_marks = np.flatnonzero(((codepoints[:-2] == 58) & (codepoints[1:-1] == 47) & (codepoints[2:] == 47))
+                                       | ((codepoints[:-2] == 119) & (codepoints[1:-1] == 119)
+                                          & (codepoints[2:] == 119)))
+            if len(url_marks):
+                candidate_rows['urls'].append(np.unique(row_of(url_marks)))
+
+            # 与str.split()一致：以空白分隔的片段数
+            non_space = ~space & ~separator
+            piece_starts = np.flatnonzero(non_space & ~np.concatenate([[False], non_space[:-1]]))
+            word_counts[start:end] = np.bincount(row_of(piece_starts) - start, minlength=end - start)
+
+            # 唯一值按原始文本计算（区分大小写，与nunique一致）
+            powers, inverse_powers = _powers(len(codepoints))
+            row_hashes.append(_substring_hashes(_prefix_hashes(codepoints, powers), inverse_powers,
+                                                row_starts, row_ends))
+
+            # 词频：非中文单词字符的连续片段为一个词（不区分大小写）；连续汉字切分为二元组或交给jieba
+            lowered = joined.lower()
+            if len(lowered) != len(joined):
+                # 少数字符小写后长度改变，此时按原始码位对齐，只对ASCII字母转小写
+                lower_codepoints = np.where((codepoints >= 65) & (codepoints <= 90), codepoints + 32, codepoints)
+                lowered = lower_codepoints.astype(np.uint32).tobytes().decode('utf-32-le')
+            else:
+                lower_codepoints = _encode(lowered)
+            prefix = _prefix_hashes(lower_codepoints, powers)
+
+            cjk = _is_cjk(codepoints) & word
+            token_starts, token_ends = _runs(word & ~cjk)
+            cjk_starts, cjk_ends = _runs(cjk)
+            if self.tokenizer == 'bigram':
+                bigram = np.flatnonzero(cjk[:-1] & cjk[1:])
+                single = cjk_starts[cjk_ends - cjk_starts == 1]
+                token_starts = np.concatenate([token_starts, bigram, single])
+                token_ends = np.concatenate([token_ends, bigram + 2, single + 1])
+            elif len(cjk_starts):
+                # jieba只处理去重后的汉字片段，按片段出现次数加权
+                run_hashes = _substring_hashes(prefix, inverse_powers, cjk_starts, cjk_ends)
+                unique_runs, first, run_counts = np.unique(run_hashes, return_index=True, return_counts=True)
+                for idx, count in zip(first, run_counts):
+                    for token in jieba.lcut(lowered[cjk_starts[idx]:cjk_ends[idx]]):
+                        token_hash = string_hash(token)
+                        token_texts[int(token_hash)] = token
+                        token_hashes.append(np.array([token_hash], dtype=np.uint64))
+                        token_counts.append(np.array([count], dtype=np.int64))
+                        token_refs.append(np.array([[-1, 0, 0]], dtype=np.int64))
+
+            # 按位置排序，使每个词记录的是首次出现的位置（用于与value_counts一致的并列排序）
+            order = np.argsort(token_starts, kind='stable')
+            token_starts, token_ends = token_starts[order], token_ends[order]
+            hashes = _substring_hashes(prefix, inverse_powers, token_starts, token_ends)
+            unique_hashes, first, counts = np.unique(hashes, return_index=True, return_counts=True)
+            token_hashes.append(unique_hashes)
+            token_counts.append(counts.astype(np.int64))
+            token_refs.append(np.column_stack([np.full(len(first), block_id),
+                                               token_starts[first], token_ends[first]]).astype(np.int64))
+            buffers.append(lowered)
+
+        # 合并各块的词计数
+        if token_hashes:
+            all_hashes = np.concatenate(token_hashes)
+            all_refs = np.concatenate(token_refs)
+            unique_hashes, first, inverse = np.unique(all_hashes, return_index=True, return_inverse=True)
+            counts = np.bincount(inverse, weights=np.concatenate(token_counts)).astype(np.int64)
+            refs = all_refs[first]
+        else:
+            unique_hashes, counts = np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64)
+            refs = np.empty((0, 3), dtype=np.int64)
+
+        # 邮箱和网址只对包含@或://、www的候选行做正则匹配，分批进行，找到一个即可停止
+        for key, pattern in (('emails', _EMAIL_PATTERN), ('urls', _URL_PATTERN)):
+            rows = np.concatenate(candidate_rows[key]) if candidate_rows[key] else np.empty(0, dtype=np.int64)
+            flags[key] = any(self.series.iloc[rows[i:i + 10_000]].str.contains(pattern).any()
+                             for i in range(0, len(rows), 10_000))
+
+        self._result = {
+            'lengths': lengths,
+            'word_counts': word_counts,
+            'unique_rows': len(np.unique(np.concatenate(row_hashes))) if row_hashes else 0,
+            'flags': flags,
+            'token_hashes': unique_hashes,
+            'token_counts': counts,
+            'token_refs': refs,
+            'token_texts': token_texts,
+            'buffers': buffers
+        }
+        return self._result
+
+    def summary(self):
+        """行数、唯一值、字符长度、词数和模式标记"""
+        result = self.analyze()
+        lengths, word_counts = result['lengths'], result['word_counts']
+        count = len(lengths)
+        return {
+            'count': count,
+            'unique_values': int(result['unique_rows']),
+            'uniqueness_ratio': float(result['unique_rows'] / count) if count > 0 else 0,
+            'min_chars': int(lengths.min()) if count else 0,
+            'max_chars': int(lengths.max()) if count else 0,
+            'avg_chars': float(lengths.mean()) if count else 0,
+            'min_words': int(word_counts.min()) if count else 0,
+            'max_words': int(word_counts.max()) if count else 0,
+            'avg_words': float(word_counts.mean()) if count else 0,
+            'contains_emails': result['flags']['emails'],
+            'contains_urls': result['flags']['urls'],
+            'contains_numbers': result['flags']['numbers'],
+            'contains_special_chars': result['flags']['special_chars'],
+            'has_sentences': result['flags']['sentences']
+        }
+
+    def token_counts(self):
+        """所有词及其出现次数（按次数降序的Series）"""
+        result = self.analyze()
+        order = self._frequency_order()
+        words = [self._token_text(idx) for idx in order]
+        return pd.Series(result['token_counts'][order], index=pd.Index(words, dtype=object), dtype=np.int64)
+
+    def _frequency_order(self):
+        """按次数降序、次数相同时按首次出现位置排列的词索引"""
+        result = self.analyze()
+        refs = result['token_refs']
+        return np.lexsort((refs[:, 1], refs[:, 0], -result['token_counts']))
+
+    def _token_text(self, idx):
+        result = self.analyze()
+        block_id, start, end = result['token_refs'][idx]
+        if block_id < 0:
+            return result['token_texts'][int(result['token_hashes'][idx])]
+        return result['buffers'][block_id][start:end]
+
+    def word_frequency(self, top_k=10):
+        """词的总数、唯一词数和最常见的top_k个词"""
+        result = self.analyze()
+        counts = result['token_counts']
+        order = self._frequency_order()[:top_k]
+        top_words = {self._token_text(idx): int(counts[idx]) for idx in order}
+        return {
+            'total_words': int(counts.sum()),
+            'unique_words': int(len(counts)),
+            'top_words': top_words
+        }
@@ -0,0 +1,21 @@
+#tokenbudget.py
+import re
+
+# 中日韩字符通常每个字符约占一个token，其余字符约四个字符一个token
+_CJK_PATTERN = re.compile(r'[　-〿㐀-䶿一-鿿＀-￯]')
+
+
+def estimate_tokens(text):
+    """
+    粗略估计文本的token数量（无需依赖具体模型的分词器）
+
+    参数:
+    text (str): 文本
+
+    返回:
+    int: 估计的token数量
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
@@ -0,0 +1,207 @@
+#typeinference.py
+import re
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from textanalysis import TextAnalyzer
+
+# 文本形式的布尔值（小写）
+BOOLEAN_VALUES = {
+    'true': True, 'false': False, 'yes': True, 'no': False, 'y': True, 'n': False,
+    't': True, 'f': False, '是': True, '否': False, '真': True, '假': False
+}
+# 数字文本中允许的千分位分隔符、货币符号和空白
+_NUMBER_NOISE = re.compile(r'[,\s$¥€£]')
+_NUMBER_PATTERN = re.compile(r'^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$')
+# 常见的日期文本：年-月(-日)、日/月/年或月/日/年，可带时间
+_DATE_PATTERN = re.compile(r'^(\d{4}[-/.年]\d{1,2}([-/.月]\d{1,2}日?)?|\d{1,2}[-/.]\d{1,2}[-/.]\d{2,4})'
+                           r'([ T]\d{1,2}:\d{2}(:\d{2}(\.\d+)?)?)?$')
+
+
+class TypeInference:
+    def __init__(self, data, sample_size=10_000, string_threshold=30, max_category_ratio=0.5, seed=42):
+        """
+        上传数据的类型推断：在抽样行上识别日期、文本形式的数字、布尔值、低基数类别和自由文本，
+        再对整列做一次无损转换（category、可空整数、datetime64等）。
+        推断出的列类型与DataDescription的列类型一致，可直接传给DataDescription等分析器共用。
+
+        参数:
+        data (pandas.DataFrame): 原始数据
+        sample_size (int): 用于推断的抽样行数
+        string_threshold (int): 与DataDescription相同的文本列判定阈值（平均字符数）
+        max_category_ratio (float): 唯一值占比低于该值的文本列转换为category类型
+        seed (int): 随机种子
+        """
+        self.data = data
+        self.sample_size = sample_size
+        self.string_threshold = string_threshold
+        self.max_category_ratio = max_category_ratio
+        self.seed = seed
+        # 列名 -> 'continuous'/'categorical'/'boolean'/'datetime'/'string'/'unknown'
+        self.column_types = {}
+        # 列名 -> 转换后的dtype（字符串），未转换的列不在其中
+        self.conversions = {}
+        self.errors = []
+
+    def _sample(self, series):
+        if len(series) <= self.sample_size:
+            return series
+        return series.sample(self.sample_size, random_state=self.seed)
+
+    def infer(self):
+        """
+        推断所有列的类型并转换数据，转换后的数据保存在self.data中。
+        Returns self for chaining.
+        """
+        warnings.filterwarnings("ignore", category=FutureWarning, module="pandas")
+        converted = {}
+        for column in self.data.columns:
+            try:
+                kind, series = self._infer_column(self.data[column])
+            except Exception as e:
+                error_msg = f"Error inferring type of {column}: {str(e)}"
+                print(error_msg)
+                self.errors.append(error_msg)
+                continue
+            self.column_types[column] = kind
+            if series is not None:
+                converted[column] = series
+                self.conversions[column] = str(series.dtype)
+        if converted:
+            print(f"Converted {len(converted)} columns: " +
+                  ', '.join(f"{column} -> {dtype}" for column, dtype in self.conversions.items()))
+            # 浅拷贝后替换列，不修改调用方的原始数据
+            data = self.data.copy(deep=False)
+            for column, series in converted.items():
+                data[column] = series
+            self.data = data
+        return self
+
+    def _infer_column(self, series):
+        """返回 (列类型, 转换后的列或None)"""
+        values = series.dropna()
+        if len(values) == 0:
+            return 'unknown', None
+        dtype = series.dtype
+
+        if pd.api.types.is_bool_dtype(dtype):
+            return 'boolean', None
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            return 'datetime', None
+        if pd.api.types.is_numeric_dtype(dtype):
+            converted = self._integer_column(series)
+            return self._numeric_kind(values, len(series)), converted
+        if isinstance(dtype, pd.CategoricalDtype):
+            return self._text_kind(series), None
+
+        sample = self._sample(values)
+        # 非字符串对象（如混合类型、列表）按文本处理
+        if not all(isinstance(value, str) for value in sample.head(1000)):
+            return self._text_kind(series), None
+        text = sample.str.strip()
+
+        converted = self._boolean_column(series, text)
+        if converted is not None:
+            return 'boolean', converted
+        converted = self._number_column(series, text)
+        if converted is not None:
+            return self._numeric_kind(converted.dropna(), len(series)), converted
+        converted = self._datetime_column(series, text)
+        if converted is not None:
+            return 'datetime', converted
+
+        kind = self._text_kind(series)
+        if kind == 'categorical' and sample.nunique() <= self.max_category_ratio * len(sample):
+            return kind, series.astype('category')
+        return kind, None
+
+    @staticmethod
+    def _numeric_kind(values, n_rows):
+        """与DataDescription相同的规则：唯一值很少的数值列视为分类变量"""
+        limit = min(10, n_rows // 10)
+        # 先看前若干个唯一值，只有可能是低基数时才对整列计数
+        if len(pd.unique(values.head(10_000))) > limit:
+            return 'continuous'
+        return 'categorical' if values.nunique() <= limit else 'continuous'
+
+    @staticmethod
+    def _integer_column(series):
+        """含缺失值、其余都是整数的浮点列转换为可空整数Int64"""
+        if not pd.api.types.is_float_dtype(series.dtype) or not series.isna().any():
+            return None
+        values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+        present = values[~np.isnan(values)]
+        if len(present) == 0 or not np.all(present == np.round(present)) or np.abs(present).max() >= 2 ** 53:
+            return None
+        return series.astype('Int64')
+
+    @staticmethod
+    def _boolean_column(series, text):
+        lowered = text.str.lower()
+        if lowered.nunique() > 2 or not lowered.isin(BOOLEAN_VALUES.keys()).all():
+            return None
+        # 抽样通过后在整列上验证，保证转换无损
+        full = series.dropna().astype(str).str.strip().str.lower()
+        if not full.isin(BOOLEAN_VALUES.keys()).all():
+            return None
+        mapped = series.astype(str).str.strip().str.lower().map(BOOLEAN_VALUES)
+        return mapped.astype(bool) if not series.isna().any() else mapped.astype('boolean')
+
+    @staticmethod
+    def _number_column(series, text):
+        cleaned = text.str.replace(_NUMBER_NOISE, '', regex=True)
+        if not cleaned.str.match(_NUMBER_PATTERN).all():
+            return None
+        # 带前导零的编码（邮编、工号等）保留为文本
+        if cleaned.str.match(r'^[+-]?0\d').any():
+            return None
+        full = series.astype(str).str.replace(_NUMBER_NOISE, '', regex=True)
+        numbers = pd.to_numeric(full.where(series.notna()), errors='coerce')
+        # 任何非缺失值无法解析时保留原始文本
+        if numbers.isna().sum() != series.isna().sum():
+            return None
+        present = numbers.dropna().to_numpy()
+        if len(present) and np.all(present == np.round(present)) and np.abs(present).max() < 2 ** 53:
+            return numbers.astype('Int64') if numbers.isna().any() else numbers.astype(np.int64)
+        return numbers.astype(np.float64)
+
+    @staticmethod
+    def _datetime_column(series, text):
+        if not text.str.match(_DATE_PATTERN).all():
+            return None
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            parsed = pd.to_datetime(text, errors='coerce')
+            if parsed.isna().any():
+                return None
+            # pandas根据第一个值推断格式，整列一次性解析；格式不一致时会出现无法解析的值
+            dates = pd.to_datetime(series.astype(str).str.strip().where(series.notna()), errors='coerce')
+        if dates.isna().sum() != series.isna().sum():
+            return None
+        return dates
+
+    def _text_kind(self, series):
+        """与DataDescription._is_string_type相同的规则，统计量在抽样行上计算"""
+        summary = TextAnalyzer(self._sample(series.dropna())).summary()
+        if summary['count'] == 0:
+            return 'unknown'
+        is_string = (summary['avg_chars'] > self.string_threshold or
+                     summary['avg_words'] > 5 or
+                     summary['has_sentences'] or
+                     summary['uniqueness_ratio'] > 0.8)
+        return 'string' if is_string else 'categorical'
+
+    def summary(self):
+        """
+        推断结果的表格
+
+        返回:
+        pandas.DataFrame: 每列的推断类型和转换后的dtype
+        """
+        return pd.DataFrame({
+            'column': list(self.column_types),
+            'type': list(self.column_types.values()),
+            'converted_to': [self.conversions.get(column, '') for column in self.column_types]
+        })
@@ -6,7 +6,26 @@ import numpy as np
 # 设置绘图风格
 sns.set_theme(style="whitegrid")
 
-def create_visualizations(dag_analyzer, data_desc_analyzer, df):
+def _is_numeric(df, col, column_types=None):
+    """优先使用推断出的列类型，否则按dtype判断（布尔列视为分类变量）"""
+    if column_types and col in column_types:
+        return column_types[col] == 'continuous'
+    return pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col])
+
+def _plot_density(ax, density):
+    """
+    用DataDescription中预先计算的直方图和核密度曲线绘图，耗时与数据行数无关。
+    与sns.histplot(kde=True)相同，密度曲线按样本数和分箱宽度缩放到计数的尺度。
+    """
+    edges = np.asarray(density['bin_edges'])
+    counts = np.asarray(density['counts'])
+    widths = np.diff(edges)
+    ax.bar(edges[:-1], counts, width=widths, align='edge', alpha=0.75, edgecolor='white', linewidth=0.5)
+    if 'kde_grid' in density:
+        ax.plot(density['kde_grid'], np.asarray(density['kde_density']) * counts.sum() * widths.mean())
+    ax.set_ylabel("Count")
+
+def create_visualizations(dag_analyzer, data_desc_analyzer, df, column_types=None):
     """
     根据分析结果生成一系列可视化图表。
 
@@ -14,6 +33,7 @@ def create_visualizations(dag_analyzer, data_desc_analyzer, df):
     dag_analyzer (DAGRelations): 已完成分析的DAGRelations对象。
     data_desc_analyzer (DataDescription): 已完成分析的DataDescription对象。
     df (pd.DataFrame): 原始数据。
+    column_types (dict): 可选的列类型（TypeInference.column_types），用于区分数值和分类变量。
 
     返回:
     dict: 一个字典，键是图表标题，值是matplotlib的Figure对象。
@@ -25,7 +45,11 @@ def create_visualizations(dag_analyzer, data_desc_analyzer, df):
         try:
             if desc['type'] == 'continuous' and desc['count'] > 0:
                 fig, ax = plt.subplots(figsize=(8, 5))
-                sns.histplot(df[col].dropna(), kde=True, ax=ax)
+                if 'density' in desc:
+                    _plot_density(ax, desc['density'])
+                    ax.set_xlabel(col)
+                else:
+                    sns.histplot(df[col].dropna(), kde=True, ax=ax)
                 ax.set_title(f"Distribution of '{col}'")
                 title = f"Distribution: {col}"
                 visualizations[title] = fig
@@ -104,8 +128,8 @@ def create_visualizations(dag_analyzer, data_desc_analyzer, df):
                 # (混合类型或数值) -> 数值
                 elif metrics['type'] in ['mixed->numeric', 'multi-numeric->numeric']:
                     # 识别数值和分类源变量
-                    num_vars = [s for s in src_list if pd.api.types.is_numeric_dtype(df[s])]
-                    cat_vars = [s for s in src_list if not pd.api.types.is_numeric_dtype(df[s])]
+                    num_vars = [s for s in src_list if _is_numeric(df, s, column_types)]
+                    cat_vars = [s for s in src_list if not _is_numeric(df, s, column_types)]
 
                     # 如果有一个数值和一个分类变量，绘制带色调的散点图
                     if len(num_vars) == 1 and len(cat_vars) == 1: